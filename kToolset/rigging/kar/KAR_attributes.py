@@ -0,0 +1,332 @@
+# Python Imports
+import array
+from collections import OrderedDict
+
+"""
+Module attributes. Each module class declares its attributes as a schema:
+
+class ArmModule(Module):
+    attributes = (IntAttribute('twist_joints', 0, minimum=0, maximum=20),)
+
+A class inherits the attributes of its base classes. The values are not kept on the modules themselves but in one
+AttributeStore per module class, which holds a column (array) of values per attribute with a row per module, so the
+same attribute can be read or written for many modules at once. Nothing in here depends on Qt.
+"""
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# ATTRIBUTE TYPES
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class Attribute(object):
+    """
+    Base class of all attribute types. Values are validated into the form they are stored in by validate(), and
+    converted back by to_value() when they are read.
+    """
+    # Kind of value held, used by the attribute editor to pick a widget
+    kind = None
+    # array typecode of the attribute's column
+    typecode = 'd'
+
+    def __init__(self, name, default, label=None):
+        """
+        :param name: String: Name the attribute is read and written by
+        :param default: Value new modules start with
+        :param label: String: Name displayed in the attribute editor, generated from name if not given
+        """
+        self.name = name
+        self.label = label or name.replace('_', ' ').title()
+        self.default = self.validate(default)
+
+    def validate(self, value):
+        """
+        Returns value in the form it is stored in, raising a ValueError if it is not valid for this attribute
+        """
+        return value
+
+    def to_value(self, stored):
+        """
+        Returns a stored value in the form it is given to the user
+        """
+        return stored
+
+    def is_compatible(self, other):
+        """
+        Returns True if other holds the same kind of value, so both can be edited together
+        """
+        return self.kind == other.kind and self.name == other.name
+
+
+class _NumericAttribute(Attribute):
+    """
+    Number with an optional minimum and maximum
+    """
+
+    def __init__(self, name, default, minimum=None, maximum=None, label=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        super(_NumericAttribute, self).__init__(name, default, label=label)
+
+    def _check_range(self, value):
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError('%s cannot be less than %s' % (self.label, self.minimum))
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError('%s cannot be more than %s' % (self.label, self.maximum))
+
+        return value
+
+
+class IntAttribute(_NumericAttribute):
+    kind = 'int'
+    typecode = 'l'
+
+    def __init__(self, name, default=0, minimum=None, maximum=None, label=None):
+        super(IntAttribute, self).__init__(name, default, minimum=minimum, maximum=maximum, label=label)
+
+    def validate(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, long, float)) or int(value) != value:
+            raise ValueError('%s must be a whole number, not %r' % (self.label, value))
+
+        return self._check_range(int(value))
+
+
+class FloatAttribute(_NumericAttribute):
+    kind = 'float'
+    typecode = 'd'
+
+    def __init__(self, name, default=0.0, minimum=None, maximum=None, label=None):
+        super(FloatAttribute, self).__init__(name, default, minimum=minimum, maximum=maximum, label=label)
+
+    def validate(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, long, float)):
+            raise ValueError('%s must be a number, not %r' % (self.label, value))
+
+        return self._check_range(float(value))
+
+
+class BoolAttribute(Attribute):
+    kind = 'bool'
+    typecode = 'b'
+
+    def __init__(self, name, default=False, label=None):
+        super(BoolAttribute, self).__init__(name, default, label=label)
+
+    def validate(self, value):
+        return int(bool(value))
+
+    def to_value(self, stored):
+        return bool(stored)
+
+
+class EnumAttribute(Attribute):
+    """
+    One of a fixed list of options, stored as the option's index. Options can be set by name or by index.
+    """
+    kind = 'enum'
+    typecode = 'h'
+
+    def __init__(self, name, options, default=None, label=None):
+        self.options = tuple(options)
+        super(EnumAttribute, self).__init__(name, self.options[0] if default is None else default, label=label)
+
+    def validate(self, value):
+        if value in self.options:
+            return self.options.index(value)
+
+        if isinstance(value, (int, long)) and not isinstance(value, bool) and 0 <= value < len(self.options):
+            return value
+
+        raise ValueError('%s must be one of %s, not %r' % (self.label, ', '.join(self.options), value))
+
+    def to_value(self, stored):
+        return self.options[stored]
+
+    def is_compatible(self, other):
+        return super(EnumAttribute, self).is_compatible(other) and self.options == other.options
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# SCHEMAS
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+_schemas = {}
+
+
+def get_schema(module_class):
+    """
+    Returns the attributes of a module class, including those inherited from its base classes, base classes first.
+    An attribute declared again by a subclass replaces the inherited one.
+
+    :param module_class: Module class
+    :return OrderedDict: {name: Attribute}
+    """
+    schema = _schemas.get(module_class)
+
+    if schema is None:
+        schema = OrderedDict()
+
+        for cls in reversed(module_class.__mro__):
+            for attribute in cls.__dict__.get('attributes', ()):
+                schema[attribute.name] = attribute
+
+        _schemas[module_class] = schema
+
+    return schema
+
+
+def get_common_schema(module_classes):
+    """
+    Returns the attributes shared by all of the given module classes, in the order of the first class' schema
+
+    :param module_classes: Iterable of module classes
+    :return List: Attributes
+    """
+    schemas = [get_schema(module_class) for module_class in OrderedDict.fromkeys(module_classes)]
+
+    if not schemas:
+        return []
+
+    common = []
+
+    for name, attribute in schemas[0].iteritems():
+        if all(name in schema and schema[name].is_compatible(attribute) for schema in schemas[1:]):
+            common.append(attribute)
+
+    return common
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# STORE
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class AttributeStore(object):
+    """
+    Attribute values of all modules of one class. Every attribute has a column (array.array) holding the values
+    of all modules, and each module has a row in those columns. Rows of removed modules are reused.
+
+    Values are validated before they are written, so the store itself only ever holds valid values.
+    """
+
+    def __init__(self, module_class):
+        self.schema = get_schema(module_class)
+
+        self._rows = {}     # module handle -> row
+        self._free = []     # rows of removed modules
+        self._columns = dict((name, array.array(attribute.typecode)) for name, attribute in self.schema.iteritems())
+
+    def __contains__(self, identifier):
+        return identifier in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, identifier):
+        """
+        Gives a module a row, holding the default value of every attribute
+        """
+        if identifier in self._rows:
+            return
+
+        if self._free:
+            row = self._free.pop()
+
+            for name, column in self._columns.iteritems():
+                column[row] = self.schema[name].default
+        else:
+            row = len(self._rows)
+
+            for name, column in self._columns.iteritems():
+                column.append(self.schema[name].default)
+
+        self._rows[identifier] = row
+
+    def remove(self, identifier):
+        """
+        Releases a module's row. Modules that are not in the store are ignored.
+        """
+        row = self._rows.pop(identifier, None)
+
+        if row is not None:
+            self._free.append(row)
+
+    def get(self, identifier, name):
+        """
+        Returns the value of one attribute of one module
+        """
+        return self.schema[name].to_value(self._columns[name][self._rows[identifier]])
+
+    def get_all(self, identifier):
+        """
+        Returns the values of every attribute of one module
+
+        :return OrderedDict: {name: value}
+        """
+        row = self._rows[identifier]
+
+        return OrderedDict((name, attribute.to_value(self._columns[name][row]))
+                           for name, attribute in self.schema.iteritems())
+
+    def get_many(self, identifiers, name):
+        """
+        Returns the values of one attribute of several modules, in the order of identifiers
+        """
+        column = self._columns[name]
+        rows = self._rows
+        to_value = self.schema[name].to_value
+
+        return [to_value(column[rows[_id]]) for _id in identifiers]
+
+    def set_all(self, identifier, values):
+        """
+        Writes several attributes of one module, i.e values read from a rig file. Values of attributes the class
+        does not have, or that are not valid, are ignored and the attribute keeps its current value.
+
+        :param identifier: Handle of module in the store
+        :param values: Dictionary: {name: value}
+        """
+        row = self._rows[identifier]
+
+        for name, value in values.iteritems():
+            attribute = self.schema.get(name)
+
+            if attribute is None:
+                continue
+
+            try:
+                self._columns[name][row] = attribute.validate(value)
+            except ValueError:
+                continue
+
+    def set_many(self, identifiers, name, stored):
+        """
+        Writes the same (already validated) value to one attribute of several modules.
+
+        The modules' rows are sorted and each run of neighbouring rows is written with a single slice assignment,
+        so modules added together are written in one go.
+
+        :param identifiers: Handles of modules in the store
+        :param name: String: Attribute name
+        :param stored: Value as returned by the attribute's validate()
+        """
+        column = self._columns[name]
+        rows = sorted(self._rows[_id] for _id in identifiers)
+        typecode = column.typecode
+
+        start = 0
+        for position in xrange(1, len(rows) + 1):
+            if position == len(rows) or rows[position] != rows[position - 1] + 1:
+                column[rows[start]:rows[position - 1] + 1] = array.array(typecode, [stored]) * (position - start)
+                start = position
+
+    def clear(self):
+        """
+        Removes every module
+        """
+        self._rows.clear()
+        self._free[:] = []
+
+        for column in self._columns.itervalues():
+            del column[:]
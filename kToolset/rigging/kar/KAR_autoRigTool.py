@@ -1,8 +1,47 @@
+# KAR Imports
+import KAR_scene; reload(KAR_scene)
+import KAR_rigFile; reload(KAR_rigFile)
+import KAR_journal; reload(KAR_journal)
+import KAR_presets; reload(KAR_presets)
+import modules; reload(modules)
+
+
 class KAutoRigger(object):
     def __init__(self):
-        self.modules = {}
+        # Modules are stored by the scene, which announces every change made to them
+        self.scene = KAR_scene.Scene()
         self.placement_systems = {}
 
+        # KAR_rigFile.RigFile the scene was last opened from or saved to, None for a new rig
+        self.rig_file = None
+
+        # Records every scene change, so a session lost to a crash can be recovered. Started by start_journal()
+        self.journal = KAR_journal.Journal(self.scene)
+
+        # Library of module subtrees saved to be imported into any rig
+        self.presets = KAR_presets.PresetLibrary()
+
+    @property
+    def rig_path(self):
+        """
+        Path of the rig file the scene was last opened from or saved to, None for a new rig
+        """
+        return self.rig_file.path if self.rig_file is not None else None
+
+    @property
+    def modules(self):
+        """
+        Dictionary of all modules in the scene by handle
+        """
+        return self.scene.modules
+
+    def batch(self):
+        """
+        Context manager that merges every scene change made inside it into one set of notifications, see
+        Scene.batch()
+        """
+        return self.scene.batch()
+
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
     # INTERFACE FUNCTIONS
@@ -15,22 +54,203 @@ class KAutoRigger(object):
         :param scene_module: Module instance to add to scene
         :param trigger_update
         """
-        self.modules[scene_module.uuid] = scene_module
+        self.scene.add_module(scene_module, trigger_update=trigger_update)
+
+    def add_modules(self, scene_modules, trigger_update=True):
+        """
+        Adds several modules to the scene at once
+
+        :param scene_modules: List of module instances to add to scene
+        :param trigger_update
+        """
+        self.scene.add_modules(scene_modules, trigger_update=trigger_update)
 
     def delete_module(self, identifiers, trigger_update=True):
         """
-        Deletes a list of rig modules identified by their UUID.
+        Deletes a list of rig modules identified by their handle.
 
         This removes all Maya component as forces a UI update.
         """
-        if not isinstance(identifiers, list):
-            identifiers = [identifiers]
+        self.scene.delete_modules(identifiers, trigger_update=trigger_update)
 
-        for _id in identifiers:
-            try:
-                del self.modules[_id]
-            except KeyError:
-                pass
+    def reparent_module(self, identifier, parent, trigger_update=True):
+        """
+        Parents a module (handle) underneath another module (handle, or None for world)
+        """
+        self.scene.reparent_module(identifier, parent, trigger_update=trigger_update)
+
+    def rename_module(self, identifier, name, trigger_update=True):
+        """
+        Renames a module identified by its handle
+        """
+        self.scene.rename_module(identifier, name, trigger_update=trigger_update)
+
+    def set_attributes(self, identifiers, name, value, trigger_update=True):
+        """
+        Sets one attribute of several modules (handles) at once, see Scene.set_attributes
+        """
+        return self.scene.set_attributes(identifiers, name, value, trigger_update=trigger_update)
+
+    def find_modules(self, **filters):
+        """
+        Returns the modules matching the given filters (module_type, name, side, prefix, under), see
+        Scene.find_modules
+        """
+        return self.scene.find_modules(**filters)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # RIG FILES
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def new_rig(self):
+        """
+        Deletes every module, starting a new rig
+        """
+        with self.journal.pause():
+            self.scene.clear()
+
+        self.rig_file = None
+        self.journal.reset(None)
+
+    def open_rig(self, path):
+        """
+        Replaces the scene's modules with those of a rig file, see KAR_rigFile. Only the module list of a binary
+        rig is read here, the rest of each module is read from the file when it is first needed.
+
+        :param path: String: Rig file, JSON or binary
+        :return Boolean: False if the file could not be read, in which case the scene is left unchanged
+        """
+        rig_file = KAR_rigFile.RigFile(path)
+
+        try:
+            with self.journal.pause():
+                rig_file.read(self.scene, modules.MODULE_TYPES, clear=True)
+        except (IOError, KAR_rigFile.RigFileError) as error:
+            print('Could not open rig "%s": %s' % (path, error))
+            return False
+
+        self.rig_file = rig_file
+        self.journal.reset(rig_file.path)
+
+        return True
+
+    def save_rig(self, path=None, binary=None):
+        """
+        Writes the scene's modules, their attributes and placement positions to a rig file. Saving again to the
+        binary file the rig was opened from or last saved to only writes the modules changed since, see
+        KAR_rigFile.RigFile.save.
+
+        :param path: String: File to write, the file the rig was last opened from or saved to if None
+        :param binary: Boolean: Write the binary format, chosen by the file's extension if None
+        :return Boolean: False if the rig could not be saved
+        """
+        path = path or self.rig_path
+
+        if path is None:
+            print('Cannot save rig, no file given..')
+            return False
+
+        # Positions of built placement systems replace those stored by the scene, marking moved modules as changed
+        for _id, positions in (self.get_placement_position(build_all=True) or {}).iteritems():
+            self.scene.set_placement_positions(_id, positions)
+
+        rig_file = self.rig_file if path == self.rig_path else KAR_rigFile.RigFile(path)
+
+        try:
+            rig_file.save(self.scene, binary=binary)
+        except (IOError, OSError, KAR_rigFile.RigFileError) as error:
+            print('Could not save rig "%s": %s' % (path, error))
+            return False
+
+        self.rig_file = rig_file
+        self.journal.reset(rig_file.path)
+
+        return True
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # PRESETS
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def save_preset(self, name, identifiers, tags=(), thumbnail=None):
+        """
+        Saves modules and everything parented underneath them to the preset library, see KAR_presets
+
+        :param name: String: Name of the preset, replacing any preset of the same name
+        :param identifiers: List of handles of modules to save
+        :param tags: List of strings to search the preset by
+        :param thumbnail: String: Path of an image shown for the preset
+        :return Boolean: False if the preset could not be saved
+        """
+        try:
+            self.presets.save_preset(self.scene, name, identifiers, tags=tags, thumbnail=thumbnail)
+        except (IOError, OSError, KAR_presets.PresetError, KAR_rigFile.RigFileError) as error:
+            print('Could not save preset "%s": %s' % (name, error))
+            return False
+
+        return True
+
+    def import_preset(self, name, parent=None):
+        """
+        Adds the modules of a preset to the scene in one go
+
+        :param name: String: Name of the preset
+        :param parent: Handle of module to add the preset under, None to add it at the top of the rig
+        :return Int: Number of modules added, 0 if the preset could not be imported
+        """
+        try:
+            return self.presets.import_preset(self.scene, name, modules.MODULE_TYPES, parent=parent)
+        except (IOError, OSError, KAR_presets.PresetError) as error:
+            print('Could not import preset "%s": %s' % (name, error))
+            return 0
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # JOURNAL
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def start_journal(self):
+        """
+        Starts recording scene changes, replacing the journal left by any previous session
+        """
+        self.journal.start(self.rig_path)
+
+    def recover_journal(self):
+        """
+        Restores the scene of a session that did not exit cleanly, by opening the rig file its journal started from
+        and applying the changes recorded since, then carries on recording
+
+        :return Boolean: False if the journal could not be recovered, in which case a new journal is started
+        """
+        try:
+            journal = KAR_journal.read_journal(self.journal.path)
+
+            if journal is None:
+                raise KAR_journal.JournalError('No journal to recover')
+
+            header, state = journal
+
+            with self.journal.pause():
+                rig_file = KAR_journal.open_base(header, self.scene, modules.MODULE_TYPES)
+        except (IOError, KAR_rigFile.RigFileError, KAR_journal.JournalError) as error:
+            print('Could not recover the last session: %s' % error)
+            self.start_journal()
+            return False
+
+        self.rig_file = rig_file
+        self.start_journal()
+
+        # Applied once the journal has been reset to the base, so the recovered changes are recorded again
+        KAR_journal.apply_changes(self.scene, modules.MODULE_TYPES, state)
+
+        return True
+
+    def close(self):
+        """
+        Stops recording on a clean exit, deleting the journal as there is nothing to recover
+        """
+        self.journal.stop(delete=True)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -42,24 +262,62 @@ class KAutoRigger(object):
         Creates an instance of each modules placement system class and runs the function
         to build the base system (i.e geo, joints, controls).
 
-        :param system: UUID of specific module to build
+        Modules are built in scene graph order, so a module's parent is always built before the module itself.
+
+        :param system: Handle of specific module to build
         :param build_all: Boolean: If true, builds ALL placement systems for all initialized modules
         :return:
         """
-        pass
+        if build_all:
+            identifiers = self.scene.graph.topological_order()
+        elif system is not None:
+            identifiers = [system]
+        else:
+            return
+
+        identifiers = [_id for _id in identifiers if _id not in self.placement_systems]
+
+        # Read the settings of modules opened from a rig file, in one pass over the file
+        try:
+            self.scene.load_payloads(identifiers)
+        except KAR_rigFile.RigFileError as error:
+            print('Could not build placement systems: %s' % error)
+            return
+
+        for _id in identifiers:
+            scene_module = self.modules.get(_id)
+
+            if scene_module is None or scene_module.placement_system is None:
+                continue
+
+            self.placement_systems[_id] = scene_module.placement_system()
 
     def assemble_placement_systems(self):
         """
         Parents each placement system in hierarchy as defined by the user.
+
+        Walks the scene graph parents first, so each system is attached to a parent that has already been
+        assembled.
         :return:
         """
-        pass
+        graph = self.scene.graph
+
+        for _id in graph.topological_order():
+            placement_system = self.placement_systems.get(_id)
+            parent_system = self.placement_systems.get(graph.parent(_id))
+
+            if placement_system is None or parent_system is None:
+                continue
+
+            attach = getattr(placement_system, 'attach_to', None)
+            if attach is not None:
+                attach(parent_system)
 
     def delete_placement_system(self, system=None, build_all=False):
         """
         Deletes an instance/s of each modules placement system and all related Maya nodes
 
-        :param system: UUID of specific modules placement system to delete
+        :param system: Handle of specific modules placement system to delete
         :param build_all: Boolean: If True, removes ALL placement systems
         :return:
         """
@@ -80,7 +338,7 @@ class KAutoRigger(object):
         """
         Returns the positioning information from each placement system
 
-        :param system: UUID of specific modules placement information to retireve
+        :param system: Handle of specific modules placement information to retireve
         :param build_all: Boolean: If True, returns all modules placement information
         :return:
         """
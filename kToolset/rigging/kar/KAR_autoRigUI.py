@@ -13,7 +13,6 @@ from shiboken import wrapInstance
 
 # KAR Imports
 import KAR_autoRigTool as kAutoRigTool; reload(kAutoRigTool)
-import KAR_scene; reload(KAR_scene)
 import ui as kui; reload(kui)
 
 # -------------------------------------------------------------------------------------------------------------------- #
@@ -41,6 +40,7 @@ def initialize():
         if main_ui is None:
             main_ui = KAutoRiggerUI()
             main_ui.run()
+            main_ui.recover_session()
     else:
         main_ui.run()
         
@@ -60,6 +60,10 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
 
     TOOL_NAME = 'kAutoRigger'
 
+    # File dialog filter for rig files, binary first as it is the default
+    RIG_FILE_FILTER = 'kAutoRigger Rig (*%s);;kAutoRigger Rig, readable (*%s)' % (
+        kAutoRigTool.KAR_rigFile.BINARY_EXTENSION, kAutoRigTool.KAR_rigFile.JSON_EXTENSION)
+
     update_signal = qc.Signal()
 
     def __init__(self):
@@ -70,10 +74,12 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
         self.delete_instances()
         super(self.__class__, self).__init__(parent=self.get_maya_window())
 
+        # kAutoRigger Tool
         self.tool = kAutoRigTool.KAutoRigger()
 
-        # kAutoRigger Tool
-        self.scene = KAR_scene.Scene()
+        # Rig scene, owned by the tool. Announces every change to its modules
+        self.scene = self.tool.scene
+        self.scene.scene_updated.connect(self.update_signal.emit)
 
         # Window settings
         self.setObjectName(self.__class__.TOOL_NAME)
@@ -96,7 +102,9 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
         # Main Tabs
         tab_widget = kui.widgets.TabWidget(parent=self)
         self.setCentralWidget(tab_widget)
-        tab_widget.add_tab('Module Settings', kui.ModuleAttributeEditor(self.scene), True)
+        self.attribute_editor = kui.ModuleAttributeEditor(self.scene, parent=self)
+        self.docks['module_outliner'].selection_changed.connect(self.attribute_editor.set_modules)
+        tab_widget.add_tab('Module Settings', self.attribute_editor, True)
         tab_widget.add_tab('Skinning', qg.QWidget(parent=self))
         tab_widget.add_tab('Blend Shapes', qg.QWidget(parent=self))
         tab_widget.add_tab('Publish', qg.QWidget(parent=self))
@@ -162,12 +170,12 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
         file_action_import_preset = qg.QAction('Import Preset', self)
         file_action_exit = qg.QAction('Exit', self)
         # Functionality
-        file_action_new_rig.triggered.connect(self.display_in_dev_message)
-        file_action_open_rig.triggered.connect(self.display_in_dev_message)
-        file_action_save_rig.triggered.connect(self.display_in_dev_message)
-        file_action_save_rig_as.triggered.connect(self.display_in_dev_message)
-        file_action_save_preset.triggered.connect(self.display_in_dev_message)
-        file_action_import_preset.triggered.connect(self.display_in_dev_message)
+        file_action_new_rig.triggered.connect(self.new_rig)
+        file_action_open_rig.triggered.connect(self.open_rig)
+        file_action_save_rig.triggered.connect(self.save_rig)
+        file_action_save_rig_as.triggered.connect(self.save_rig_as)
+        file_action_save_preset.triggered.connect(self.save_preset)
+        file_action_import_preset.triggered.connect(self.import_preset)
         file_action_exit.triggered.connect(self.exit)
         # Add Actions
         file_menu.addAction(file_action_new_rig)
@@ -272,7 +280,107 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
     def emit_update(self):
-        self.update_signal.emit()
+        """
+        Asks every dock to re-read the whole scene. Individual changes are announced by the scene's own signals,
+        so this is only needed after changes made outside of the scene's functions.
+
+        Requests are merged by the scene, so any number of calls within one turn of the event loop (or one
+        scene.batch()) cause a single update.
+        """
+        self.scene.force_update()
+
+    def new_rig(self):
+        """
+        Asks the user to confirm, then removes every module from the scene
+        """
+        message = "Unsaved progress will be lost.. continue?"
+        user_reply = qg.QMessageBox.question(self, 'New Rig', message, qg.QMessageBox.Yes, qg.QMessageBox.No)
+
+        if user_reply == qg.QMessageBox.Yes:
+            self.tool.new_rig()
+            self.statusBar().showMessage('New rig')
+
+    def open_rig(self):
+        """
+        Asks the user for a rig file and replaces the scene with its modules
+        """
+        path = qg.QFileDialog.getOpenFileName(self, 'Open Rig', self.tool.rig_path or '', self.RIG_FILE_FILTER)[0]
+
+        if not path:
+            return
+
+        if self.tool.open_rig(path):
+            self.statusBar().showMessage('Opened %s' % path)
+        else:
+            qg.QMessageBox.warning(self, 'Open Rig', 'Could not open %s, see the Script Editor for details' % path)
+
+    def save_rig(self):
+        """
+        Saves the rig to the file it was opened from or last saved to, asking for a file if there is none
+        """
+        if self.tool.rig_path is None:
+            self.save_rig_as()
+        else:
+            self._save_rig(self.tool.rig_path)
+
+    def save_rig_as(self):
+        """
+        Asks the user for a file and saves the rig to it. The format is chosen by the file's extension.
+        """
+        path = qg.QFileDialog.getSaveFileName(self, 'Save Rig As', self.tool.rig_path or '', self.RIG_FILE_FILTER)[0]
+
+        if path:
+            self._save_rig(path)
+
+    def _save_rig(self, path):
+        if self.tool.save_rig(path):
+            self.statusBar().showMessage('Saved %s' % path)
+        else:
+            qg.QMessageBox.warning(self, 'Save Rig', 'Could not save %s, see the Script Editor for details' % path)
+
+    def save_preset(self):
+        """
+        Saves the selected modules and everything parented underneath them as a preset, see KAR_presets
+        """
+        selected = self.docks['module_outliner'].get_selected_modules()
+
+        if not selected:
+            qg.QMessageBox.warning(self, 'Save Preset', 'Select the modules to save as a preset')
+            return
+
+        dialog = kui.SavePresetDialog(self.tool.presets, parent=self)
+
+        if dialog.exec_() != qg.QDialog.Accepted:
+            return
+
+        name = dialog.get_name()
+
+        if self.tool.save_preset(name, selected, tags=dialog.get_tags(), thumbnail=dialog.get_thumbnail()):
+            self.statusBar().showMessage('Saved preset %s' % name)
+        else:
+            qg.QMessageBox.warning(self, 'Save Preset',
+                                   'Could not save preset %s, see the Script Editor for details' % name)
+
+    def import_preset(self):
+        """
+        Asks the user for a preset and adds its modules to the scene, under the selected module if one is selected
+        """
+        dialog = kui.PresetBrowser(self.tool.presets, parent=self)
+
+        if dialog.exec_() != qg.QDialog.Accepted:
+            return
+
+        name = dialog.get_name()
+        selected = self.docks['module_outliner'].get_selected_modules()
+
+        count = self.tool.import_preset(name, parent=selected[0] if len(selected) == 1 else None)
+
+        if count:
+            self.statusBar().showMessage('Imported preset %s, %s module(s)' % (name, count))
+        else:
+            qg.QMessageBox.warning(self, 'Import Preset',
+                                   'Could not import preset %s, see the Script Editor for details' % name)
+
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
     # OPEN/CLOSE FUNCTIONS FOR UI
@@ -284,6 +392,28 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
         """
         self.show(dockable=True)
 
+    def recover_session(self):
+        """
+        Offers to recover the rig of a session that did not exit cleanly, from the journal it left behind, then
+        starts recording this session
+        """
+        changed = kAutoRigTool.KAR_journal.has_changes(self.tool.journal.path)
+
+        if changed:
+            message = ('kAutoRigger did not exit properly last time, %d module(s) had unsaved changes.. '
+                       'recover them?' % changed)
+            user_reply = qg.QMessageBox.question(self, 'Recover Rig', message, qg.QMessageBox.Yes, qg.QMessageBox.No)
+
+            if user_reply == qg.QMessageBox.Yes:
+                if self.tool.recover_journal():
+                    self.statusBar().showMessage('Recovered %s' % (self.tool.rig_path or 'unsaved rig'))
+                else:
+                    qg.QMessageBox.warning(self, 'Recover Rig',
+                                           'Could not recover the rig, see the Script Editor for details')
+                return
+
+        self.tool.start_journal()
+
     def exit(self):
         """
         Runs the delete_instances function and sets the global variable app_running to False
@@ -298,6 +428,7 @@ class KAutoRiggerUI(MayaQWidgetDockableMixin, qg.QMainWindow):
         if user_reply == qg.QMessageBox.Yes:
             global app_running
             app_running = False
+            self.tool.close()
             self.delete_instances()
         else:
             pass
@@ -0,0 +1,531 @@
+# Python Imports
+import Queue
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# KAR Imports
+import KAR_attributes
+import KAR_rigFile
+
+"""
+Crash recovery journal. Every change made to a scene is appended to a journal file, so a session lost to a crash can
+be replayed on top of the rig file it started from.
+
+The journal starts with a header naming its base: the rig file the scene was last opened from or saved to (and the
+size and modification time the file had then), or none for a rig that has never been saved. Each following line
+holds the current state of one module, ["set", uuid, class name, name, parent's uuid, {attribute: value}], or its
+removal, ["remove", uuid]. Only the last line of each module matters, so replaying applies each module once however
+many times it was changed. The attributes of a module whose settings have not been read from the base rig file yet
+(see Scene.defer_payloads) are null, as they are still those of the base.
+
+The scene is only read on the main thread, when its signals are dispatched. Writing, flushing and snapshots are
+done by a background thread, so journaling never waits on the disk. A snapshot rewrites the journal with only the
+last line of each module. Nothing in here depends on Qt or Maya.
+"""
+
+FORMAT_NAME = 'kAutoRigger journal'
+FORMAT_VERSION = 1
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), 'kAutoRigger', 'journal.karj')
+
+# Seconds between flushes to disk
+FLUSH_INTERVAL = 1.0
+# Lines written before the journal is rewritten as a snapshot, if that at least halves it
+SNAPSHOT_LINES = 5000
+# Seconds to wait for the writer thread when stopping or syncing, so a stuck disk cannot freeze Maya
+WAIT_TIMEOUT = 10.0
+
+
+class JournalError(ValueError):
+    """
+    Raised when a journal cannot be read or no longer matches its base rig file
+    """
+    pass
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# JOURNAL
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class Journal(object):
+    """
+    Records the changes made to a scene, see the module docstring.
+
+    journal = Journal(scene)
+    journal.start()                 # Starts a new journal, with no base
+    journal.reset(rig_path)         # Once the scene has been opened from or saved to rig_path
+    journal.stop()                  # On a clean exit, deleting the journal
+    """
+
+    def __init__(self, scene, path=DEFAULT_PATH):
+        """
+        :param scene: Scene to record
+        :param path: String: Journal file
+        """
+        self.scene = scene
+        self.path = path
+
+        self._uuids = {}            # module handle -> UUID bytes, to record modules once they have been removed
+        self._paused = 0
+        self._queue = Queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, base=None):
+        """
+        Starts recording, replacing any journal already at the path
+
+        :param base: String: Rig file the scene was opened from or last saved to, None if it has none
+        """
+        if self.running:
+            self.reset(base)
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.scene.modules_added.connect(self.modules_changed)
+        self.scene.module_reparented.connect(self.modules_changed)
+        self.scene.module_renamed.connect(self.modules_changed)
+        self.scene.attributes_changed.connect(self.modules_changed)
+        self.scene.modules_removed.connect(self.modules_removed)
+
+        self._thread = threading.Thread(target=self._run, name='kAutoRigger journal')
+        self._thread.daemon = True
+        self._thread.start()
+
+        self.reset(base)
+
+    def stop(self, delete=True):
+        """
+        Stops recording, once every change has been written
+
+        :param delete: Boolean: Delete the journal, as on a clean exit there is nothing to recover
+        """
+        if not self.running:
+            return
+
+        if self._thread.is_alive():
+            self._queue.put(('stop', delete))
+            self._thread.join(WAIT_TIMEOUT)
+
+            if self._thread.is_alive():
+                print('The kAutoRigger journal "%s" is still being written, stopped waiting for it..' % self.path)
+
+        self._thread = None
+
+        for signal, slot in ((self.scene.modules_added, self.modules_changed),
+                             (self.scene.module_reparented, self.modules_changed),
+                             (self.scene.module_renamed, self.modules_changed),
+                             (self.scene.attributes_changed, self.modules_changed),
+                             (self.scene.modules_removed, self.modules_removed)):
+            try:
+                signal.disconnect(slot)
+            except (RuntimeError, TypeError):
+                pass
+
+    def reset(self, base=None):
+        """
+        Starts the journal again from the scene as it is now, i.e once it has been opened from or saved to a rig
+        file. The scene must match the base exactly, since replaying starts from it.
+
+        :param base: String: Rig file the scene now matches, None for an empty scene
+        """
+        if not self.running:
+            return
+
+        self._uuids = dict((_id, scene_module.uuid.bytes) for _id, scene_module in self.scene.modules.iteritems())
+
+        stamp = None
+        if base is not None:
+            stat = os.stat(base)
+            stamp = [stat.st_size, stat.st_mtime]
+
+        header = OrderedDict((('format', FORMAT_NAME), ('version', FORMAT_VERSION), ('base', base),
+                              ('base_stamp', stamp), ('started', time.time())))
+
+        self._queue.put(('reset', json.dumps(header)))
+
+    def sync(self):
+        """
+        Waits until every change recorded so far has been written and flushed to disk, for at most WAIT_TIMEOUT
+        seconds
+
+        :return Boolean: False if the changes could not be confirmed as written
+        """
+        if not self.running or not self._thread.is_alive():
+            return False
+
+        written = threading.Event()
+        self._queue.put(('sync', written))
+        written.wait(WAIT_TIMEOUT)
+
+        return written.is_set()
+
+    @contextmanager
+    def pause(self):
+        """
+        Context manager that stops changes made inside it from being recorded, i.e while a rig is being opened,
+        after which the journal is reset. The scene's signals are dispatched at the end of the block, so changes
+        are not recorded once their signals are emitted later on.
+
+        with journal.pause():
+            rig_file.read(scene, module_types, clear=True)
+        journal.reset(rig_file.path)
+        """
+        self._paused += 1
+
+        try:
+            yield self
+        finally:
+            try:
+                self.scene.dispatch()
+            finally:
+                self._paused -= 1
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Scene signals
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def modules_changed(self, identifiers):
+        """
+        Records the current state of modules that have been added or changed. The settings of modules still in
+        the base rig file are not read, their attributes are recorded as None.
+
+        :param identifiers: List of module handles
+        """
+        if self._paused:
+            return
+
+        lines = []
+
+        for _id in identifiers:
+            scene_module = self.scene.get_module(_id)
+
+            if scene_module is None:
+                continue
+
+            parent = self.scene.get_module(scene_module.parent)
+            uuid_hex = scene_module.uuid.hex
+            self._uuids[_id] = scene_module.uuid_bytes
+
+            # Reading them would open the rig file once per module, and they are still those of the base anyway
+            values = self.scene.get_attribute_values(_id) if self.scene.is_loaded(_id) else None
+
+            lines.append((uuid_hex, json.dumps(['set', uuid_hex, type(scene_module).__name__, scene_module.name,
+                                                parent.uuid.hex if parent is not None else None, values])))
+
+        if lines:
+            self._queue.put(('lines', lines))
+
+    def modules_removed(self, identifiers):
+        """
+        Records the removal of modules
+
+        :param identifiers: List of module handles
+        """
+        if self._paused:
+            return
+
+        lines = []
+
+        for _id in identifiers:
+            uuid_bytes = self._uuids.pop(_id, None)
+
+            if uuid_bytes is not None:
+                uuid_hex = uuid_bytes.encode('hex')
+                lines.append((uuid_hex, json.dumps(['remove', uuid_hex])))
+
+        if lines:
+            self._queue.put(('lines', lines))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Writer thread
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _run(self):
+        """
+        Writes queued lines to the journal, flushing at most once per FLUSH_INTERVAL and taking a snapshot once
+        SNAPSHOT_LINES lines have been written since the last one.
+
+        Errors are printed and never end the thread. Once the journal could not be written, it is written again in
+        full from the next change on, until that succeeds.
+        """
+        journal_file = None
+        header = None
+        state = OrderedDict()       # UUID hex -> last line of the module
+        written = 0                 # Lines written since the last snapshot
+        unflushed = False
+        failed = False
+        last_flush = time.time()
+
+        while True:
+            try:
+                kind, data = self._queue.get(timeout=FLUSH_INTERVAL)
+            except Queue.Empty:
+                kind, data = None, None
+
+            try:
+                if kind == 'reset':
+                    header = data
+                    state.clear()
+
+                if kind == 'lines':
+                    for key, line in data:
+                        state.pop(key, None)
+                        state[key] = line
+
+                    if journal_file is not None:
+                        for key, line in data:
+                            journal_file.write(line + '\n')
+
+                        written += len(data)
+                        unflushed = True
+
+                snapshot = kind == 'reset' or (header is not None and journal_file is None and kind == 'lines') or \
+                    (written > SNAPSHOT_LINES and written > len(state))
+
+                if snapshot:
+                    # Never left holding a closed file, should the snapshot fail
+                    if journal_file is not None:
+                        closing, journal_file = journal_file, None
+                        closing.close()
+
+                    journal_file = self._write_snapshot(header, state)
+                    written = 0
+                    unflushed = False
+
+                if unflushed and (kind in ('sync', 'stop') or time.time() - last_flush >= FLUSH_INTERVAL):
+                    journal_file.flush()
+                    os.fsync(journal_file.fileno())
+                    unflushed = False
+                    last_flush = time.time()
+
+                failed = False
+
+            except Exception as error:
+                if journal_file is not None:
+                    try:
+                        journal_file.close()
+                    except Exception:
+                        pass
+
+                    journal_file = None
+
+                if not failed:
+                    print('Could not write the kAutoRigger journal "%s": %s' % (self.path, error))
+                    failed = True
+
+            if kind == 'sync':
+                data.set()
+
+            elif kind == 'stop':
+                try:
+                    if journal_file is not None:
+                        journal_file.close()
+
+                    if data and os.path.exists(self.path):
+                        os.remove(self.path)
+                except Exception as error:
+                    print('Could not close the kAutoRigger journal "%s": %s' % (self.path, error))
+
+                return
+
+    def _write_snapshot(self, header, state):
+        """
+        Replaces the journal with its header and the last line of each module, returning the new file open for
+        appending
+        """
+        temp_path = self.path + '.snapshot'
+
+        with open(temp_path, 'w') as snapshot_file:
+            snapshot_file.write(header + '\n')
+
+            for line in state.itervalues():
+                snapshot_file.write(line + '\n')
+
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+
+        KAR_rigFile.replace_file(temp_path, self.path)
+
+        return open(self.path, 'a')
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# RECOVERY
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+def read_journal(path=DEFAULT_PATH):
+    """
+    Reads a journal, keeping the last line of each module. A last line cut short by a crash is ignored.
+
+    :return Tuple: (header dictionary, OrderedDict {UUID hex: line as a list}), None if there is no journal
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as journal_file:
+        try:
+            header = json.loads(journal_file.readline())
+        except ValueError:
+            raise JournalError('Not a kAutoRigger journal')
+
+        if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+            raise JournalError('Not a kAutoRigger journal')
+
+        if header.get('version', 0) > FORMAT_VERSION:
+            raise JournalError('Journal was written by a newer version of kAutoRigger')
+
+        state = OrderedDict()
+
+        for line in journal_file:
+            try:
+                operation = json.loads(line)
+            except ValueError:
+                # Only the line being written when the session ended can be incomplete
+                break
+
+            state.pop(operation[1], None)
+            state[operation[1]] = operation
+
+    return header, state
+
+
+def has_changes(path=DEFAULT_PATH):
+    """
+    Returns the number of modules a journal would change if replayed, 0 if there is no journal to recover
+    """
+    try:
+        journal = read_journal(path)
+    except (IOError, JournalError):
+        return 0
+
+    return len(journal[1]) if journal is not None else 0
+
+
+def open_base(header, scene, module_types):
+    """
+    Replaces the scene's modules with those of the rig file a journal started from, or removes them all if it has
+    none. The journal's changes are then applied with apply_changes.
+
+    If the rig file has been saved since the journal was started (or compacted, see KAR_rigFile.RigFile), the
+    journal is still applied on top of it: it holds the whole state of each module it changed.
+
+    :param header: Dictionary: Journal header, see read_journal
+    :param scene: Scene to restore
+    :param module_types: Dictionary: {class name: module class}
+    :return KAR_rigFile.RigFile: The rig file opened, None if the journal has no base
+    """
+    base = header.get('base')
+
+    if base is None:
+        scene.clear()
+        return None
+
+    if not os.path.exists(base):
+        raise JournalError('"%s", which the journal started from, no longer exists' % base)
+
+    stat = os.stat(base)
+    if [stat.st_size, stat.st_mtime] != header.get('base_stamp'):
+        print('"%s" has been written since the journal was started, recovering on top of it..' % base)
+
+    rig_file = KAR_rigFile.RigFile(base)
+    rig_file.read(scene, module_types, clear=True)
+
+    return rig_file
+
+
+def apply_changes(scene, module_types, state):
+    """
+    Applies the last state recorded for each module by a journal, announcing every change in one set of
+    notifications
+
+    :param state: OrderedDict: {UUID hex: line}, see read_journal
+    """
+    with scene.batch():
+        _apply(scene, module_types, state)
+        scene.force_update()
+
+
+def _apply(scene, module_types, state):
+    """
+    Applies the last line recorded for each module to the scene
+    """
+    by_uuid = dict((scene_module.uuid_bytes, scene_module) for scene_module in scene.modules.itervalues())
+
+    removed = []
+    changed = []            # (module, line), in the order they were last recorded
+    new_modules = []
+
+    for uuid_hex, operation in state.iteritems():
+        uuid_bytes = uuid_hex.decode('hex')
+        scene_module = by_uuid.get(uuid_bytes)
+
+        if operation[0] == 'remove':
+            if scene_module is not None:
+                removed.append(scene_module.handle)
+            continue
+
+        kind, uuid_hex, class_name, name, parent_hex, attribute_values = operation
+        module_class = module_types.get(class_name)
+
+        if module_class is None:
+            print('Skipped module of unknown type: %s' % class_name)
+            continue
+
+        if scene_module is None or type(scene_module) is not module_class:
+            if scene_module is not None:
+                removed.append(scene_module.handle)
+
+            scene_module = module_class()
+            scene_module.handle = scene.new_handle()
+            scene_module.uuid = uuid_bytes
+            by_uuid[uuid_bytes] = scene_module
+            new_modules.append(scene_module)
+
+        changed.append((scene_module, operation))
+
+    scene.delete_modules(removed, trigger_update=False)
+
+    # Payloads still in the base rig file are read in one go, rather than one module at a time as they are changed
+    scene.load_payloads([scene_module.handle for scene_module, operation in changed])
+
+    # New modules are given their name and parent before they are added, so they are only announced once
+    new = set(new_modules)
+    for scene_module, operation in changed:
+        if scene_module in new:
+            parent = by_uuid.get(operation[4].decode('hex')) if operation[4] else None
+            scene_module.name = operation[3]
+            scene_module.parent = parent.handle if parent is not None else None
+
+    scene.add_modules(new_modules, trigger_update=False)
+
+    values = {}     # (module class, attribute name, value) -> handles of modules to set it for
+
+    for scene_module, operation in changed:
+        if scene_module not in new:
+            parent = by_uuid.get(operation[4].decode('hex')) if operation[4] else None
+            scene.rename_module(scene_module.handle, operation[3], trigger_update=False)
+            scene.reparent_module(scene_module.handle, parent.handle if parent is not None else None,
+                                  trigger_update=False)
+
+        # None while the module's settings were still those of the base rig file
+        for attribute_name, value in (operation[5] or {}).iteritems():
+            values.setdefault((type(scene_module), attribute_name, value), []).append(scene_module.handle)
+
+    for (module_class, attribute_name, value), identifiers in values.iteritems():
+        if attribute_name in KAR_attributes.get_schema(module_class):
+            scene.set_attributes(identifiers, attribute_name, value, trigger_update=False)
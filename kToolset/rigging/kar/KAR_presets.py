@@ -0,0 +1,493 @@
+# Python Imports
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+
+# KAR Imports
+import KAR_rigFile
+
+"""
+Preset library. A preset is a subtree of modules (i.e a biped arm with its hand and fingers) saved to its own file,
+which can be imported into any rig, any number of times.
+
+The library is a directory, which can be shared between users. Each preset file starts with a header line holding
+the preset's name, tags, module types and thumbnail, followed by one line per module in the same form as a JSON rig
+file (see KAR_rigFile), parents before their children, with parents given by their position in the preset. UUIDs
+are not saved, imported modules are given new ones.
+
+index.json holds the header and content hash of every preset, so the library can be listed and searched without
+opening a single preset. Presets that have been imported recently are kept in memory by content hash, so importing
+them again does not read the file, and a preset that has been saved again since is never taken from memory.
+Nothing in here depends on Qt or Maya.
+"""
+
+FORMAT_NAME = 'kAutoRigger preset'
+INDEX_FORMAT_NAME = 'kAutoRigger preset index'
+FORMAT_VERSION = 1
+
+PRESET_EXTENSION = '.karp'
+INDEX_FILE = 'index.json'
+
+# A library shared between users can be set with the KAR_PRESET_LIBRARY environment variable
+DEFAULT_DIRECTORY = os.environ.get('KAR_PRESET_LIBRARY',
+                                   os.path.join(os.path.expanduser('~'), 'kAutoRigger', 'presets'))
+
+# Presets kept in memory once read
+CACHE_SIZE = 20
+
+
+class PresetError(ValueError):
+    """
+    Raised when a preset does not exist or its file cannot be read
+    """
+    pass
+
+
+class PresetLibrary(object):
+    """
+    Directory of presets and its index, see the module docstring.
+
+    library = PresetLibrary()
+    library.save_preset(scene, 'Biped Arm', [arm_handle], tags=['biped', 'arm'])
+    library.search('arm', tags=['biped'])
+    library.import_preset(scene, 'Biped Arm', module_types, parent=spine_handle)
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, cache_size=CACHE_SIZE):
+        """
+        :param directory: String: Library directory, created when the first preset is saved
+        :param cache_size: Int: Number of presets kept in memory once read
+        """
+        self.directory = directory
+        self.cache_size = cache_size
+
+        self._index = {}                # preset name -> index entry
+        self._index_stamp = None        # (size, modification time) of index.json when last read, None if missing
+        self._index_read = False
+        self._cache = OrderedDict()     # content hash -> records, least recently used first
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Index
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def get_presets(self):
+        """
+        Returns the index entry of every preset, by name. Entries hold the preset's 'name', 'tags', 'module_types',
+        'modules' (count), 'thumbnail' (path or None), 'file', 'hash' and 'saved' (time).
+
+        :return Dictionary: {name: entry}
+        """
+        self._read_index()
+
+        return dict(self._index)
+
+    def get_preset(self, name):
+        """
+        Returns the index entry of a preset, None if the library has no preset of that name
+        """
+        self._read_index()
+
+        return self._index.get(name)
+
+    def search(self, text='', tags=(), module_types=()):
+        """
+        Returns the presets matching every given filter, read from the index only
+
+        :param text: String: Words that must each be part of the preset's name, one of its tags or one of its
+                     module types, case insensitive
+        :param tags: Iterable of tags the preset must all have, case insensitive
+        :param module_types: Iterable of module class names the preset must all contain
+        :return List: Index entries, sorted by name
+        """
+        self._read_index()
+
+        words = text.lower().split()
+        tags = set(tag.lower() for tag in tags)
+        module_types = set(module_types)
+
+        found = []
+
+        for entry in self._index.itervalues():
+            entry_tags = set(tag.lower() for tag in entry['tags'])
+
+            if not tags.issubset(entry_tags) or not module_types.issubset(entry['module_types']):
+                continue
+
+            keys = [entry['name'].lower()] + list(entry_tags) + [module_type.lower()
+                                                                 for module_type in entry['module_types']]
+
+            if all(any(word in key for key in keys) for word in words):
+                found.append(entry)
+
+        return sorted(found, key=lambda entry: entry['name'].lower())
+
+    def get_tags(self):
+        """
+        Returns every tag used in the library, sorted
+        """
+        self._read_index()
+
+        return sorted(set(tag for entry in self._index.itervalues() for tag in entry['tags']))
+
+    def get_thumbnail_path(self, entry):
+        """
+        Returns the path of a preset's thumbnail, None if it has none or the file no longer exists
+
+        :param entry: Dictionary: Index entry of the preset, see get_presets
+        """
+        if not entry['thumbnail']:
+            return None
+
+        path = os.path.join(self.directory, entry['thumbnail'])
+
+        return path if os.path.exists(path) else None
+
+    def rebuild_index(self):
+        """
+        Rebuilds the index from the headers of the preset files in the directory, i.e once preset files have been
+        copied into the library by hand
+
+        :return Int: Number of presets found
+        """
+        index = {}
+
+        if os.path.isdir(self.directory):
+            for file_name in sorted(os.listdir(self.directory)):
+                if not file_name.endswith(PRESET_EXTENSION):
+                    continue
+
+                try:
+                    with open(os.path.join(self.directory, file_name), 'rb') as preset_file:
+                        data = preset_file.read()
+
+                    header = json.loads(data.split('\n', 1)[0])
+                    _check_header(header)
+                except (IOError, ValueError) as error:
+                    print('Skipped preset "%s": %s' % (file_name, error))
+                    continue
+
+                index[header['name']] = _make_entry(header, file_name, hashlib.sha1(data).hexdigest(),
+                                                    os.path.getmtime(os.path.join(self.directory, file_name)))
+
+        try:
+            self._write_index(index)
+        except (IOError, OSError) as error:
+            # i.e a shared library the user cannot write to, the index is only kept in memory
+            print('Could not write the preset index "%s": %s' % (self.index_path, error))
+            self._index = index
+            self._index_stamp = _get_stamp(self.index_path)
+            self._index_read = True
+
+        return len(index)
+
+    def _read_index(self):
+        """
+        Reads index.json if it has changed since it was last read, i.e when another user has saved a preset
+        """
+        stamp = _get_stamp(self.index_path)
+
+        if self._index_read and stamp == self._index_stamp:
+            return
+
+        if stamp is None:
+            # Presets copied into a new library by hand are indexed the first time it is read
+            if os.path.isdir(self.directory) and any(file_name.endswith(PRESET_EXTENSION)
+                                                     for file_name in os.listdir(self.directory)):
+                self.rebuild_index()
+            else:
+                self._index = {}
+                self._index_stamp = None
+                self._index_read = True
+            return
+
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                data = json.load(index_file)
+
+            if data.get('format') != INDEX_FORMAT_NAME:
+                raise ValueError('Not a preset index')
+
+            index = data['presets']
+        except (IOError, ValueError, KeyError, AttributeError) as error:
+            print('Could not read the preset index "%s": %s, rebuilding it..' % (self.index_path, error))
+            self.rebuild_index()
+            return
+
+        self._index = index
+        self._index_stamp = stamp
+        self._index_read = True
+
+    def _write_index(self, index):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        data = OrderedDict((('format', INDEX_FORMAT_NAME), ('version', FORMAT_VERSION),
+                            ('presets', OrderedDict(sorted(index.iteritems())))))
+
+        temp_path = self.index_path + '.tmp'
+
+        with open(temp_path, 'wb') as index_file:
+            json.dump(data, index_file, indent=1)
+
+        KAR_rigFile.replace_file(temp_path, self.index_path)
+
+        self._index = index
+        self._index_stamp = _get_stamp(self.index_path)
+        self._index_read = True
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Saving
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def save_preset(self, scene, name, identifiers, tags=(), thumbnail=None):
+        """
+        Saves modules and everything parented underneath them as a preset, replacing any preset of the same name
+
+        :param scene: Scene holding the modules
+        :param name: String: Name of the preset
+        :param identifiers: Handles of the modules to save. Modules parented underneath another given module are
+                            saved as part of its subtree.
+        :param tags: Iterable of strings to search the preset by
+        :param thumbnail: String: Image shown for the preset, a path or relative to the library directory
+        :return Dictionary: Index entry of the preset
+        """
+        name = name.strip()
+
+        if not name:
+            raise PresetError('A preset needs a name')
+
+        lines, module_types = _get_lines(scene, identifiers)
+
+        if not lines:
+            raise PresetError('No modules to save')
+
+        if thumbnail and os.path.isabs(thumbnail) and \
+                os.path.abspath(thumbnail).startswith(os.path.abspath(self.directory) + os.sep):
+            thumbnail = os.path.relpath(thumbnail, self.directory)
+
+        header = OrderedDict((('format', FORMAT_NAME), ('version', FORMAT_VERSION), ('name', name),
+                              ('tags', sorted(set(tag.strip() for tag in tags if tag.strip()))),
+                              ('module_types', module_types), ('modules', len(lines)),
+                              ('thumbnail', thumbnail or None)))
+
+        data = '\n'.join([json.dumps(header)] + lines) + '\n'
+
+        # Read the index again just before writing it, so presets saved by others in the meantime are kept
+        self._index_read = False
+        self._read_index()
+        index = dict(self._index)
+
+        entry = index.get(name)
+        file_name = entry['file'] if entry is not None else self._new_file_name(name, index)
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        path = os.path.join(self.directory, file_name)
+        temp_path = path + '.tmp'
+
+        with open(temp_path, 'wb') as preset_file:
+            preset_file.write(data)
+
+        KAR_rigFile.replace_file(temp_path, path)
+
+        entry = index[name] = _make_entry(header, file_name, hashlib.sha1(data).hexdigest(), time.time())
+        self._write_index(index)
+
+        return entry
+
+    def remove_preset(self, name):
+        """
+        Deletes a preset and its file
+
+        :return Boolean: False if the library has no preset of that name
+        """
+        self._index_read = False
+        self._read_index()
+        index = dict(self._index)
+
+        entry = index.pop(name, None)
+
+        if entry is None:
+            return False
+
+        path = os.path.join(self.directory, entry['file'])
+        if os.path.exists(path):
+            os.remove(path)
+
+        self._write_index(index)
+
+        return True
+
+    def _new_file_name(self, name, index):
+        """
+        Returns a file name for a new preset, made from its name and not used by any other preset
+        """
+        base = re.sub(r'[^\w\-]+', '_', name).strip('_') or 'preset'
+        used = set(entry['file'].lower() for entry in index.itervalues())
+
+        file_name = base + PRESET_EXTENSION
+        number = 1
+
+        while file_name.lower() in used or os.path.exists(os.path.join(self.directory, file_name)):
+            number += 1
+            file_name = '%s_%s%s' % (base, number, PRESET_EXTENSION)
+
+        return file_name
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Importing
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def import_preset(self, scene, name, module_types, parent=None):
+        """
+        Adds the modules of a preset to a scene, each with a new UUID, in a single scene operation announced with
+        one modules_added signal
+
+        :param scene: Scene to add the modules to
+        :param name: String: Name of the preset
+        :param module_types: Dictionary: {class name: module class}
+        :param parent: Handle of module to add the preset's modules under, None to add them as roots
+        :return Int: Number of modules added
+        """
+        if parent is not None and scene.get_module(parent) is None:
+            raise PresetError('The module to import the preset under is not in the scene')
+
+        records = self.get_records(name)
+
+        return KAR_rigFile.add_records([(class_name, None, module_name, module_parent, values, positions, None)
+                                        for class_name, module_name, module_parent, values, positions in records],
+                                       scene, module_types, parent=parent)
+
+    def get_records(self, name):
+        """
+        Returns the modules of a preset, from memory if it has been read recently and not saved again since
+
+        :param name: String: Name of the preset
+        :return List: (class name, name, parent's position in preset, {attribute: value}, positions) per module
+        """
+        entry = self.get_preset(name)
+
+        if entry is None:
+            raise PresetError('There is no preset named "%s"' % name)
+
+        records = self._cache.pop(entry['hash'], None)
+
+        if records is None:
+            records = self._read_preset(entry)
+
+        self._cache[entry['hash']] = records
+
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return records
+
+    def _read_preset(self, entry):
+        path = os.path.join(self.directory, entry['file'])
+
+        try:
+            with open(path, 'rb') as preset_file:
+                lines = preset_file.read().split('\n')
+        except IOError as error:
+            raise PresetError('Could not read preset "%s": %s' % (entry['name'], error))
+
+        records = []
+
+        try:
+            _check_header(json.loads(lines[0]))
+
+            for line in lines[1:]:
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                records.append((record['type'], record['name'], record['parent'], record['attributes'],
+                                [tuple(point) for point in record.get('positions', ())]))
+        except (ValueError, KeyError, TypeError) as error:
+            raise PresetError('Preset "%s" is damaged: %s' % (entry['name'], error))
+
+        return records
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# HELPERS
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+def _get_lines(scene, identifiers):
+    """
+    Returns a JSON line per module of the given subtrees, parents before their children, and the class names used
+
+    :return Tuple: (List of strings, sorted list of class names)
+    """
+    graph = scene.graph
+    selected = set(_id for _id in identifiers if _id in graph)
+
+    # Modules underneath another selected module are saved with its subtree
+    roots = [_id for _id in OrderedDict.fromkeys(identifiers)
+             if _id in selected and not any(ancestor in selected for ancestor in graph.ancestors(_id))]
+
+    order = []
+    for root in roots:
+        order.append(root)
+        order.extend(graph.descendants(root))
+
+    scene.load_payloads(order)
+
+    # The parents of the roots are never part of the preset, so they are saved without one
+    positions = {}
+    lines = []
+    module_types = set()
+
+    for position, _id in enumerate(order):
+        positions[_id] = position
+        scene_module = scene.get_module(_id)
+        module_types.add(type(scene_module).__name__)
+
+        record = OrderedDict((('type', type(scene_module).__name__),
+                              ('name', scene_module.name),
+                              ('parent', positions.get(scene_module.parent)),
+                              ('attributes', scene.get_attribute_values(_id))))
+
+        module_positions = scene.get_placement_positions(_id)
+        if module_positions:
+            record['positions'] = module_positions
+
+        lines.append(json.dumps(record))
+
+    return lines, sorted(module_types)
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime
+
+
+def _make_entry(header, file_name, content_hash, saved):
+    return OrderedDict((('name', header['name']), ('tags', header.get('tags', [])),
+                        ('module_types', header.get('module_types', [])), ('modules', header.get('modules', 0)),
+                        ('thumbnail', header.get('thumbnail')), ('file', file_name), ('hash', content_hash),
+                        ('saved', saved)))
+
+
+def _check_header(header):
+    if not isinstance(header, dict) or header.get('format') != FORMAT_NAME or not header.get('name'):
+        raise ValueError('Not a kAutoRigger preset')
+
+    if header.get('version', 0) > FORMAT_VERSION:
+        raise ValueError('Preset was written by a newer version of kAutoRigger')
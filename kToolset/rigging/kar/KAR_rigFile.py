@@ -0,0 +1,916 @@
+# Python Imports
+import json
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+
+# KAR Imports
+import KAR_attributes
+
+"""
+Reading and writing rig files. A rig file holds every module of a scene (its class, name, UUID and parent), the
+values of its attributes and the positions of its placement system, if it has any.
+
+Rigs can be written in two formats:
+
+JSON: A header line followed by one line per module. Easy to read and to compare between versions of a rig.
+Binary: The same records packed with struct, around a third of the size and quicker to read.
+
+Both are written one module at a time, parents before their children, so saving a rig never holds more than the
+scene itself plus the record being processed. JSON files are read in full, a module at a time. Binary files end with
+an index of the modules, which is all that is read when the file is opened; the rest of each module is read when it
+is first needed. Which format a file is in is read from the file itself, not from its extension. Nothing in here
+depends on Qt or Maya.
+
+Rigs are opened and saved through a RigFile. A binary rig opened or saved through a RigFile is saved again by
+appending only the modules changed since, see RigFile.save.
+"""
+
+FORMAT_NAME = 'kAutoRigger rig'
+FORMAT_VERSION = 3
+
+JSON_EXTENSION = '.json'
+BINARY_EXTENSION = '.kar'
+
+# Binary files are compacted once this fraction of the file is taken by records that have been replaced, or once
+# this many saves have been appended since the file was last written in full
+COMPACT_RATIO = 0.3
+MAX_SEGMENTS = 50
+
+# BINARY LAYOUT (little endian)
+# Preamble: magic, format version, flags (unused), module count, offset of the newest index segment, bytes taken by
+#           replaced records, number of index segments
+# Payloads: one per module: attribute values, position count, positions (x, y, z)
+# Index segment: offset of the previous segment (0 for none) and length of the segment, then the class count,
+#                each class' name, attribute count and each attribute's name and struct format character, then the
+#                module count and each module's class id, UUID bytes, parent's UUID bytes (all 0 for none), payload
+#                offset and length, and name, then the count and UUID bytes of the modules removed
+#
+# Saving a rig in full writes every payload followed by a single index segment. Saving it again appends the
+# payloads of the modules changed since, followed by a segment listing only those modules and the modules removed,
+# then points the preamble at the new segment. When reading, segments are followed from the newest and the newest
+# record of each module is used.
+#
+# The index is small and holds everything needed to show a rig, so a rig can be opened by reading only the
+# preamble and index. Payloads are read when they are needed, see RigFile.load.
+BINARY_MAGIC = 'KARB'
+_PREAMBLE = struct.Struct('<4sHHIQQI')
+_SEGMENT = struct.Struct('<QI')
+_INDEX_ENTRY = struct.Struct('<H16s16sQI')
+_COUNT = struct.Struct('<I')
+_LENGTH = struct.Struct('<H')
+_POSITION = struct.Struct('<3d')
+_NO_PARENT = '\0' * 16
+
+# struct format character each kind of attribute is written with
+_STRUCT_FORMATS = {'int': 'i', 'float': 'd', 'bool': '?', 'enum': 'H'}
+
+
+class RigFileError(ValueError):
+    """
+    Raised when a file is not a rig file, was written by a newer version or has been cut short
+    """
+    pass
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# RIG FILE
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class RigFile(object):
+    """
+    A rig file a scene is opened from and saved to.
+
+    A binary rig that was opened from or saved to the same RigFile is saved again by appending the modules changed
+    since (see Scene.get_changes) and patching the preamble, so saving costs about the size of the change rather
+    than of the rig. The records they replace are left where they are until the file is compacted, which is done
+    on a background thread once they take too much of it (see COMPACT_RATIO and MAX_SEGMENTS).
+
+    The RigFile also reads the payloads (attribute values and placement positions) of the modules it opened when
+    the scene first needs them, see Scene.defer_payloads. If the file has been changed by something else since, the
+    payloads are no longer where the index said they were, so they are not read and the modules keep their default
+    values.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: String: Rig file
+        """
+        self.path = path
+
+        self._stamp = None              # (size, modification time) of the file when last read or written by us
+        self._footprints = None         # module handle -> bytes taken by its payload and index entry, None if the
+                                        # next save has to write the whole file
+        self._locations = {}            # module handle -> (payload offset, payload length, class) of unread payloads
+        self._structs = {}              # struct format -> struct.Struct of payload values
+
+        # Held while payloads are read or the file is swapped for its compacted copy
+        self._lock = threading.Lock()
+        self._compactor = None
+
+    @property
+    def binary(self):
+        """
+        True if the file is written in the binary format when not told otherwise
+        """
+        return not self.path.lower().endswith(JSON_EXTENSION)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Reading
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def read(self, scene, module_types, clear=False):
+        """
+        Adds the modules of the file to a scene, announcing them with a single modules_added signal.
+
+        For binary files only the index is read. The modules' attribute values and placement positions stay in the
+        file until they are first asked for, see Scene.defer_payloads.
+
+        Modules of a class that is not in module_types are skipped, and their children added without a parent.
+        Attributes the module class no longer has are ignored.
+
+        :param scene: Scene to add the modules to, usually an empty one
+        :param module_types: Dictionary: {class name: module class}
+        :param clear: Boolean: Delete the scene's modules once the file has been read, before its modules are added.
+                      The scene is then in step with the file, so its next save only appends what changed. If the
+                      file cannot be read, the scene is left as it was.
+        :return Int: Number of modules added
+        """
+        self.wait()
+
+        with open(self.path, 'rb') as rig_file:
+            header = rig_file.read(len(BINARY_MAGIC) + _LENGTH.size)
+            rig_file.seek(0)
+
+            binary = header.startswith(BINARY_MAGIC)
+            records = self._read_index(rig_file) if binary else _read_json(rig_file)
+
+            with self._lock:
+                self._stamp = _get_stamp(self.path)
+                self._locations = {}
+                # Only binary files can be appended to, JSON files are written in full on every save
+                self._footprints = {} if clear and binary else None
+
+            count = add_records(records, scene, module_types, clear=clear)
+
+        if clear:
+            scene.mark_saved()
+
+        return count
+
+    def _read_index(self, rig_file):
+        """
+        Returns a record per module in the index, pointing at its payload
+        """
+        records = _read_segments(rig_file)
+
+        positions = dict((record[1], position) for position, record in enumerate(records))
+
+        return [(class_info[0], uuid_bytes, name, positions.get(parent), None, None,
+                 (self, class_info, offset, length, footprint))
+                for class_info, uuid_bytes, parent, name, offset, length, footprint in records]
+
+    def add(self, identifier, class_info, offset, length, footprint):
+        """
+        Records where the payload of a module added to the scene is
+
+        :param identifier: Handle of module
+        :param class_info: Tuple: (class name, attribute names, struct format characters) of the payload
+        :param offset: Int: Position of the payload in the file
+        :param length: Int: Bytes taken by the payload
+        :param footprint: Int: Bytes taken by the payload and index entry
+        """
+        self._locations[identifier] = (offset, length, class_info)
+
+        if self._footprints is not None:
+            self._footprints[identifier] = footprint
+
+    def load(self, identifiers):
+        """
+        Reads the payloads of the given modules, in file order. Each payload is only read once.
+
+        Nothing is marked as read unless every payload could be read, so a failed read can be tried again and the
+        modules are never left holding default values in place of their saved ones.
+
+        :param identifiers: Iterable of module handles
+        :return Dictionary: {handle: ({attribute name: value}, [(x, y, z), ...])}
+        :raises RigFileError: If the file has been changed by something else since it was opened, or is damaged
+        """
+        with self._lock:
+            locations = sorted((self._locations[_id], _id) for _id in identifiers if _id in self._locations)
+
+            if not locations:
+                return {}
+
+            if _get_stamp(self.path) != self._stamp:
+                raise RigFileError('"%s" has changed since it was opened, the settings of %s modules can no longer be '
+                                   'read from it. Open the rig again.' % (self.path, len(locations)))
+
+            payloads = {}
+
+            with open(self.path, 'rb') as rig_file:
+                for (offset, length, class_info), _id in locations:
+                    rig_file.seek(offset)
+                    data = rig_file.read(length)
+
+                    values_struct = self._structs.get(class_info[2])
+                    if values_struct is None:
+                        values_struct = self._structs[class_info[2]] = struct.Struct('<' + class_info[2])
+
+                    try:
+                        values = dict(zip(class_info[1], values_struct.unpack_from(data, 0)))
+
+                        position = values_struct.size
+                        count = _LENGTH.unpack_from(data, position)[0]
+                        position += _LENGTH.size
+
+                        positions = [_POSITION.unpack_from(data, position + i * _POSITION.size)
+                                     for i in xrange(count)]
+                    except struct.error:
+                        raise RigFileError('"%s" is damaged, the settings of a module cannot be read' % self.path)
+
+                    payloads[_id] = (values, positions)
+
+            for _id in payloads:
+                del self._locations[_id]
+
+        return payloads
+
+    def has_unreadable(self):
+        """
+        Returns True if payloads of modules opened from the file have not been read yet and the file has been
+        changed by something else since, so they can no longer be read
+        """
+        with self._lock:
+            return bool(self._locations) and _get_stamp(self.path) != self._stamp
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Writing
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def save(self, scene, binary=None):
+        """
+        Writes a scene to the file.
+
+        If the scene was read from or last saved to this file with the binary format, and nothing else has changed
+        the file since, only the modules changed since then are written: their payloads and a new index segment are
+        appended and the preamble is pointed at the segment. The preamble is only written once everything it points
+        at is on disk. Otherwise the whole file is written to a temporary file which then replaces it. Either way a
+        save that is cut short leaves the rig as it was last saved.
+
+        :param scene: Scene to save
+        :param binary: Boolean: Write the binary format, chosen by the file's extension if None
+        :return Int: Number of modules written
+        :raises RigFileError: If the settings of modules still in a rig file can no longer be read, see load()
+        """
+        if binary is None:
+            binary = self.binary
+
+        # Never write while the file is being compacted
+        self.wait()
+
+        # Saving would write the default values of those modules over their saved ones
+        if self.has_unreadable():
+            raise RigFileError('"%s" has changed since it was opened and the settings of some modules have not been '
+                               'read from it yet, saving would lose them. Open the rig again.' % self.path)
+
+        if binary and self._footprints is not None and _get_stamp(self.path) == self._stamp:
+            return self._append(scene)
+
+        # Read anything still in the rig file first, it may be the file being written
+        scene.load_payloads()
+
+        temp_path = self.path + '.tmp'
+
+        try:
+            with open(temp_path, 'wb') as rig_file:
+                if binary:
+                    footprints = _write_binary(rig_file, scene)
+                    count = len(footprints)
+                else:
+                    footprints = None
+                    count = _write_json(rig_file, scene)
+
+                rig_file.flush()
+                os.fsync(rig_file.fileno())
+
+            with self._lock:
+                replace_file(temp_path, self.path)
+
+                self._stamp = _get_stamp(self.path)
+                self._locations = {}
+                self._footprints = footprints
+        finally:
+            # Only left behind if the save failed
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        scene.mark_saved()
+
+        return count
+
+    def _append(self, scene):
+        """
+        Appends the modules changed since the last save, see save()
+        """
+        modified, removed = scene.get_changes()
+
+        # Modules deleted before their payloads were read will never need them
+        with self._lock:
+            for _id in removed:
+                if _id not in scene.modules:
+                    self._locations.pop(_id, None)
+
+        identifiers = [_id for _id in modified if _id in scene.modules]
+        # Modules removed and added back are both removed and written, which moves them to where they now are
+        removed = [(_id, uuid_bytes) for _id, uuid_bytes in removed.iteritems() if _id in self._footprints]
+
+        if not identifiers and not removed:
+            return 0
+
+        # Read the changed modules before the file grows, their payloads are still in it
+        scene.load_payloads(identifiers)
+
+        # Should anything go wrong the next save writes the whole file
+        footprints, self._footprints = self._footprints, None
+
+        with open(self.path, 'r+b') as rig_file:
+            magic, version, flags, count, index_offset, dead, segments = _unpack(rig_file, _PREAMBLE)
+
+            rig_file.seek(0, os.SEEK_END)
+            segment_offset, written = _write_segment(rig_file, scene, identifiers, rig_file.tell(), index_offset,
+                                                     [uuid_bytes for _id, uuid_bytes in removed])
+            size = rig_file.tell()
+
+            # The records replaced are dead weight until the file is compacted
+            for _id, uuid_bytes in removed:
+                dead += footprints.pop(_id) + len(uuid_bytes)
+
+            for _id in identifiers:
+                dead += footprints.get(_id, 0)
+
+            footprints.update(written)
+
+            rig_file.flush()
+            os.fsync(rig_file.fileno())
+
+            rig_file.seek(0)
+            rig_file.write(_PREAMBLE.pack(magic, version, flags, len(footprints), segment_offset, dead, segments + 1))
+
+        with self._lock:
+            self._footprints = footprints
+            self._stamp = _get_stamp(self.path)
+
+        scene.mark_saved()
+
+        if dead > size * COMPACT_RATIO or segments + 1 >= MAX_SEGMENTS:
+            self.compact()
+
+        return len(identifiers)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Compaction
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def compact(self, background=True):
+        """
+        Rewrites a binary file with only its current records, dropping those replaced by later saves.
+
+        The file is copied record by record to a temporary file which then replaces it, so the scene is not needed
+        and can be edited while this runs. If the file is changed in the meantime the copy is thrown away.
+
+        :param background: Boolean: Compact on a separate thread, see wait()
+        """
+        self.wait()
+
+        if not background:
+            self._compact()
+            return
+
+        self._compactor = threading.Thread(target=self._compact, name='Compact %s' % os.path.basename(self.path))
+        self._compactor.daemon = True
+        self._compactor.start()
+
+    def wait(self):
+        """
+        Waits for the file to finish being compacted, if it is
+        """
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _compact(self):
+        temp_path = self.path + '.compacting'
+
+        with self._lock:
+            stamp = self._stamp
+
+        try:
+            with open(self.path, 'rb') as rig_file:
+                records = _read_segments(rig_file)
+
+                with open(temp_path, 'wb') as compacted_file:
+                    moved = _write_compacted(rig_file, compacted_file, records)
+
+            with self._lock:
+                if _get_stamp(self.path) != stamp:
+                    print('"%s" has changed while it was compacted, leaving it as it is..' % self.path)
+                    os.remove(temp_path)
+                    return
+
+                replace_file(temp_path, self.path)
+                self._stamp = _get_stamp(self.path)
+
+                # Payloads the compacted file no longer holds belong to modules removed from it
+                self._locations = dict((_id, (moved[offset], length, class_info))
+                                       for _id, (offset, length, class_info) in self._locations.iteritems()
+                                       if offset in moved)
+
+        except (IOError, OSError, RigFileError) as error:
+            print('Could not compact rig "%s": %s' % (self.path, error))
+
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# WRITING
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+def iter_modules(scene):
+    """
+    Yields (position in file, module, parent's position in file or None) for every module of a scene, parents
+    before their children
+    """
+    positions = {}
+
+    for position, _id in enumerate(scene.graph.topological_order()):
+        positions[_id] = position
+        scene_module = scene.get_module(_id)
+
+        yield position, scene_module, positions.get(scene_module.parent)
+
+
+def _write_json(rig_file, scene):
+    header = OrderedDict((('format', FORMAT_NAME), ('version', FORMAT_VERSION), ('modules', len(scene.modules))))
+    rig_file.write(json.dumps(header) + '\n')
+
+    count = 0
+
+    for position, scene_module, parent in iter_modules(scene):
+        record = OrderedDict((('uuid', scene_module.uuid.hex),
+                              ('type', type(scene_module).__name__),
+                              ('name', scene_module.name),
+                              ('parent', parent),
+                              ('attributes', scene.get_attribute_values(scene_module.handle))))
+
+        module_positions = scene.get_placement_positions(scene_module.handle)
+        if module_positions:
+            record['positions'] = module_positions
+
+        rig_file.write(json.dumps(record) + '\n')
+        count += 1
+
+    return count
+
+
+def _write_binary(rig_file, scene):
+    """
+    :return Dictionary: {module handle: bytes taken by its payload and index entry}
+    """
+    # The index offset is only known once every payload has been written, so the preamble is filled in last
+    rig_file.write(_PREAMBLE.pack(BINARY_MAGIC, FORMAT_VERSION, 0, 0, 0, 0, 0))
+
+    segment_offset, footprints = _write_segment(rig_file, scene, scene.graph.topological_order(), _PREAMBLE.size)
+
+    rig_file.seek(0)
+    rig_file.write(_PREAMBLE.pack(BINARY_MAGIC, FORMAT_VERSION, 0, len(footprints), segment_offset, 0, 1))
+
+    return footprints
+
+
+def _write_segment(rig_file, scene, identifiers, offset, previous=0, removed=()):
+    """
+    Writes the payloads of the given modules at offset, the current position of rig_file, followed by an index
+    segment listing them and the removed modules
+
+    :param previous: Int: Offset of the previous index segment, 0 for none
+    :param removed: List of UUID bytes of modules removed
+    :return Tuple: (offset of the segment, {module handle: bytes taken by its payload and index entry})
+    """
+    classes = OrderedDict()     # Module class -> (class id, attributes, values struct)
+    entries = []
+    footprints = {}
+
+    for _id in identifiers:
+        scene_module = scene.get_module(_id)
+        module_class = type(scene_module)
+        class_record = classes.get(module_class)
+        values = scene.get_attribute_values(_id)
+
+        if class_record is None:
+            schema = KAR_attributes.get_schema(module_class)
+            attributes = [schema[name] for name in values]
+            class_record = classes[module_class] = (len(classes), attributes, _values_struct(attributes))
+
+        class_id, attributes, values_struct = class_record
+        module_positions = scene.get_placement_positions(_id)
+
+        payload = (values_struct.pack(*[attribute.validate(values[attribute.name]) for attribute in attributes]) +
+                   _LENGTH.pack(len(module_positions)) +
+                   ''.join(_POSITION.pack(*point) for point in module_positions))
+        rig_file.write(payload)
+
+        parent = scene.get_module(scene_module.parent)
+        entry = (_INDEX_ENTRY.pack(class_id, scene_module.uuid.bytes,
+                                   _NO_PARENT if parent is None else parent.uuid.bytes, offset, len(payload)) +
+                 _pack_string(scene_module.name))
+
+        entries.append(entry)
+        footprints[_id] = len(payload) + len(entry)
+        offset += len(payload)
+
+    class_infos = [(module_class.__name__, [attribute.name for attribute in attributes],
+                    ''.join(_STRUCT_FORMATS[attribute.kind] for attribute in attributes))
+                   for module_class, (class_id, attributes, values_struct) in classes.iteritems()]
+
+    rig_file.write(_pack_segment(previous, class_infos, entries, removed))
+
+    return offset, footprints
+
+
+def _write_compacted(rig_file, compacted_file, records):
+    """
+    Copies the payload of each record to compacted_file, followed by a single index segment listing them all
+
+    :param records: List as returned by _read_segments
+    :return Dictionary: {payload offset in rig_file: payload offset in compacted_file}
+    """
+    compacted_file.write(_PREAMBLE.pack(BINARY_MAGIC, FORMAT_VERSION, 0, 0, 0, 0, 0))
+
+    classes = OrderedDict()     # class -> class id
+    entries = []
+    moved = {}
+    offset = _PREAMBLE.size
+
+    for class_info, uuid_bytes, parent, name, payload_offset, length, footprint in records:
+        rig_file.seek(payload_offset)
+        payload = rig_file.read(length)
+
+        if len(payload) < length:
+            raise RigFileError('Rig file is incomplete')
+
+        compacted_file.write(payload)
+
+        class_id = classes.setdefault(class_info, len(classes))
+        entries.append(_INDEX_ENTRY.pack(class_id, uuid_bytes, parent or _NO_PARENT, offset, length) +
+                       _pack_string(name))
+
+        moved[payload_offset] = offset
+        offset += length
+
+    compacted_file.write(_pack_segment(0, list(classes), entries, ()))
+
+    compacted_file.seek(0)
+    compacted_file.write(_PREAMBLE.pack(BINARY_MAGIC, FORMAT_VERSION, 0, len(entries), offset, 0, 1))
+
+    return moved
+
+
+def _pack_segment(previous, classes, entries, removed):
+    """
+    :param classes: List of (class name, attribute names, struct format characters), by class id
+    :param entries: List of packed index entries
+    :param removed: List of UUID bytes
+    """
+    data = [_LENGTH.pack(len(classes))]
+
+    for class_name, names, formats in classes:
+        data.append(_pack_string(class_name) + _LENGTH.pack(len(names)))
+        data.extend(_pack_string(name) + format_character for name, format_character in zip(names, formats))
+
+    data.append(_COUNT.pack(len(entries)))
+    data.extend(entries)
+    data.append(_COUNT.pack(len(removed)))
+    data.extend(removed)
+
+    data = ''.join(data)
+
+    return _SEGMENT.pack(previous, len(data)) + data
+
+
+def _values_struct(attributes):
+    return struct.Struct('<' + ''.join(_STRUCT_FORMATS[attribute.kind] for attribute in attributes))
+
+
+def _pack_string(text):
+    data = text.encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+
+def replace_file(source, target):
+    """
+    Moves source over target, replacing it
+    """
+    try:
+        os.rename(source, target)
+    except OSError:
+        # Windows will not rename over an existing file
+        os.remove(target)
+        os.rename(source, target)
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# READING
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+def add_records(records, scene, module_types, clear=False, parent=None):
+    """
+    Creates a module for each record and adds them all to the scene in one go, announcing them with a single
+    modules_added signal. Used to open rig files and to import presets, see KAR_presets.
+
+    Every module is given its handle as soon as it is created, so parents are resolved from the handles of the
+    modules before it without a second pass.
+
+    :param records: Iterable of (class name, UUID bytes, name, parent's position in file, {attribute: value},
+                    positions, payload), parents before their children. UUID bytes can be None to give the module
+                    a new UUID. payload is None if the values and positions are given, otherwise (RigFile, ...) to
+                    read them from later, see RigFile.add.
+    :param clear: Boolean: Delete the scene's modules before the records' modules are added
+    :param parent: Handle of module the records without a parent are added under, None to add them as roots.
+                   Must not be one of the modules deleted by clear.
+    :return Int: Number of modules added
+    """
+    new_modules = []
+    handles = []            # Handle of each record, None for skipped records
+    values = {}             # (module class, attribute name, value) -> handles of modules to set it for
+    positions = {}
+    deferred = {}           # RigFile -> handles of modules it holds the payload of
+    skipped = set()
+
+    for class_name, uuid_bytes, name, record_parent, attribute_values, module_positions, payload in records:
+        module_class = module_types.get(class_name)
+
+        if module_class is None:
+            skipped.add(class_name)
+            handles.append(None)
+            continue
+
+        scene_module = module_class()
+        scene_module.handle = scene.new_handle()
+        scene_module.uuid = uuid_bytes
+        scene_module.name = name
+        # Records whose parent was skipped are added as if they had none
+        parent_handle = handles[record_parent] if record_parent is not None and record_parent < len(handles) else None
+        scene_module.parent = parent if parent_handle is None else parent_handle
+
+        handles.append(scene_module.handle)
+        new_modules.append(scene_module)
+
+        if payload is not None:
+            loader = payload[0]
+            loader.add(scene_module.handle, *payload[1:])
+            deferred.setdefault(loader, []).append(scene_module.handle)
+            continue
+
+        for attribute_name, value in attribute_values.iteritems():
+            values.setdefault((module_class, attribute_name, value), []).append(scene_module.handle)
+
+        if module_positions:
+            positions[scene_module.handle] = module_positions
+
+    if skipped:
+        print('Skipped modules of unknown type: %s' % ', '.join(sorted(skipped)))
+
+    with scene.batch():
+        if clear:
+            scene.clear(trigger_update=False)
+
+        scene.add_modules(new_modules, trigger_update=False)
+
+        # Modules sharing a value are set together, and values left at their default are not set at all
+        for (module_class, attribute_name, value), identifiers in values.iteritems():
+            attribute = KAR_attributes.get_schema(module_class).get(attribute_name)
+
+            if attribute is not None and attribute.default != attribute.validate(value):
+                scene.set_attributes(identifiers, attribute_name, value, trigger_update=False)
+
+        for _id, module_positions in positions.iteritems():
+            scene.set_placement_positions(_id, module_positions)
+
+        for loader, identifiers in deferred.iteritems():
+            scene.defer_payloads(identifiers, loader)
+
+        scene.force_update()
+
+    return len(new_modules)
+
+
+def _read_json(rig_file):
+    try:
+        header = json.loads(rig_file.readline())
+    except ValueError:
+        raise RigFileError('Not a rig file')
+
+    _check_header(header.get('format'), header.get('version'))
+
+    count = 0
+
+    for line_number, line in enumerate(rig_file, 2):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+            record = (record['type'], uuid.UUID(hex=record['uuid']).bytes, record['name'], record['parent'],
+                      record['attributes'], [tuple(point) for point in record.get('positions', ())], None)
+        except (ValueError, KeyError, TypeError):
+            raise RigFileError('Rig file is damaged, line %s cannot be read' % line_number)
+
+        yield record
+        count += 1
+
+    if count < header.get('modules', 0):
+        raise RigFileError('Rig file is incomplete, %s of %s modules read' % (count, header['modules']))
+
+
+def _read_segments(rig_file):
+    """
+    Reads the index of a binary rig file. Segments are read from the newest, and the newest
+    record of each module is used unless a later segment removed the module.
+
+    Modules keep the place they were first saved at, so saving a module again does not move it among its siblings.
+
+    :return List: (class, UUID bytes, parent's UUID bytes or None, name, payload offset, payload length, footprint)
+                  per module, parents before their children. class is (class name, attribute names, struct format
+                  characters) and footprint the bytes taken by the payload and index entry.
+    """
+    magic, version, flags, count, segment_offset, dead, segment_count = _unpack(rig_file, _PREAMBLE)
+
+    _check_header(FORMAT_NAME, version)
+
+    if version != FORMAT_VERSION:
+        raise RigFileError('Rig file was saved in an unsupported format (%s)' % version)
+
+    segments = []       # (records, removed UUID bytes), newest first
+    visited = set()
+
+    try:
+        while segment_offset:
+            if segment_offset in visited:
+                raise RigFileError('Rig file is damaged, its index loops')
+
+            visited.add(segment_offset)
+            rig_file.seek(segment_offset)
+
+            previous, length = _unpack(rig_file, _SEGMENT)
+            data = rig_file.read(length)
+
+            segments.append(_parse_segment(data))
+            segment_offset = previous
+
+    except (struct.error, IndexError):
+        raise RigFileError('Rig file is incomplete or damaged, its index cannot be read')
+
+    current = {}
+    removed = set()
+
+    for records, segment_removed in segments:
+        for record in records:
+            if record[1] not in current and record[1] not in removed:
+                current[record[1]] = record
+
+        removed.update(segment_removed)
+
+    # Modules are placed by the record they were added or last re-parented with, matching where the scene puts
+    # them: at the end of their parent's children
+    order = OrderedDict()       # UUID bytes -> parent's UUID bytes
+    for records, segment_removed in reversed(segments):
+        for uuid_bytes in segment_removed:
+            order.pop(uuid_bytes, None)
+
+        for record in records:
+            uuid_bytes = record[1]
+
+            if uuid_bytes not in current:
+                continue
+
+            if uuid_bytes in order and order[uuid_bytes] != record[2]:
+                del order[uuid_bytes]
+
+            order[uuid_bytes] = record[2]
+
+    # Each root followed by its subtree, depth first, as SceneGraph.topological_order
+    roots = []
+    children = {}
+
+    for uuid_bytes, parent in order.iteritems():
+        if parent in current:
+            children.setdefault(parent, []).append(uuid_bytes)
+        else:
+            roots.append(uuid_bytes)
+
+    sorted_records = []
+    stack = roots[::-1]
+
+    while stack:
+        uuid_bytes = stack.pop()
+        sorted_records.append(current[uuid_bytes])
+        stack.extend(children.get(uuid_bytes, ())[::-1])
+
+    return sorted_records
+
+
+def _parse_segment(data):
+    """
+    :return Tuple: ([record, ...], [removed UUID bytes, ...]), see _read_segments
+    """
+    class_count = _LENGTH.unpack_from(data, 0)[0]
+    position = _LENGTH.size
+
+    classes = []
+    for class_id in xrange(class_count):
+        class_name, position = _unpack_string(data, position)
+        attribute_count = _LENGTH.unpack_from(data, position)[0]
+        position += _LENGTH.size
+
+        names = []
+        formats = []
+        for i in xrange(attribute_count):
+            name, position = _unpack_string(data, position)
+            names.append(name)
+            formats.append(data[position])
+            position += 1
+
+        classes.append((class_name, tuple(names), ''.join(formats)))
+
+    count = _COUNT.unpack_from(data, position)[0]
+    position += _COUNT.size
+
+    records = []
+    for i in xrange(count):
+        start = position
+        class_id, uuid_bytes, parent, payload_offset, payload_length = _INDEX_ENTRY.unpack_from(data, position)
+        name, position = _unpack_string(data, position + _INDEX_ENTRY.size)
+
+        if parent == _NO_PARENT:
+            parent = None
+
+        records.append((classes[class_id], uuid_bytes, parent, name, payload_offset, payload_length,
+                        payload_length + position - start))
+
+    removed_count = _COUNT.unpack_from(data, position)[0]
+    position += _COUNT.size
+
+    if position + removed_count * 16 > len(data):
+        raise IndexError('Removed modules run past the end of the segment')
+
+    return records, [data[position + i * 16:position + i * 16 + 16] for i in xrange(removed_count)]
+
+
+def _check_header(format_name, version):
+    if format_name != FORMAT_NAME:
+        raise RigFileError('Not a rig file')
+
+    if version > FORMAT_VERSION:
+        raise RigFileError('Rig file was saved by a newer version of kAutoRigger (format %s)' % version)
+
+
+def _unpack(rig_file, unpacker):
+    data = rig_file.read(unpacker.size)
+
+    if len(data) < unpacker.size:
+        raise RigFileError('Rig file is incomplete')
+
+    return unpacker.unpack(data)
+
+
+def _unpack_string(data, position):
+    """
+    Returns the string packed at position in data, and the position after it
+    """
+    length = _LENGTH.unpack_from(data, position)[0]
+    position += _LENGTH.size
+
+    if position + length > len(data):
+        raise IndexError('String runs past the end of the data')
+
+    return data[position:position + length].decode('utf-8'), position + length
+
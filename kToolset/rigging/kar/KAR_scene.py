@@ -1,18 +1,99 @@
+# Python Imports
+import itertools
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# PySide Imports
 import PySide.QtCore as qc
 
+# KAR Imports
+import KAR_sceneGraph; reload(KAR_sceneGraph)
+import KAR_sceneIndex; reload(KAR_sceneIndex)
+import KAR_attributes; reload(KAR_attributes)
+
 
 class Scene(qc.QObject):
     """
     Container class that manages the current modules and the scene hierarchy
+
+    Every change to the scene is announced by a signal carrying the handles of the affected modules, so each part of
+    the UI can listen for only the changes it displays and update just the affected modules:
+
+    modules_added: handles of modules added to the scene
+    modules_removed: handles of modules removed from the scene
+    module_reparented: handles of modules whose parent changed
+    module_renamed: handles of modules whose name changed
+    attributes_changed: handles of modules whose attributes changed
+
+    scene_updated is still emitted after any change made with trigger_update=True, for listeners that simply
+    re-read the whole scene.
+
+    Signals are not emitted straight away. Changes are merged and dispatched once per turn of the event loop, or
+    once at the end of a batch (see batch()), so each signal is emitted at most once per dispatch no matter how
+    many modules were changed.
     """
 
+    # Order signals are dispatched in. New modules first so re-parented modules can find their new parent,
+    # removed modules last so modules orphaned by them are moved away first.
+    _DISPATCH_ORDER = ('modules_added', 'module_reparented', 'module_renamed', 'attributes_changed',
+                       'modules_removed')
+
     scene_updated = qc.Signal()
 
+    modules_added = qc.Signal(list)
+    modules_removed = qc.Signal(list)
+    module_reparented = qc.Signal(list)
+    module_renamed = qc.Signal(list)
+    attributes_changed = qc.Signal(list)
+
     def __init__(self):
         super(Scene, self).__init__()
-        # Stores all currently added modules, using their UUID as the dictionary key
+        # Stores all currently added modules, using their handle as the dictionary key
         self._modules = {}
+        # Handles are never reused, so a module removed and added back keeps its handle
+        self._handles = itertools.count(1)
         self._placement_systems = {}
+        # Hierarchy of the modules, by handle
+        self._graph = KAR_sceneGraph.SceneGraph()
+        # Lookup of the modules by class, name, side and prefix, see find_modules
+        self._index = KAR_sceneIndex.ModuleIndex()
+        # Attribute values of the modules, one AttributeStore per module class
+        self._attribute_stores = {}
+        # Placement positions of the modules, by handle: [(x, y, z), ...]
+        self._placement_positions = {}
+        # Modules whose attribute values and placement positions have not been read from their rig file yet,
+        # by handle: loader (see defer_payloads)
+        self._deferred = {}
+
+        # Changes since the rig was last opened or saved, see get_changes
+        self._modified = OrderedDict()
+        self._removed = {}
+
+        # Pending notifications: signal name -> ordered handles, plus whether scene_updated was asked for
+        self._pending = self._new_pending()
+        self._update_requested = False
+        self._batch_depth = 0
+        self._dispatch_scheduled = False
+
+        # Profiling: notifications asked for since the last dispatch, and totals since the last reset
+        self._requested = 0
+        self.notifications_delivered = 0
+        self.notifications_suppressed = 0
+
+    @property
+    def modules(self):
+        """
+        Dictionary of all scene modules by handle. Change the scene through the Scene's functions rather than by
+        editing this dictionary, otherwise no signals are emitted.
+        """
+        return self._modules
+
+    @property
+    def graph(self):
+        """
+        SceneGraph holding the hierarchy of all scene modules. Read only, re-parent modules with reparent_module
+        """
+        return self._graph
 
     def add_module(self, scene_module, trigger_update=True):
         """
@@ -21,21 +102,243 @@ class Scene(qc.QObject):
         :param scene_module: Module instance to add to scene
         :param trigger_update
         """
-        self._modules[scene_module.uuid] = scene_module
+        self.add_modules([scene_module], trigger_update=trigger_update)
+
+    def add_modules(self, scene_modules, trigger_update=True):
+        """
+        Adds several modules to the scene, announcing them with a single modules_added signal
+
+        :param scene_modules: List of module instances to add to scene
+        :param trigger_update
+        """
+        added = []
+
+        for scene_module in scene_modules:
+            # Modules are given a handle the first time they are added, or when theirs is in use by another module
+            if scene_module.handle is None or self._modules.get(scene_module.handle, scene_module) is not scene_module:
+                scene_module.handle = self.new_handle()
+
+            if scene_module.handle not in self._modules:
+                self._modules[scene_module.handle] = scene_module
+                self._graph.add(scene_module.handle, scene_module.parent)
+                self._index.add(scene_module.handle, scene_module)
+                self._get_attribute_store(type(scene_module)).add(scene_module.handle)
+                added.append(scene_module.handle)
+
+        if added:
+            self._notify('modules_added', added)
+
         if trigger_update:
             self.force_update()
 
     def delete_modules(self, identifiers, trigger_update=True):
         """
-        Deletes  a list of rig modules identified by their UUID.
+        Deletes  a list of rig modules identified by their handle.
+
+        Modules parented to a deleted module (and not deleted themselves) are parented to the world.
 
         This removes all Maya component as forces a UI update.
         """
+        if not isinstance(identifiers, list):
+            identifiers = [identifiers]
+
+        removed = []
+        orphaned = []
+
         for _id in identifiers:
             try:
-                del self._modules[_id]
+                scene_module = self._modules.pop(_id)
+                removed.append(_id)
             except KeyError:
-                pass
+                continue
+
+            self._attribute_stores[type(scene_module)].remove(_id)
+            self._placement_positions.pop(_id, None)
+            self._deferred.pop(_id, None)
+
+            # Modules without a UUID have never been saved, so no rig file needs to know they were removed
+            if scene_module.uuid_bytes is not None:
+                self._removed[_id] = scene_module.uuid_bytes
+
+            orphaned.extend(self._graph.remove(_id))
+            self._index.remove(_id)
+
+        if removed:
+            # Children of removed modules that were removed themselves aren't orphans
+            orphaned = [_id for _id in orphaned if _id in self._modules]
+
+            for _id in orphaned:
+                self._modules[_id].parent = None
+
+            if orphaned:
+                self._notify('module_reparented', orphaned)
+
+            self._notify('modules_removed', removed)
+
+        if trigger_update:
+            self.force_update()
+
+    def clear(self, trigger_update=True):
+        """
+        Deletes every module
+        """
+        self.delete_modules(self._modules.keys(), trigger_update=trigger_update)
+
+    def reparent_module(self, identifier, parent, trigger_update=True):
+        """
+        Parents a module underneath another module
+
+        :param identifier: Handle of module to re-parent
+        :param parent: Handle of new parent module, or None for world
+        :param trigger_update
+        """
+        scene_module = self._modules.get(identifier)
+
+        if scene_module is None or scene_module.parent == parent:
+            return
+
+        if not self._graph.reparent(identifier, parent):
+            print('Cannot parent module to one of its own children..')
+            return
+
+        scene_module.parent = parent
+        self._notify('module_reparented', [identifier])
+
+        if trigger_update:
+            self.force_update()
+
+    def rename_module(self, identifier, name, trigger_update=True):
+        """
+        Renames a module
+
+        :param identifier: Handle of module to rename
+        :param name: String: New name
+        :param trigger_update
+        """
+        scene_module = self._modules.get(identifier)
+
+        if scene_module is None or scene_module.name == name:
+            return
+
+        scene_module.name = name
+        self._index.rename(identifier, name)
+        self._notify('module_renamed', [identifier])
+
+        if trigger_update:
+            self.force_update()
+
+    def get_attribute(self, identifier, name):
+        """
+        Returns the value of one attribute of a module
+
+        :param identifier: Handle of module
+        :param name: String: Attribute name, see the module class' attributes
+        """
+        self.load_payloads([identifier])
+        scene_module = self._modules[identifier]
+
+        return self._attribute_stores[type(scene_module)].get(identifier, name)
+
+    def get_attribute_values(self, identifier):
+        """
+        Returns the values of all attributes of a module
+
+        :param identifier: Handle of module
+        :return OrderedDict: {name: value}, in the order of the module class' schema
+        """
+        self.load_payloads([identifier])
+        scene_module = self._modules[identifier]
+
+        return self._attribute_stores[type(scene_module)].get_all(identifier)
+
+    def get_attributes(self, identifiers, name):
+        """
+        Returns the values of one attribute of several modules, in the order of identifiers
+
+        :param identifiers: List of handles of modules that all have the attribute
+        :param name: String: Attribute name
+        :return List
+        """
+        values = {}
+
+        for store, store_identifiers in self._group_by_store(identifiers).iteritems():
+            values.update(zip(store_identifiers, store.get_many(store_identifiers, name)))
+
+        return [values[_id] for _id in identifiers]
+
+    def set_attributes(self, identifiers, name, value, trigger_update=True):
+        """
+        Sets one attribute of several modules to the same value, announcing the change with a single
+        attributes_changed signal.
+
+        The value is validated once per module class before anything is written, so either every module is
+        changed or none is.
+
+        :param identifiers: List of handles of modules to change
+        :param name: String: Attribute name
+        :param value: New value
+        :param trigger_update
+        :return Boolean: False if a module has no such attribute or the value is not valid for it
+        """
+        stores = self._group_by_store(identifiers)
+        validated = {}
+
+        for store in stores:
+            attribute = store.schema.get(name)
+
+            if attribute is None:
+                print('Module has no attribute "%s"..' % name)
+                return False
+
+            try:
+                validated[store] = attribute.validate(value)
+            except ValueError as error:
+                print(error)
+                return False
+
+        for store, store_identifiers in stores.iteritems():
+            store.set_many(store_identifiers, name, validated[store])
+
+        self.attributes_updated([_id for _id in identifiers if _id in self._modules], trigger_update=trigger_update)
+
+        return True
+
+    def get_placement_positions(self, identifier):
+        """
+        Returns the saved placement positions of a module
+
+        :param identifier: Handle of module
+        :return List: [(x, y, z), ...], empty if none have been saved
+        """
+        self.load_payloads([identifier])
+
+        return self._placement_positions.get(identifier, [])
+
+    def set_placement_positions(self, identifier, positions):
+        """
+        Stores the placement positions of a module, to be saved with the rig
+
+        :param identifier: Handle of module
+        :param positions: List: [(x, y, z), ...]
+        """
+        if identifier not in self._modules:
+            return
+
+        positions = [tuple(point) for point in positions]
+
+        if self.get_placement_positions(identifier) != positions:
+            self._placement_positions[identifier] = positions
+            self._modified.setdefault(identifier)
+
+    def attributes_updated(self, identifiers, trigger_update=True):
+        """
+        Announces that the attributes of the given modules have been changed
+
+        :param identifiers: List of handles of changed modules
+        :param trigger_update
+        """
+        if identifiers:
+            self._notify('attributes_changed', identifiers)
 
         if trigger_update:
             self.force_update()
@@ -48,9 +351,9 @@ class Scene(qc.QObject):
 
     def get_module(self, identifier):
         """
-        Returns a specific module given its UUID
+        Returns a specific module given its handle
 
-        :param identifier: UUID of module to return
+        :param identifier: Handle of module to return
         """
         try:
             scene_module = self._modules[identifier]
@@ -58,11 +361,335 @@ class Scene(qc.QObject):
         except KeyError:
             return
 
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # QUERIES
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def find_modules(self, module_type=None, name=None, side=None, prefix=None, under=None, exact_type=False):
+        """
+        Returns the modules matching every given filter, parents before their children. Filters left as None are
+        ignored, so find_modules() returns every module.
+
+        scene.find_modules(module_type=ArmModule, side='L', under=spine.handle)
+
+        :param module_type: Module class, subclasses match too unless exact_type is True
+        :param name: String: Module name or fnmatch pattern, i.e 'Biped_Arm*'
+        :param side: String: 'L', 'R' or 'C', taken from the first or last token of the module name
+        :param prefix: String: Part of the module name before its first '_'
+        :param under: Handle of a module, only its descendants are returned
+        :param exact_type: Boolean: Match module_type exactly
+        :return List: Module instances
+        """
+        identifiers = self._index.find(module_type, name, side, prefix, exact_type=exact_type)
+
+        if under is not None:
+            # The subtree is already in parent first order
+            descendants = self._graph.descendants(under)
+
+            if identifiers is not None:
+                descendants = [_id for _id in descendants if _id in identifiers]
+
+            return [self._modules[_id] for _id in descendants]
+
+        if identifiers is None:
+            return [self._modules[_id] for _id in self._graph.topological_order()]
+
+        if len(identifiers) > 1:
+            identifiers = self._graph.sort_parents_first(identifiers)
+
+        return [self._modules[_id] for _id in identifiers]
+
+    def descendants(self, identifier):
+        """
+        Returns the modules parented (directly or not) underneath a module, parents before their children
+
+        :param identifier: Handle of module
+        :return List: Module instances
+        """
+        return [self._modules[_id] for _id in self._graph.descendants(identifier)]
+
+    def new_handle(self):
+        """
+        Returns an integer handle that no module in the scene uses. Modules brought over from another scene keep
+        their handle where possible, so the counter skips any that are taken.
+
+        Modules are given a handle when they are added, but modules that refer to each other before being added
+        (i.e when a rig is loaded) can be given theirs beforehand.
+        """
+        handle = next(self._handles)
+
+        while handle in self._modules:
+            handle = next(self._handles)
+
+        return handle
+
     def force_update(self):
         """
-        Emits a scene_updated signal.
+        Emits a scene_updated signal with the next dispatch.
 
         Many parts of the UI are hooked into this signal such as the Outliner. This will cause them to update
         to reflect the scenes current state.
         """
-        self.scene_updated.emit()
+        self._update_requested = True
+        self._requested += 1
+        self._schedule_dispatch()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # DEFERRED LOADING
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def defer_payloads(self, identifiers, loader):
+        """
+        Marks modules whose attribute values and placement positions (their payload) are still in a rig file.
+        They are read the first time any of them is asked for, so a rig can be shown as soon as its modules are
+        known. Until then the modules hold default values.
+
+        loader.load(handles) must return {handle: ({attribute name: value}, [(x, y, z), ...])}, see
+        KAR_rigFile.
+
+        :param identifiers: Handles of modules in the scene
+        :param loader: Object reading the payloads
+        """
+        for _id in identifiers:
+            if _id in self._modules:
+                self._deferred[_id] = loader
+
+    def is_loaded(self, identifier):
+        """
+        Returns False if a module's payload has not been read from its rig file yet
+        """
+        return identifier not in self._deferred
+
+    def load_payloads(self, identifiers=None):
+        """
+        Reads the payloads of the given modules (all modules if None) that have not been read yet. Values are put
+        in place without any signal, as to listeners they have been there since the module was added.
+
+        Errors raised by a loader (i.e KAR_rigFile.RigFileError when its file has changed) are passed on, and the
+        modules it should have read stay unread.
+
+        :param identifiers: Iterable of handles
+        """
+        if not self._deferred:
+            return
+
+        if identifiers is None:
+            identifiers = self._deferred.keys()
+
+        by_loader = {}
+        for _id in identifiers:
+            loader = self._deferred.get(_id)
+
+            if loader is not None:
+                by_loader.setdefault(loader, []).append(_id)
+
+        for loader, loader_identifiers in by_loader.iteritems():
+            # Modules stay deferred if the loader raises, so their saved values are never replaced by defaults
+            payloads = loader.load(loader_identifiers)
+
+            for _id in loader_identifiers:
+                self._deferred.pop(_id, None)
+
+            for _id, (values, positions) in payloads.iteritems():
+                scene_module = self._modules.get(_id)
+
+                if scene_module is None:
+                    continue
+
+                self._attribute_stores[type(scene_module)].set_all(_id, values)
+
+                if positions:
+                    self._placement_positions[_id] = positions
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # CHANGE TRACKING
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @property
+    def is_modified(self):
+        """
+        True if modules have been changed since the rig was last opened or saved
+        """
+        return bool(self._modified or self._removed)
+
+    def get_changes(self):
+        """
+        Returns the modules changed since the rig was last opened or saved (see mark_saved), so a save only has to
+        write those. Modules count as changed when they are added, re-parented, renamed or have their attributes or
+        placement positions changed.
+
+        Changed modules are in the order they were last added or re-parented in, which is the order they are in
+        among their siblings.
+
+        :return Tuple: ([handle of changed module, ...], {handle: UUID bytes} of removed modules that had been saved)
+        """
+        return list(self._modified), dict(self._removed)
+
+    def mark_saved(self):
+        """
+        Forgets all changes, called once the scene has been opened from or written to a rig file
+        """
+        self._modified.clear()
+        self._removed.clear()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # NOTIFICATIONS
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that holds back all signals until the end of the block, then dispatches them at once.
+        Batches can be nested, signals are dispatched when the outermost batch ends.
+
+        with scene.batch():
+            for scene_module in scene_modules:
+                scene.add_module(scene_module)
+        """
+        self._batch_depth += 1
+
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+
+            if not self._batch_depth:
+                self.dispatch()
+
+    def dispatch(self):
+        """
+        Emits every pending signal now, once each, rather than waiting for the next turn of the event loop
+        """
+        self._dispatch_scheduled = False
+
+        if self._batch_depth:
+            return
+
+        pending, self._pending = self._pending, self._new_pending()
+        update_requested, self._update_requested = self._update_requested, False
+        requested, self._requested = self._requested, 0
+
+        delivered = 0
+
+        for signal_name in self._DISPATCH_ORDER:
+            if pending[signal_name]:
+                getattr(self, signal_name).emit(pending[signal_name].keys())
+                delivered += 1
+
+        if update_requested:
+            self.scene_updated.emit()
+            delivered += 1
+
+        self.notifications_delivered += delivered
+        self.notifications_suppressed += requested - delivered
+
+    def get_notification_counts(self):
+        """
+        Returns how many notifications have been emitted and how many were merged into another one
+
+        :return Dictionary: {'delivered': Int, 'suppressed': Int}
+        """
+        return {'delivered': self.notifications_delivered, 'suppressed': self.notifications_suppressed}
+
+    def reset_notification_counts(self):
+        self.notifications_delivered = 0
+        self.notifications_suppressed = 0
+
+    def _notify(self, signal_name, identifiers):
+        """
+        Queues a signal for the given modules, merging it with the changes already waiting to be dispatched.
+
+        A module added and removed again before the dispatch is never announced, and other changes to a module
+        that is being announced as added are dropped, since listeners read its current state when it is added.
+        """
+        pending = self._pending
+        added = pending['modules_added']
+
+        # Every change to a module passes through here, so this is where modules are marked as changed
+        modified = self._modified
+
+        if signal_name == 'modules_removed':
+            for _id in identifiers:
+                modified.pop(_id, None)
+
+        elif signal_name in ('modules_added', 'module_reparented'):
+            # Added and re-parented modules go to the end of their siblings, see get_changes
+            for _id in identifiers:
+                modified.pop(_id, None)
+                modified[_id] = None
+
+        else:
+            for _id in identifiers:
+                modified.setdefault(_id)
+
+        for _id in identifiers:
+            if signal_name == 'modules_removed':
+                was_added = _id in added
+
+                for changes in pending.itervalues():
+                    changes.pop(_id, None)
+
+                if not was_added:
+                    pending['modules_removed'][_id] = None
+
+            elif signal_name == 'modules_added' and _id in pending['modules_removed']:
+                # Removed and added back before anyone was told, so to listeners it has simply changed
+                del pending['modules_removed'][_id]
+
+                for changed_signal in ('module_reparented', 'module_renamed', 'attributes_changed'):
+                    pending[changed_signal][_id] = None
+
+            elif _id not in added:
+                pending[signal_name][_id] = None
+
+        self._requested += 1
+        self._schedule_dispatch()
+
+    def _get_attribute_store(self, module_class):
+        store = self._attribute_stores.get(module_class)
+
+        if store is None:
+            store = self._attribute_stores[module_class] = KAR_attributes.AttributeStore(module_class)
+
+        return store
+
+    def _group_by_store(self, identifiers):
+        """
+        Sorts the given modules by the AttributeStore holding their values, ignoring modules not in the scene
+
+        :return Dictionary: {AttributeStore: [handle, ...]}
+        """
+        self.load_payloads(identifiers)
+
+        stores = {}
+        store_identifiers = None
+        last_class = None
+
+        for _id in identifiers:
+            scene_module = self._modules.get(_id)
+
+            if scene_module is None:
+                continue
+
+            # Selections are usually of one class, so only look the store up when the class changes
+            if type(scene_module) is not last_class:
+                last_class = type(scene_module)
+                store_identifiers = stores.setdefault(self._attribute_stores[last_class], [])
+
+            store_identifiers.append(_id)
+
+        return stores
+
+    def _schedule_dispatch(self):
+        if self._batch_depth or self._dispatch_scheduled:
+            return
+
+        self._dispatch_scheduled = True
+        qc.QTimer.singleShot(0, self.dispatch)
+
+    def _new_pending(self):
+        return dict((signal_name, OrderedDict()) for signal_name in self._DISPATCH_ORDER)
@@ -0,0 +1,281 @@
+# Python Imports
+from collections import OrderedDict
+
+"""
+Hierarchy of the modules in a rig scene, independent of Qt and of the UI. Modules are referred to by their handle.
+"""
+
+
+class SceneGraph(object):
+    """
+    Parent -> children index of all modules in a scene, with a list of root modules and a cached parent before
+    child (topological) order.
+
+    Adding, removing and re-parenting a module are constant time apart from the cycle check, which walks up from
+    the new parent. The topological order is rebuilt lazily, the first time it is asked for after a change.
+
+    A module can be added before its parent. It is treated as a root until the parent is added, at which point it
+    is moved underneath it.
+    """
+
+    def __init__(self):
+        self._parents = {}              # module -> parent, None for roots
+        self._children = {}             # module -> OrderedDict of children, only for modules that have children
+        self._roots = OrderedDict()
+        self._waiting = {}              # missing parent -> OrderedDict of modules added before it
+
+        self._order = None              # Cached topological order, None when it needs rebuilding
+
+    def __contains__(self, identifier):
+        return identifier in self._parents
+
+    def __len__(self):
+        return len(self._parents)
+
+    def __iter__(self):
+        return iter(self.topological_order())
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # EDITING
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def add(self, identifier, parent=None):
+        """
+        Adds a module to the graph
+
+        :param identifier: Handle of module to add
+        :param parent: Handle of the module's parent, or None for a root module
+        """
+        if identifier in self._parents:
+            self.reparent(identifier, parent)
+            return
+
+        self._parents[identifier] = None
+        self._roots[identifier] = None
+        self._order = None
+
+        if parent is not None:
+            if parent in self._parents:
+                self._link(identifier, parent)
+            else:
+                self._waiting.setdefault(parent, OrderedDict())[identifier] = None
+
+        # Adopt modules that were added before this one
+        for child in self._waiting.pop(identifier, ()):
+            if child in self._parents and self._parents[child] is None and not self.is_descendant(identifier, child):
+                self._link(child, identifier)
+
+    def remove(self, identifier):
+        """
+        Removes a module from the graph. Its children become root modules.
+
+        :param identifier: Handle of module to remove
+        :return List: handles of the children that were moved to the root
+        """
+        if identifier not in self._parents:
+            return []
+
+        orphans = list(self._children.get(identifier, ()))
+        for child in orphans:
+            self._unlink(child)
+
+        self._unlink(identifier)
+        del self._roots[identifier]
+        del self._parents[identifier]
+
+        for waiting in self._waiting.itervalues():
+            waiting.pop(identifier, None)
+
+        self._order = None
+
+        return orphans
+
+    def reparent(self, identifier, parent):
+        """
+        Moves a module (and its subtree) underneath a new parent.
+
+        Parenting a module to itself or one of its own descendants would create a cycle, so it is refused. A parent
+        that is not in the graph yet is remembered, and the module is a root until that parent is added.
+
+        :param identifier: Handle of module to re-parent
+        :param parent: Handle of new parent, or None for root
+        :return Boolean: False if the re-parent was refused, otherwise True
+        """
+        if identifier not in self._parents:
+            return False
+
+        if parent is not None and parent in self._parents:
+            if parent == identifier or self.is_descendant(parent, identifier):
+                return False
+
+        for waiting in self._waiting.itervalues():
+            waiting.pop(identifier, None)
+
+        self._unlink(identifier)
+
+        if parent is not None:
+            if parent in self._parents:
+                self._link(identifier, parent)
+            else:
+                self._waiting.setdefault(parent, OrderedDict())[identifier] = None
+
+        self._order = None
+
+        return True
+
+    def clear(self):
+        """
+        Removes all modules
+        """
+        self._parents.clear()
+        self._children.clear()
+        self._roots.clear()
+        self._waiting.clear()
+        self._order = None
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # QUERIES
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def parent(self, identifier):
+        """
+        Returns the handle of a module's parent, None for root modules
+        """
+        return self._parents.get(identifier)
+
+    def children(self, identifier):
+        """
+        Returns a list of the handles of a module's direct children
+        """
+        return list(self._children.get(identifier, ()))
+
+    def roots(self):
+        """
+        Returns a list of the handles of all modules without a parent
+        """
+        return list(self._roots)
+
+    def depth(self, identifier):
+        """
+        Returns the number of ancestors a module has; 0 for root modules
+        """
+        return len(self.ancestors(identifier))
+
+    def ancestors(self, identifier):
+        """
+        Returns the handles of a module's parent, grandparent and so on up to its root
+        """
+        ancestors = []
+        parent = self._parents.get(identifier)
+
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self._parents[parent]
+
+        return ancestors
+
+    def descendants(self, identifier):
+        """
+        Returns the handles of all of a module's children and grandchildren, parents before their children
+        """
+        descendants = []
+        stack = [iter(self._children.get(identifier, ()))]
+
+        while stack:
+            for child in stack[-1]:
+                descendants.append(child)
+                stack.append(iter(self._children.get(child, ())))
+                break
+            else:
+                stack.pop()
+
+        return descendants
+
+    def is_descendant(self, identifier, ancestor):
+        """
+        Returns True if a module is a child/grandchild of ancestor. Walks up from the module, so costs its depth.
+        """
+        parent = self._parents.get(identifier)
+
+        while parent is not None:
+            if parent == ancestor:
+                return True
+            parent = self._parents[parent]
+
+        return False
+
+    def sort_parents_first(self, identifiers):
+        """
+        Returns the given handles sorted so that every module comes before its descendants, by depth. Depths are
+        shared between modules with common ancestors, so this costs about the size of the modules' subtree of the
+        graph rather than of the whole graph.
+
+        :param identifiers: Iterable of handles in the graph
+        :return List
+        """
+        depths = {None: -1}
+        parents = self._parents
+
+        for identifier in identifiers:
+            path = []
+
+            while identifier not in depths:
+                path.append(identifier)
+                identifier = parents[identifier]
+
+            depth = depths[identifier]
+            for identifier in reversed(path):
+                depth += 1
+                depths[identifier] = depth
+
+        del depths[None]
+
+        return sorted(identifiers, key=depths.__getitem__)
+
+    def topological_order(self):
+        """
+        Returns the handles of all modules ordered so that every module comes after its parent; each root followed
+        by its subtree, depth first. The order is cached until the graph changes.
+
+        :return List
+        """
+        if self._order is None:
+            order = []
+
+            for root in self._roots:
+                order.append(root)
+                order.extend(self.descendants(root))
+
+            self._order = order
+
+        return list(self._order)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # INTERNAL
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _link(self, identifier, parent):
+        del self._roots[identifier]
+        self._parents[identifier] = parent
+
+        children = self._children.get(parent)
+        if children is None:
+            children = self._children[parent] = OrderedDict()
+        children[identifier] = None
+
+    def _unlink(self, identifier):
+        parent = self._parents[identifier]
+
+        if parent is None:
+            return
+
+        children = self._children[parent]
+        del children[identifier]
+        if not children:
+            del self._children[parent]
+
+        self._parents[identifier] = None
+        self._roots[identifier] = None
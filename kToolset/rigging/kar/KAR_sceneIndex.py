@@ -0,0 +1,295 @@
+# Python Imports
+import bisect
+import fnmatch
+import re
+
+# KAR Imports
+from utils import KAR_rigUtils as krigUtils; reload(krigUtils)
+
+"""
+Secondary indexes over the modules in a rig scene, so modules can be looked up by class, name, side and prefix
+without scanning every module. Nothing in here depends on Qt.
+"""
+
+# Characters that make a name an fnmatch pattern
+_WILDCARDS = re.compile(r'[*?\[\]]')
+
+
+class ModuleIndex(object):
+    """
+    Maintains handle sets of the scene's modules by module class, name, side, name prefix and name suffix.
+
+    Patterns made of a name token and a wildcard, such as 'Biped_*' or '*_L', are answered straight from the prefix
+    and suffix indexes. Names are also kept in a sorted list, and reversed in a second one, so any other pattern
+    such as 'Biped_Arm*' or '*Arm_L' only tests the names starting or ending with its longest literal part. Every
+    lookup returns a new set of handles the caller is free to modify.
+    """
+
+    def __init__(self):
+        self._entries = {}      # Handle -> (module class, name)
+        self._by_class = {}     # module class -> set of handles
+        self._by_name = {}      # name -> set of handles
+        self._by_side = {}      # side -> set of handles
+        self._by_prefix = {}    # prefix -> set of handles
+        self._by_suffix = {}    # suffix -> set of handles
+        self._sorted_names = []
+        self._sorted_reversed = []  # Every name reversed, sorted
+
+        self._patterns = {}     # Compiled fnmatch patterns
+
+    def __contains__(self, identifier):
+        return identifier in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # EDITING
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def add(self, identifier, scene_module):
+        """
+        Indexes a module
+
+        :param identifier: Handle of the module
+        :param scene_module: Module instance
+        """
+        if identifier in self._entries:
+            self.remove(identifier)
+
+        self._entries[identifier] = (type(scene_module), scene_module.name)
+        self._by_class.setdefault(type(scene_module), set()).add(identifier)
+        self._index_name(identifier, scene_module.name)
+
+    def remove(self, identifier):
+        """
+        Removes a module from every index. Modules that are not indexed are ignored.
+        """
+        entry = self._entries.pop(identifier, None)
+
+        if entry is None:
+            return
+
+        module_class, name = entry
+
+        self._discard(self._by_class, module_class, identifier)
+        self._unindex_name(identifier, name)
+
+    def rename(self, identifier, name):
+        """
+        Re-indexes a module under its new name
+        """
+        entry = self._entries.get(identifier)
+
+        if entry is None or entry[1] == name:
+            return
+
+        self._unindex_name(identifier, entry[1])
+        self._entries[identifier] = (entry[0], name)
+        self._index_name(identifier, name)
+
+    def clear(self):
+        """
+        Removes every module
+        """
+        for index in (self._entries, self._by_class, self._by_name, self._by_side, self._by_prefix, self._by_suffix):
+            index.clear()
+
+        self._sorted_names[:] = []
+        self._sorted_reversed[:] = []
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # QUERIES
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def find(self, module_type=None, name=None, side=None, prefix=None, exact_type=False):
+        """
+        Returns the handles of the modules matching every given filter, filters left as None are ignored.
+
+        The sets of each filter are intersected starting from the smallest one, and only that set is copied, so a
+        lookup costs about as much as its most selective filter regardless of how many modules there are.
+
+        :return Set: handles, or None if no filter was given
+        """
+        candidates = []
+
+        if module_type is not None:
+            candidates.append(self._of_type(module_type, exact_type))
+        if name is not None:
+            candidates.append(self._named(name))
+        if side is not None:
+            candidates.append(self._by_side.get(side, ()))
+        if prefix is not None:
+            candidates.append(self._by_prefix.get(prefix, ()))
+
+        if not candidates:
+            return None
+
+        candidates.sort(key=len)
+        identifiers = set(candidates[0])
+
+        for other in candidates[1:]:
+            if not identifiers:
+                break
+            identifiers.intersection_update(other)
+
+        return identifiers
+
+    def of_type(self, module_type, exact=False):
+        """
+        Returns the handles of all modules of the given class, including subclasses unless exact is True
+        """
+        return set(self._of_type(module_type, exact))
+
+    def named(self, pattern):
+        """
+        Returns the handles of all modules whose name matches the given name or fnmatch pattern (i.e 'Biped_Arm*')
+        """
+        return set(self._named(pattern))
+
+    def on_side(self, side):
+        """
+        Returns the handles of all modules on the given side ('L', 'R' or 'C'), see KAR_rigUtils.get_side
+        """
+        return set(self._by_side.get(side, ()))
+
+    def with_prefix(self, prefix):
+        """
+        Returns the handles of all modules whose name starts with the given prefix followed by '_'
+        """
+        return set(self._by_prefix.get(prefix, ()))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # INTERNAL
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _of_type(self, module_type, exact):
+        """
+        Returns the indexed set of module_type, or a new set when subclasses of it are indexed too. Not a copy.
+        """
+        if exact:
+            return self._by_class.get(module_type, ())
+
+        matches = [identifiers for indexed_class, identifiers in self._by_class.iteritems()
+                   if issubclass(indexed_class, module_type)]
+
+        if len(matches) == 1:
+            return matches[0]
+
+        return set().union(*matches)
+
+    def _named(self, pattern):
+        """
+        Returns the indexed set of an exact name or token pattern, or a new set of the names matching any other
+        pattern. Not a copy.
+        """
+        prefix = _WILDCARDS.split(pattern, 1)[0]
+
+        if prefix == pattern:
+            return self._by_name.get(pattern, ())
+
+        # '*' matches every name
+        if not pattern.strip('*'):
+            return self._entries.viewkeys()
+
+        # 'Biped_*' and '*_L' match exactly the names with that prefix or suffix token
+        if pattern.endswith('_*') and _is_token(pattern[:-2]):
+            return self._by_prefix.get(pattern[:-2], ())
+
+        if pattern.startswith('*_') and _is_token(pattern[2:]):
+            return self._by_suffix.get(pattern[2:], ())
+
+        suffix = _WILDCARDS.split(pattern)[-1]
+
+        # Only names starting with the pattern's literal prefix, or ending with its literal suffix, can match. The
+        # longer of the two narrows the names down the most.
+        if len(suffix) > len(prefix):
+            names, literal = self._sorted_reversed, suffix[::-1]
+            simple = pattern == '*' + suffix
+        else:
+            names, literal = self._sorted_names, prefix
+            simple = pattern == prefix + '*'
+
+        regex = None
+        if not simple:
+            regex = self._patterns.get(pattern)
+            if regex is None:
+                if len(self._patterns) > 100:
+                    self._patterns.clear()
+                regex = self._patterns[pattern] = re.compile(fnmatch.translate(pattern))
+
+        identifiers = set()
+        reverse = names is self._sorted_reversed
+
+        for position in xrange(bisect.bisect_left(names, literal), len(names)):
+            name = names[position]
+
+            if not name.startswith(literal):
+                break
+
+            if reverse:
+                name = name[::-1]
+
+            # Patterns that are a literal and a single '*' match every name found
+            if regex is None or regex.match(name):
+                identifiers.update(self._by_name[name])
+
+        return identifiers
+
+    def _index_name(self, identifier, name):
+        if name not in self._by_name:
+            bisect.insort(self._sorted_names, name)
+            bisect.insort(self._sorted_reversed, name[::-1])
+
+        self._by_name.setdefault(name, set()).add(identifier)
+
+        side = krigUtils.get_side(name)
+        if side is not None:
+            self._by_side.setdefault(side, set()).add(identifier)
+
+        prefix = krigUtils.get_prefix(name)
+        if prefix is not None:
+            self._by_prefix.setdefault(prefix, set()).add(identifier)
+
+        suffix = krigUtils.get_suffix(name)
+        if suffix is not None:
+            self._by_suffix.setdefault(suffix, set()).add(identifier)
+
+    def _unindex_name(self, identifier, name):
+        if self._discard(self._by_name, name, identifier):
+            del self._sorted_names[bisect.bisect_left(self._sorted_names, name)]
+            del self._sorted_reversed[bisect.bisect_left(self._sorted_reversed, name[::-1])]
+
+        self._discard(self._by_side, krigUtils.get_side(name), identifier)
+        self._discard(self._by_prefix, krigUtils.get_prefix(name), identifier)
+        self._discard(self._by_suffix, krigUtils.get_suffix(name), identifier)
+
+    @staticmethod
+    def _discard(index, key, identifier):
+        """
+        Removes identifier from index[key], deleting the key once it is empty.
+
+        :return Boolean: True if the key was deleted
+        """
+        identifiers = index.get(key)
+
+        if identifiers is None:
+            return False
+
+        identifiers.discard(identifier)
+
+        if not identifiers:
+            del index[key]
+            return True
+
+        return False
+
+
+def _is_token(text):
+    """
+    Returns True if text is a single '_' separated token with no wildcards, i.e 'L' or 'Biped'
+    """
+    return '_' not in text and not _WILDCARDS.search(text)
@@ -3,10 +3,14 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 class ArmModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Arm')
+    attributes = (kattributes.IntAttribute('twist_joints', 0, minimum=0, maximum=20),)
 
     def __init__(self):
         super(ArmModule, self).__init__()
@@ -24,7 +28,10 @@ class ArmPlacementSystem(object):
         self.controls = {}
 
     def create_geometry(self):
-
+        """
+        Creates the placement geometry the user positions the arm joints with
+        """
+        pass
 
     def show_geometry(self, val):
         """
@@ -3,11 +3,15 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 
 class FootModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Foot')
+    attributes = (kattributes.BoolAttribute('reverse_foot', True),)
 
     def __init__(self):
         super(FootModule, self).__init__()
@@ -3,11 +3,15 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 
 class HandModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Hand')
+    attributes = (kattributes.IntAttribute('finger_count', 5, minimum=0, maximum=10),)
 
     def __init__(self):
         super(HandModule, self).__init__()
@@ -3,11 +3,15 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 
 class JointModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Arm')
+    attributes = (kattributes.IntAttribute('joint_count', 1, minimum=1, maximum=100),)
 
     def __init__(self):
         super(JointModule, self).__init__()
@@ -3,10 +3,14 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 class LegModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Leg')
+    attributes = (kattributes.IntAttribute('twist_joints', 0, minimum=0, maximum=20),)
 
     def __init__(self):
         super(LegModule, self).__init__()
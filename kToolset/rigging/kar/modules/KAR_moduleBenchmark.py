@@ -0,0 +1,129 @@
+"""
+Measures the memory used per module, with and without a scene holding them.
+
+Run from Maya's script editor (or mayapy):
+
+    from kToolset.rigging.kar.modules import KAR_moduleBenchmark
+    KAR_moduleBenchmark.run()
+
+Sizes are the deep size of the objects created (sys.getsizeof of everything reachable from them, classes and
+modules excluded), so the results are the same on every platform and do not depend on what the interpreter has
+allocated before.
+"""
+# Python Imports
+import gc
+import sys
+import types
+import uuid
+
+# KAR Imports
+import KAR_jointModule; reload(KAR_jointModule)
+from .. import KAR_scene; reload(KAR_scene)
+
+
+class _DictModule(object):
+    """
+    The module as it was before it was slotted: attributes in a __dict__ and a UUID object created for every
+    instance. Only used as a reference to compare against.
+    """
+    def __init__(self):
+        self.uuid = uuid.uuid4()
+        self.name = ''
+        self.parent = None
+        self._attachment_point = None
+
+
+def get_size(root):
+    """
+    Returns the size in bytes of an object and everything it references
+
+    :param root: Object to measure
+    :return: Int
+    """
+    seen = set()
+    stack = [root]
+    size = 0
+
+    while stack:
+        obj = stack.pop()
+
+        # Classes, modules and functions are shared by every instance, they are not part of the instance's cost
+        if id(obj) in seen or isinstance(obj, (type, types.ClassType, types.ModuleType, types.FunctionType)):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+
+    return size
+
+
+def create_modules(count, module_class=KAR_jointModule.JointModule):
+    """
+    Creates modules chained in groups of ten, the way a run of joints is
+
+    :param count: Int: Number of modules to create
+    :param module_class: Class of the modules
+    :return: List of modules
+    """
+    modules = []
+
+    for i in xrange(count):
+        scene_module = module_class()
+        scene_module.name = u'Crowd_Joint%d_C' % i
+
+        if module_class is _DictModule:
+            scene_module.parent = modules[-1].uuid if i % 10 else None
+        else:
+            scene_module.handle = i + 1
+            scene_module.parent = modules[-1].handle if i % 10 else None
+
+        modules.append(scene_module)
+
+    return modules
+
+
+def measure_modules(count, module_class=KAR_jointModule.JointModule):
+    """
+    Returns the bytes per module of count modules on their own
+
+    :param count: Int: Number of modules
+    :param module_class: Class of the modules
+    :return: Float
+    """
+    modules = create_modules(count, module_class)
+
+    return float(get_size(modules) - sys.getsizeof(modules)) / count
+
+
+def measure_scene(count):
+    """
+    Returns the bytes per module of a scene holding count modules, compared to an empty scene. The scene is measured
+    as it is once a rig has been opened: notifications dispatched and no unsaved changes.
+
+    :param count: Int: Number of modules
+    :return: Float
+    """
+    scene = KAR_scene.Scene()
+    scene.add_modules(create_modules(count), trigger_update=False)
+    scene.dispatch()
+    scene.mark_saved()
+
+    # The scene's attributes are measured rather than the scene, the Qt wrapper does not report what it references
+    return float(get_size(vars(scene)) - get_size(vars(KAR_scene.Scene()))) / count
+
+
+def run(counts=(10000, 100000)):
+    """
+    Prints the bytes per module for each number of modules
+
+    :param counts: Numbers of modules to measure
+    """
+    print '%-28s' % 'Bytes per module' + ''.join('%10s' % format(count, ',') for count in counts)
+
+    rows = (('dict module (before slots)', lambda count: measure_modules(count, _DictModule)),
+            ('module', measure_modules),
+            ('module in a scene', measure_scene))
+
+    for label, measure in rows:
+        print '%-28s' % label + ''.join('%10.0f' % measure(count) for count in counts)
@@ -3,10 +3,14 @@
 # KAR Imports
 import module; reload(module)
 from module import Module
+from .. import KAR_attributes as kattributes
 from ..utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
 
 class SpineModule(Module):
+    __slots__ = ()
+
     icon = kuiUtils.get_icon('Biped_Arm')
+    attributes = (kattributes.IntAttribute('joint_count', 5, minimum=2, maximum=50),)
 
     def __init__(self):
         super(SpineModule, self).__init__()
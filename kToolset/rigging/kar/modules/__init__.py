@@ -18,3 +18,7 @@ from KAR_handModule import HandModule
 from KAR_jointModule import JointModule
 from KAR_legModule import LegModule
 from KAR_spineModule import SpineModule
+
+# Module classes by class name, used to recreate the modules of a saved rig
+MODULE_TYPES = dict((module_class.__name__, module_class) for module_class in
+                    (ArmModule, FootModule, HandModule, JointModule, LegModule, SpineModule))
@@ -1,17 +1,60 @@
 # Python Imports
 import uuid
 
+# KAR Imports
+from .. import KAR_attributes as kattributes
+
 
 class Module(object):
     """
     Base class of all rig modules.
 
-    Establishes a new UUID.
+    Modules are kept small, as rigs can hold tens of thousands of them: instance attributes are slotted, so subclasses
+    must declare __slots__ as well (an empty tuple if they add no attributes) or every instance gets a __dict__ again.
+
+    Within a scene a module is identified by its handle, a small integer the scene assigns when the module is first
+    added. The UUID is only generated the first time it is asked for, i.e when the module is saved.
     """
+    __slots__ = ('handle', 'name', 'parent', '_attachment_point', '_uuid')
+
+    # Attributes of every module, see KAR_attributes. Subclasses declare only the attributes they add
+    attributes = (kattributes.EnumAttribute('side', ('Centre', 'Left', 'Right')),
+                  kattributes.EnumAttribute('control_shape', ('Circle', 'Square', 'Cube', 'Sphere')),
+                  kattributes.FloatAttribute('scale', 1.0, minimum=0.01))
+
+    # Placement system class built for the module by KAutoRigger.build_placement_systems, None if it has none
+    placement_system = None
+
     def __init__(self):
-        self.uuid = uuid.uuid4()
+        self.handle = None  # Assigned by the scene the module is added to
         self.name = ''
-        self.parent = None  # UUID of module to be parented to
+        self.parent = None  # Handle of module to be parented to
         self._attachment_point = None  # Maya node of parent to be parented under
+        self._uuid = None
+
+    @property
+    def uuid(self):
+        """
+        Persistent identifier of the module, generated on first use. Only its 16 bytes are kept, the UUID object
+        is created when asked for.
+        """
+        if self._uuid is None:
+            self._uuid = uuid.uuid4().bytes
+
+        return uuid.UUID(bytes=self._uuid)
+
+    @uuid.setter
+    def uuid(self, value):
+        """
+        Restores the UUID of a module that has been saved before
 
+        :param value: UUID, or its 16 bytes
+        """
+        self._uuid = value.bytes if isinstance(value, uuid.UUID) else value
 
+    @property
+    def uuid_bytes(self):
+        """
+        The 16 bytes of the module's UUID, or None if it has not been given one yet (i.e it has never been saved)
+        """
+        return self._uuid
@@ -11,4 +11,7 @@ from addModules import AvailableModules
 
 
 import placementEditor; reload(placementEditor)
-from placementEditor import PlacementEditor
\ No newline at end of file
+from placementEditor import PlacementEditor
+
+import presetBrowser; reload(presetBrowser)
+from presetBrowser import PresetBrowser, SavePresetDialog
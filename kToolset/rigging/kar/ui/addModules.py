@@ -63,18 +63,15 @@ class AvailableModules(qg.QDockWidget):
         """
         Adds the visual items to the list
         """
-        for module in self.MODULES:
-            self.module_list.add_item(module.__name__, module.icon, data=module)
+        self.module_list.add_items([(module.__name__, module.icon, module) for module in self.MODULES])
 
     def add_selected(self):
         """
         Adds currently selected modules to the scene and forces an update
         """
         _modules = self.module_list.get_selected_data()
-        for m in _modules:
-            _module = m()
-            self.tool.add_module(_module, trigger_update=False)
 
-        self.main_ui.emit_update()
+        # The scene announces the new modules, so the outliner adds them without a full update
+        self.tool.add_modules([m() for m in _modules], trigger_update=False)
 
 
@@ -1,8 +1,198 @@
+# Python Imports
+from functools import partial
+
 # PySide Imports
 import PySide.QtCore as qc
 import PySide.QtGui as qg
 
+# KAR Imports
+import widgets
+
+from .. import KAR_attributes as kattributes
+from .. import KAR_rigFile as krigFile
+
 
 class ModuleAttributeEditor(qg.QWidget):
-    def __init__(self, parent=None):
-        super(ModuleAttributeEditor, self).__init__()
+    """
+    Shows the attributes shared by the selected modules, see KAR_attributes. Editing a value writes it to every
+    selected module with a single Scene.set_attributes call.
+
+    A field whose value differs between the selected modules is marked with a '*' after its label.
+    """
+
+    def __init__(self, scene, parent=None):
+        super(ModuleAttributeEditor, self).__init__(parent=parent)
+
+        self.scene = scene
+        self._identifiers = []      # Handles of the modules being edited
+        self._fields = {}           # Attribute name -> (Attribute, label, field widget)
+
+        self.setLayout(qg.QVBoxLayout())
+        self.layout().setContentsMargins(5, 5, 5, 5)
+        self.layout().setAlignment(qc.Qt.AlignTop)
+
+        self.heading = widgets.decorators.Heading('Module Settings', parent=self)
+        self.layout().addWidget(self.heading)
+
+        self.lb_selection = qg.QLabel(parent=self)
+        self.layout().addWidget(self.lb_selection)
+
+        self.form_widget = qg.QWidget(parent=self)
+        self.form_widget.setLayout(qg.QFormLayout())
+        self.form_widget.layout().setContentsMargins(0, 5, 0, 0)
+        self.layout().addWidget(self.form_widget)
+
+        # Connect Signals
+        self.scene.attributes_changed.connect(self.attributes_changed)
+        self.scene.modules_removed.connect(self.modules_removed)
+
+        self._build_fields()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Selection/Scene
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def set_modules(self, identifiers):
+        """
+        Edits the given modules
+
+        :param identifiers: List of module handles
+        """
+        self._identifiers = [_id for _id in identifiers if _id in self.scene.modules]
+        self._build_fields()
+
+    def attributes_changed(self, identifiers):
+        """
+        Re-reads the displayed values if any of the modules being edited have changed
+
+        :param identifiers: List of module handles
+        """
+        if not self._identifiers:
+            return
+
+        if not set(identifiers).isdisjoint(self._identifiers):
+            self._refresh_values()
+
+    def modules_removed(self, identifiers):
+        """
+        Stops editing modules that have been removed from the scene
+
+        :param identifiers: List of module handles
+        """
+        removed = set(identifiers)
+
+        if removed.isdisjoint(self._identifiers):
+            return
+
+        self.set_modules([_id for _id in self._identifiers if _id not in removed])
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Fields
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _build_fields(self):
+        """
+        Replaces the fields with one per attribute shared by all modules being edited
+        """
+        layout = self.form_widget.layout()
+
+        while layout.count():
+            widget = layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+
+        self._fields = {}
+
+        if not self._identifiers:
+            self.lb_selection.setText('No modules selected')
+            return
+
+        if len(self._identifiers) == 1:
+            self.lb_selection.setText(self.scene.get_module(self._identifiers[0]).name)
+        else:
+            self.lb_selection.setText('%s modules selected' % len(self._identifiers))
+
+        module_classes = [type(self.scene.get_module(_id)) for _id in self._identifiers]
+
+        for attribute in kattributes.get_common_schema(module_classes):
+            label = qg.QLabel(attribute.label, parent=self.form_widget)
+            field = self._create_field(attribute)
+
+            layout.addRow(label, field)
+            self._fields[attribute.name] = (attribute, label, field)
+
+        self._refresh_values()
+
+    def _create_field(self, attribute):
+        """
+        Creates the widget editing an attribute, picked by the kind of value it holds
+        """
+        if attribute.kind == 'enum':
+            field = qg.QComboBox(parent=self.form_widget)
+            field.addItems(list(attribute.options))
+            field.activated.connect(partial(self._field_edited, attribute.name))
+
+        elif attribute.kind == 'bool':
+            field = qg.QCheckBox(parent=self.form_widget)
+            field.clicked.connect(partial(self._field_edited, attribute.name))
+
+        else:
+            if attribute.kind == 'float':
+                field = qg.QDoubleSpinBox(parent=self.form_widget)
+                field.setDecimals(3)
+                field.setSingleStep(0.1)
+                limits = (-1e9, 1e9)
+            else:
+                field = qg.QSpinBox(parent=self.form_widget)
+                limits = (-2 ** 31, 2 ** 31 - 1)
+
+            field.setRange(attribute.minimum if attribute.minimum is not None else limits[0],
+                           attribute.maximum if attribute.maximum is not None else limits[1])
+            # Only write once the user has finished typing, rather than on every key press
+            field.setKeyboardTracking(False)
+            field.valueChanged.connect(partial(self._field_edited, attribute.name))
+
+        return field
+
+    def _refresh_values(self):
+        """
+        Shows the current value of every field, without triggering an edit. If the modules' settings can no longer
+        be read from their rig file, the fields are disabled rather than showing default values.
+        """
+        try:
+            self.scene.load_payloads(self._identifiers)
+        except krigFile.RigFileError as error:
+            self.form_widget.setEnabled(False)
+            qg.QMessageBox.warning(self, 'Module Settings', str(error))
+            return
+
+        self.form_widget.setEnabled(True)
+
+        for name, (attribute, label, field) in self._fields.iteritems():
+            values = self.scene.get_attributes(self._identifiers, name)
+            value = values[0]
+            mixed = any(other != value for other in values)
+
+            label.setText(attribute.label + (' *' if mixed else ''))
+            label.setToolTip('The selected modules have different values' if mixed else '')
+
+            field.blockSignals(True)
+
+            if attribute.kind == 'enum':
+                field.setCurrentIndex(attribute.validate(value))
+            elif attribute.kind == 'bool':
+                field.setChecked(value)
+            else:
+                field.setValue(value)
+
+            field.blockSignals(False)
+
+    def _field_edited(self, name, value):
+        """
+        Writes an edited value to all modules being edited. Combo boxes pass the option's index, check boxes
+        their checked state and spin boxes their value, all of which the attribute accepts as they are.
+        """
+        if not self.scene.set_attributes(self._identifiers, name, value, trigger_update=False):
+            self._refresh_values()
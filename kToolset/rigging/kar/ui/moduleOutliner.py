@@ -12,6 +12,8 @@ class ModuleOutliner(qg.QDockWidget):
     The ModuleOutliner is a list, similar to the Maya outliner, that shows all currently installed modules
     and that allows you to select a module to edit.
     """
+    # SIGNALS
+    selection_changed = qc.Signal(list)     # Handles of the selected modules
 
     def __init__(self, tool, parent=None):
         super(ModuleOutliner, self).__init__('Module Outliner', parent=parent)
@@ -34,12 +36,19 @@ class ModuleOutliner(qg.QDockWidget):
 
         self._add_top_buttons()
 
-        self.module_list = _ModuleOutlinerList(parent=self)
+        self.module_list = _ModuleOutlinerList(self.tool.scene, parent=self)
         self.content_widget.layout().addWidget(self.module_list)
 
         # Connect Signals ----------------------------------------------- #
         self.main_ui.update_signal.connect(self.update_outliner)
         self.module_list.drag_add.connect(self.dropped_from_add_modules)
+        self.module_list.selection_changed.connect(self._emit_selection_changed)
+
+        # Scene changes are applied to just the affected modules' items
+        self.tool.scene.modules_added.connect(self.modules_added)
+        self.tool.scene.modules_removed.connect(self.modules_removed)
+        self.tool.scene.module_reparented.connect(self.modules_reparented)
+        self.tool.scene.module_renamed.connect(self.modules_renamed)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -57,16 +66,22 @@ class ModuleOutliner(qg.QDockWidget):
         layout.setAlignment(qc.Qt.AlignLeft)
         self.content_widget.layout().addLayout(layout)
 
+        # Filter Box
+        self.filter_box = qg.QLineEdit(parent=self)
+        self.filter_box.setPlaceholderText('Filter...')
+
         # Delete Button
         btn_delete = widgets.IconButton(pixmap=kuiUtils.get_icon('bin_dark'),
                                         pixmap_hover=kuiUtils.get_icon('bin_light'), icon_size=(16, 16), parent=self)
 
         # Add Widgets
+        layout.addWidget(self.filter_box)
         layout.addSpacerItem(qg.QSpacerItem(5, 5, qg.QSizePolicy.Expanding))
         layout.addWidget(btn_delete)
 
         # Connect Signals
         btn_delete.clicked.connect(self.delete_selected)
+        self.filter_box.textChanged.connect(self.filter_outliner)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -75,11 +90,11 @@ class ModuleOutliner(qg.QDockWidget):
     # ---------------------------------------------------------------------------------------------------------------- #
     def delete_selected(self):
         """
-        Retrieves the list of UUIDs stored in each selected _ListItem's data attribute,
+        Retrieves the list of handles stored in each selected _ListItem's data attribute,
         deletes the list items then removes the corresponding modules from the rig scene
         """
-        # Get the UUIDs for each module being deleted
-        removed_data = [_module.uuid for _module in self.module_list.get_selected_data(hierarchy=True)]
+        # Get the handles for each module being deleted
+        removed_data = [_module.handle for _module in self.module_list.get_selected_data(hierarchy=True)]
         # Remove the items from the outliner list
         self.module_list.remove_selected()
         # Remove the items from the scene
@@ -87,19 +102,19 @@ class ModuleOutliner(qg.QDockWidget):
 
     def delete_all(self):
         """
-        Retrieves the list of UUIDs stored in each _ListItem's data attribute,
+        Retrieves the list of handles stored in each _ListItem's data attribute,
         deletes the list items then removes the corresponding modules from the rig scene
 
         Keep in mind this may NOT delete all modules if for some reason a module has not been
         correctly added to the outliner. It is safer to delete the modules directly from the scene
         using its delete function.
         """
-        # Get the UUIDs for each module in the outliner
-        removed_data = self.module_list.get_all_data()
+        # Get the handles for each module in the outliner
+        removed_data = [_module.handle for _module in self.module_list.get_all_data()]
         # Remove the items from the outliner list
         self.module_list.remove_all()
         # Remove the items from the scene
-        self.tool.delete_modules(removed_data, trigger_update=False)
+        self.tool.delete_module(removed_data, trigger_update=False)
 
     def dropped_from_add_modules(self, event_args):
         """
@@ -110,41 +125,45 @@ class ModuleOutliner(qg.QDockWidget):
         dropped_item, target_item, parent_item = event_args
         selected_modules = self.add_modules_dock.module_list.get_selected_items()
 
-        def add_module(_m):
-            """
-            Adds a module to the scene and corresponding item to list give then
-            the instance of the rig module
-
-            :param _m: rig module instance to add
-            """
-            if target_item is None:
-                # If item is to be parented to the world, simply add it to the scene and let the automatic
-                # updating add it to list
-                self.tool.add_module(_m, trigger_update=False)
-            else:
-                # Else if its been dropped onto a particular item manually add it to the list,
-                # set its parent and move it into the correct position
-                item = self.module_list.add_item(_m.name, _m.icon, _m)
-                item.parent_item = parent_item
-                self.module_list.move_item_under(item, target_item)
-                self.tool.add_module(_m, trigger_update=False)
-                item.update()
-
         # Checks to see if the dragged item was in the current selection.
         # If it is, all selected items are added to the outliner
         # If the dragged item was NOT part of the selection, then only the dragged item is added
+        # Class is stored in data attribute. Calling it creates an instance of that class
         if dropped_item in selected_modules:
-            for j in selected_modules:
-                _module = j.data()  # Class is stored in data attribute. This creates an instance of that class
-                add_module(_module)
-
+            new_modules = [j.data() for j in selected_modules]
         else:
-            _module = dropped_item.data()
-            add_module(_module)
+            new_modules = [dropped_item.data()]
+
+        if parent_item is not None:
+            for _module in new_modules:
+                _module.parent = parent_item.data.handle
+
+        # Adding the modules to the scene adds (and parents) their items through the modules_added signal,
+        # which is dispatched as soon as the batch ends
+        with self.tool.scene.batch():
+            self.tool.add_modules(new_modules, trigger_update=False)
 
-        # Forces the main UI to send out an update signal, causing the outliner to add the new items
-        # to its list
-        self.main_ui.emit_update()
+        # If they have been dropped onto a particular item, move them into the correct position
+        if target_item is not None:
+            self.module_list.move_items_under([self.module_list.items_by_handle[_module.handle]
+                                               for _module in new_modules], target_item)
+
+    def get_selected_modules(self):
+        """
+        Returns the handles of the selected modules, in the order they are displayed
+        """
+        return [item.data.handle for item in self.module_list.get_selected_items()]
+
+    def _emit_selection_changed(self, items):
+        self.selection_changed.emit([item.data.handle for item in items])
+
+    def filter_outliner(self, text):
+        """
+        Only shows modules whose name, type or parent's name contains the given text
+
+        :param text: String: Text to filter by, an empty string shows all modules
+        """
+        self.module_list.set_filter(text)
 
     def update_outliner(self):
         """
@@ -153,32 +172,142 @@ class ModuleOutliner(qg.QDockWidget):
         Scene Module not in outliner: Adds new list item corresponding to module
         Item in list with no match in module list: Deletes list item
         Item parent does not match modules parent: Re-parents list item to correct item
-        :return:
+        Item text does not match modules name: Renames list item
+
+        Modules and list items are matched by handle with dictionary lookups, and only the differences are
+        applied to the list.
+        """
+        scene_modules = self.tool.modules
+        list_items = self.module_list.items_by_handle
+
+        self.modules_removed(list(set(list_items).difference(scene_modules)))
+        self.modules_added(list(set(scene_modules).difference(list_items)))
+        self.modules_renamed(scene_modules.keys())
+        self.modules_reparented(scene_modules.keys())
+
+    def modules_added(self, identifiers):
         """
-        outliner_list_data = self.module_list.get_all_data()
+        Adds items for the given newly added modules in a single batch, then parents them
 
-        for list_item in self.module_list.items:
-            if list_item.data not in self.tool.modules.values():
-                self.module_list.remove_item(list_item)
+        :param identifiers: List of module handles
+        """
+        scene_modules = self.tool.modules
+        list_items = self.module_list.items_by_handle
+
+        new_modules = [scene_modules[_id] for _id in identifiers if _id in scene_modules and _id not in list_items]
+        self.module_list.add_items([(_module.name, _module.icon, _module) for _module in new_modules])
 
-        for module_id in self.tool.modules:
-            if self.tool.modules[module_id] not in outliner_list_data:
-                self.module_list.add_item(self.tool.modules[module_id].name,
-                                          icon_pixmap=self.tool.modules[module_id].icon,
-                                          data=self.tool.modules[module_id])
+        self.modules_reparented([_module.handle for _module in new_modules if _module.parent is not None])
 
+    def modules_removed(self, identifiers):
+        """
+        Removes the items of the given removed modules in a single batch
+
+        :param identifiers: List of module handles
+        """
+        list_items = self.module_list.items_by_handle
+        self.module_list.remove_items([list_items[_id] for _id in identifiers if _id in list_items])
+
+    def modules_reparented(self, identifiers):
+        """
+        Re-parents the items of the given modules whose parent no longer matches their module's parent
+
+        :param identifiers: List of module handles
+        """
+        scene_modules = self.tool.modules
+        list_items = self.module_list.items_by_handle
+
+        for _id in identifiers:
+            item = list_items.get(_id)
+            if item is None or _id not in scene_modules:
+                continue
+
+            parent_item = list_items.get(scene_modules[_id].parent)
+            if parent_item is item.parent_item:
+                continue
+
+            if parent_item is None:
+                self.module_list.move_to_world([item])
+            else:
+                self.module_list.move_and_parent(item, parent_item)
+
+    def modules_renamed(self, identifiers):
+        """
+        Updates the text of the given modules' items to match their names
+
+        :param identifiers: List of module handles
+        """
+        scene_modules = self.tool.modules
+        list_items = self.module_list.items_by_handle
+
+        for _id in identifiers:
+            item = list_items.get(_id)
+
+            if item is not None and _id in scene_modules and item.text != scene_modules[_id].name:
+                item.text = unicode(scene_modules[_id].name)
 
 
 class _ModuleOutlinerList(widgets.ListWidget):
     # Signals
     drag_add = qc.Signal(list)
 
-    def __init__(self, parent=None, ):
+    def __init__(self, scene, parent=None, ):
         super(_ModuleOutlinerList, self).__init__(parent=parent)
 
+        self.scene = scene
+
+        # List item of each module, by the module's handle
+        self.items_by_handle = {}
+
+    def add_items(self, items):
+        new_items = super(_ModuleOutlinerList, self).add_items(items)
+
+        for item in new_items:
+            self.items_by_handle[item.data.handle] = item
+
+        return new_items
+
+    def _remove_items(self, deletion_items):
+        for item in deletion_items:
+            self.items_by_handle.pop(item.data.handle, None)
+
+        super(_ModuleOutlinerList, self)._remove_items(deletion_items)
+
+    def remove_all(self):
+        super(_ModuleOutlinerList, self).remove_all()
+
+        self.items_by_handle.clear()
+
+    def _item_reparented(self, item):
+        """
+        Keeps each module's parent in sync with its item when items are re-parented in the list
+        """
+        parent = item.parent_item.data.handle if item.parent_item is not None else None
+        self.scene.reparent_module(item.data.handle, parent, trigger_update=False)
+
+        super(_ModuleOutlinerList, self)._item_reparented(item)
+
+    def _item_renamed(self, item, old_text):
+        """
+        Keeps each module's name in sync with its item when items are renamed in the list
+        """
+        if item.data is not None:
+            self.scene.rename_module(item.data.handle, item.text, trigger_update=False)
+
+        super(_ModuleOutlinerList, self)._item_renamed(item, old_text)
+
+    def _filter_fields(self, item):
+        """
+        Modules can be found by their name or type
+        """
+        return (item.text, type(item.data).__name__)
+
     def dropEvent(self, event):
-        if event.source().parent().objectName() == 'AvailableModulesList':
-            self.drag_add.emit([event.source(), None, None])
+        dropped_item = self.resolve_drag_source(event)
+
+        if dropped_item.parent().objectName() == 'AvailableModulesList':
+            self._drag_left()
+            self.drag_add.emit([dropped_item, None, None])
             return
 
         super(_ModuleOutlinerList, self).dropEvent(event)
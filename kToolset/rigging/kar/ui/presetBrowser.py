@@ -0,0 +1,165 @@
+# PySide Imports
+import PySide.QtCore as qc
+import PySide.QtGui as qg
+
+
+class SavePresetDialog(qg.QDialog):
+    """
+    Asks for the name, tags and thumbnail of a preset to save. Existing names are offered as the user types,
+    saving under one of them replaces that preset.
+    """
+    def __init__(self, library, parent=None):
+        super(SavePresetDialog, self).__init__(parent=parent)
+        self.setWindowTitle('Save Preset')
+        self.setMinimumWidth(350)
+
+        self.library = library
+
+        layout = qg.QFormLayout()
+        self.setLayout(layout)
+
+        self.name_box = qg.QLineEdit(parent=self)
+        self.name_box.setCompleter(qg.QCompleter(sorted(self.library.get_presets()), self))
+        layout.addRow('Name:', self.name_box)
+
+        self.tags_box = qg.QLineEdit(parent=self)
+        self.tags_box.setPlaceholderText('Comma separated, i.e biped, arm')
+        self.tags_box.setCompleter(qg.QCompleter(self.library.get_tags(), self))
+        layout.addRow('Tags:', self.tags_box)
+
+        thumbnail_layout = qg.QHBoxLayout()
+        self.thumbnail_box = qg.QLineEdit(parent=self)
+        thumbnail_button = qg.QPushButton('..', parent=self)
+        thumbnail_button.setFixedWidth(25)
+        thumbnail_layout.addWidget(self.thumbnail_box)
+        thumbnail_layout.addWidget(thumbnail_button)
+        layout.addRow('Thumbnail:', thumbnail_layout)
+
+        buttons = qg.QDialogButtonBox(qg.QDialogButtonBox.Save | qg.QDialogButtonBox.Cancel, parent=self)
+        layout.addRow(buttons)
+
+        thumbnail_button.clicked.connect(self.browse_thumbnail)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+    def browse_thumbnail(self):
+        path = qg.QFileDialog.getOpenFileName(self, 'Thumbnail', self.library.directory,
+                                              'Images (*.png *.jpg *.jpeg)')[0]
+
+        if path:
+            self.thumbnail_box.setText(path)
+
+    def accept(self):
+        name = self.get_name()
+
+        if not name:
+            qg.QMessageBox.warning(self, 'Save Preset', 'The preset needs a name')
+            return
+
+        if self.library.get_preset(name) is not None:
+            message = 'A preset named "%s" already exists.. replace it?' % name
+            user_reply = qg.QMessageBox.question(self, 'Save Preset', message, qg.QMessageBox.Yes, qg.QMessageBox.No)
+
+            if user_reply != qg.QMessageBox.Yes:
+                return
+
+        super(SavePresetDialog, self).accept()
+
+    def get_name(self):
+        return self.name_box.text().strip()
+
+    def get_tags(self):
+        return [tag.strip() for tag in self.tags_box.text().split(',') if tag.strip()]
+
+    def get_thumbnail(self):
+        return self.thumbnail_box.text().strip() or None
+
+
+class PresetBrowser(qg.QDialog):
+    """
+    Lists the presets of a library and lets the user pick one to import. The list is filtered as the user types,
+    by preset name, tag or module type, from the library's index alone.
+    """
+    THUMBNAIL_SIZE = 48
+
+    def __init__(self, library, parent=None):
+        super(PresetBrowser, self).__init__(parent=parent)
+        self.setWindowTitle('Import Preset')
+        self.resize(400, 450)
+
+        self.library = library
+        self._thumbnails = {}       # thumbnail path -> QIcon, so filtering does not load the images again
+
+        self.setLayout(qg.QVBoxLayout())
+
+        self.filter_box = qg.QLineEdit(parent=self)
+        self.filter_box.setPlaceholderText('Search name, tag or module type..')
+        self.layout().addWidget(self.filter_box)
+
+        self.preset_list = qg.QListWidget(parent=self)
+        self.preset_list.setIconSize(qc.QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        self.layout().addWidget(self.preset_list)
+
+        self.buttons = qg.QDialogButtonBox(qg.QDialogButtonBox.Cancel, parent=self)
+        self.import_button = self.buttons.addButton('Import', qg.QDialogButtonBox.AcceptRole)
+        self.layout().addWidget(self.buttons)
+
+        self.filter_box.textChanged.connect(self.update_list)
+        self.preset_list.itemDoubleClicked.connect(self.accept)
+        self.preset_list.currentItemChanged.connect(self._update_import_button)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+
+        self.update_list()
+
+    def update_list(self, text=None):
+        """
+        Shows the presets matching the filter box
+
+        :param text: String: Filter text, that of the filter box if None
+        """
+        if text is None:
+            text = self.filter_box.text()
+
+        self.preset_list.clear()
+
+        for entry in self.library.search(text):
+            item = qg.QListWidgetItem('%s\n%s module(s)  %s' % (entry['name'], entry['modules'],
+                                                                 ', '.join(entry['tags'])))
+            item.setData(qc.Qt.UserRole, entry['name'])
+            item.setToolTip(', '.join(entry['module_types']))
+
+            thumbnail = self.library.get_thumbnail_path(entry)
+            if thumbnail is not None:
+                item.setIcon(self._get_thumbnail(thumbnail))
+
+            self.preset_list.addItem(item)
+
+        if self.preset_list.count():
+            self.preset_list.setCurrentRow(0)
+
+        self._update_import_button()
+
+    def get_name(self):
+        """
+        Returns the name of the chosen preset, None if there is none
+        """
+        item = self.preset_list.currentItem()
+
+        return item.data(qc.Qt.UserRole) if item is not None else None
+
+    def accept(self, *args):
+        if self.get_name() is not None:
+            super(PresetBrowser, self).accept()
+
+    def _get_thumbnail(self, path):
+        icon = self._thumbnails.get(path)
+
+        if icon is None:
+            icon = self._thumbnails[path] = qg.QIcon(qg.QPixmap(path).scaled(
+                self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE, qc.Qt.KeepAspectRatio, qc.Qt.SmoothTransformation))
+
+        return icon
+
+    def _update_import_button(self, *args):
+        self.import_button.setEnabled(self.preset_list.currentItem() is not None)
@@ -1,6 +1,9 @@
 import listWidget; reload(listWidget)
 from listWidget import ListWidget
 
+import listView; reload(listView)
+from listView import ListView
+
 import tabWidget; reload(tabWidget)
 from tabWidget import *
 
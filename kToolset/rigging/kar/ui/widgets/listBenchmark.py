@@ -0,0 +1,124 @@
+"""
+Times dragging a selection of hierarchies onto another item of a ListWidget, the way re-parenting modules in the
+outliner does.
+
+Run from Maya's script editor (or mayapy):
+
+    from kToolset.rigging.kar.ui.widgets import listBenchmark
+    listBenchmark.run()
+
+Each list holds root rows with two children each. A selection of roots taken from the bottom of the list is dropped
+onto the first root. "before" moves each dragged item and each of its children with its own layout indexOf and
+insertWidget, as drop_event did before subtree moves were spliced in a single pass. "after" is drop_event. Both
+include the relayout Qt runs once the drop is done.
+
+Timings depend on the Qt build and machine, so none are recorded here. Run this on the Maya version the outliner is
+used with before relying on any.
+"""
+# Python Imports
+import time
+# PySide Imports
+import PySide.QtGui as qg
+# KAR Imports
+from listWidget import ListWidget
+
+
+def create_list(row_count):
+    """
+    Returns a shown ListWidget holding row_count rows, every third row a root with the next two as its children
+
+    :param row_count: Int: Number of rows
+    :return: ListWidget
+    """
+    list_widget = ListWidget()
+    items = list_widget.add_items(('Row%d' % i,) for i in xrange(row_count))
+
+    for i, item in enumerate(items):
+        if i % 3:
+            item.parent_item = items[i - i % 3]
+
+    list_widget.resize(300, 600)
+    list_widget.show()
+    qg.QApplication.processEvents()
+
+    return list_widget
+
+
+def drop_one_by_one(list_widget, target_item, move_items):
+    """
+    Re-parents and moves each item under target_item in turn, every item and child re-inserted into the layout
+    on its own
+
+    :param list_widget: ListWidget holding the items. Its display order is not kept up to date, it should be
+                        discarded afterwards
+    :param target_item: _ListItem to drop the items onto
+    :param move_items: List of _ListItems to drop
+    """
+    layout = list_widget.list_widget.layout()
+
+    for item in move_items:
+        item.parent_item = target_item
+
+        target_index = layout.indexOf(target_item)
+        item_index = layout.indexOf(item)
+        index_change = target_index - item_index + 1
+
+        if item_index < target_index:
+            index_change -= 1
+
+        for moved_item in [item] + list_widget.get_children(item):
+            layout.insertWidget(layout.indexOf(moved_item) + index_change, moved_item)
+            moved_item.update()
+
+
+def measure(row_count, drag_count, single_pass):
+    """
+    Returns the seconds taken to drop drag_count roots onto the first root of a list of row_count rows
+
+    :param row_count: Int: Number of rows in the list
+    :param drag_count: Int: Number of roots to drag
+    :param single_pass: Boolean: Drop with drop_event if True, otherwise one item at a time
+    :return: Float
+    """
+    list_widget = create_list(row_count)
+
+    roots = [item for item in list_widget.get_all_items() if item.parent_item is None]
+    target_item = roots[0]
+    move_items = roots[-drag_count:]
+
+    for item in move_items:
+        list_widget._apply_selection(list_widget._selection.toggle(item))
+
+    start = time.time()
+
+    if single_pass:
+        list_widget.drop_event(target_item, (move_items[0], 0))
+    else:
+        drop_one_by_one(list_widget, target_item, list_widget.get_display_order(move_items, reverse=True))
+
+    qg.QApplication.processEvents()
+    elapsed = time.time() - start
+
+    list_widget.close()
+    list_widget.deleteLater()
+
+    return elapsed
+
+
+def run(row_counts=(1000, 10000), drag_count=200):
+    """
+    Prints the time taken to drop drag_count hierarchies, before and after, for each number of rows
+
+    :param row_counts: Numbers of rows to measure
+    :param drag_count: Int: Number of hierarchies (root and two children) dragged at once
+    """
+    # Maya already has an application, mayapy does not. Kept in a variable so it lives until the benchmark is done
+    application = qg.QApplication.instance() or qg.QApplication([])
+
+    print 'Dropping %d hierarchies (%d rows)' % (drag_count, drag_count * 3)
+    print '%-8s%12s%12s' % ('rows', 'before', 'after')
+
+    for row_count in row_counts:
+        before = measure(row_count, drag_count, single_pass=False)
+        after = measure(row_count, drag_count, single_pass=True)
+        print '%-8s%11.3fs%11.3fs' % (format(row_count, ','), before, after)
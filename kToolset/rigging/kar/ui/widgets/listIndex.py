@@ -0,0 +1,525 @@
+# Python Imports
+from collections import OrderedDict
+
+"""
+Book-keeping structures used by ListWidget/ListView to answer hierarchy and ordering queries without
+scanning every item in the list. Nothing in here depends on Qt.
+"""
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# ITEM HIERARCHY
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class ItemHierarchy(object):
+    """
+    Maintains a parent -> children index and the cached depth of every registered item.
+
+    Items without a parent are children of the world, represented by None. Children are kept in the order
+    they were parented. Depths are recomputed for the affected subtree only whenever an item is re-parented.
+    """
+
+    def __init__(self):
+        self._parents = {}
+        self._children = {None: OrderedDict()}
+        self._depths = {}
+
+    def __contains__(self, item):
+        return item in self._parents
+
+    def __len__(self):
+        return len(self._parents)
+
+    def add(self, item, parent=None):
+        """
+        Registers a new item underneath the given parent (world by default)
+
+        :param item: Item to register
+        :param parent: Registered item to parent underneath, or None for world
+        """
+        self._parents[item] = parent
+        self._children[item] = OrderedDict()
+        self._children[parent][item] = None
+        self._depths[item] = 0 if parent is None else self._depths[parent] + 1
+
+    def remove(self, item):
+        """
+        Unregisters an item. Any children of the item are moved to the world, so callers removing a whole
+        subtree should remove the descendants as well.
+
+        :param item: Registered item to remove
+        """
+        if item not in self._parents:
+            return
+
+        for child in list(self._children[item]):
+            self.reparent(child, None)
+
+        del self._children[self._parents.pop(item)][item]
+        del self._children[item]
+        del self._depths[item]
+
+    def clear(self):
+        """
+        Unregisters all items
+        """
+        self._parents.clear()
+        self._children.clear()
+        self._children[None] = OrderedDict()
+        self._depths.clear()
+
+    def reparent(self, item, parent):
+        """
+        Moves an item (and its subtree) underneath a new parent and updates the cached depth of the subtree.
+
+        Items that are not registered are ignored and parents that are not registered are treated as the world.
+        Parenting an item to itself or one of its own descendants would create a cycle, so it is refused.
+
+        :param item: Item to re-parent
+        :param parent: Item to parent underneath, or None for world
+        :return Boolean: False if the re-parent was refused, otherwise True
+        """
+        if item not in self._parents:
+            return True
+
+        if parent not in self._parents:
+            parent = None
+
+        old_parent = self._parents[item]
+        if old_parent is parent:
+            return True
+
+        if parent is item or self.is_descendant(parent, item):
+            return False
+
+        del self._children[old_parent][item]
+        self._children[parent][item] = None
+        self._parents[item] = parent
+
+        # Refresh depths of the moved subtree
+        self._depths[item] = 0 if parent is None else self._depths[parent] + 1
+        for child in self.descendants(item):
+            self._depths[child] = self._depths[self._parents[child]] + 1
+
+        return True
+
+    def parent(self, item):
+        """
+        Returns the parent of the given item, None if it is parented to the world
+        """
+        return self._parents.get(item)
+
+    def children(self, item):
+        """
+        Returns a list of the direct children of the given item (None for all world level items)
+        """
+        return list(self._children.get(item, ()))
+
+    def has_children(self, item):
+        """
+        Returns True if the given item has at least one child
+        """
+        return bool(self._children.get(item))
+
+    def descendants(self, item):
+        """
+        Returns all children and grandchildren of the given item, depth first, parents before their children
+
+        :param item: Registered item (or None for every item)
+        :return List
+        """
+        descendants = []
+        stack = [iter(self._children.get(item, ()))]
+
+        while stack:
+            for child in stack[-1]:
+                descendants.append(child)
+                stack.append(iter(self._children[child]))
+                break
+            else:
+                stack.pop()
+
+        return descendants
+
+    def depth(self, item):
+        """
+        Returns the number of ancestors the given item has; 0 for world level items
+        """
+        return self._depths.get(item, 0)
+
+    def is_descendant(self, item, ancestor):
+        """
+        Returns True if item is a child/grandchild of ancestor. Walks up from the item, so this costs the
+        depth of the item rather than the size of the ancestor's subtree.
+        """
+        parent = self._parents.get(item)
+
+        while parent is not None:
+            if parent is ancestor:
+                return True
+            parent = self._parents.get(parent)
+
+        return False
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# DISPLAY ORDER
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class DisplayOrder(object):
+    """
+    Sequence of items in the order they are displayed, with a position map for constant time index lookups.
+
+    Moving or removing an item only invalidates the positions from the first affected index onwards. They are
+    recomputed in a single pass the next time one of them is looked up, so a run of edits followed by a run of
+    lookups costs one re-index rather than one scan per lookup.
+    """
+
+    def __init__(self):
+        self._items = []
+        self._positions = {}
+
+        # Every item displayed before this index is known to have a correct entry in self._positions
+        self._valid = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def index(self, item):
+        """
+        Returns the display index of the given item, or -1 if the item is not in the sequence
+        """
+        position = self._positions.get(item)
+
+        if position is None:
+            return -1
+
+        if position >= self._valid:
+            self._reindex()
+            position = self._positions[item]
+
+        return position
+
+    def append(self, item):
+        """
+        Adds an item to the end of the sequence
+        """
+        if self._valid == len(self._items):
+            self._valid += 1
+
+        self._positions[item] = len(self._items)
+        self._items.append(item)
+
+    def move_block(self, items, index):
+        """
+        Moves several items at once so they sit together, in the given order, starting at index.
+
+        The index is counted with the moved items taken out of the sequence, and a negative or out of range index
+        moves them to the end. Only the span between the items' old and new positions is rebuilt.
+
+        :param items: List of items in the sequence to move
+        :param index: Index to display the first moved item at
+        :return Tuple: (first, last) range of display indices whose item changed
+        """
+        moving = set(items)
+        old_indices = [self.index(item) for item in items]
+        size = len(self._items)
+
+        if index < 0 or index > size - len(items):
+            index = size - len(items)
+
+        first = min(min(old_indices), index)
+        last = max(max(old_indices), index + len(items) - 1)
+
+        # Rebuild the affected span with the moved items spliced in at their new position
+        span = [item for item in self._items[first:last + 1] if item not in moving]
+        span[index - first:index - first] = items
+        self._items[first:last + 1] = span
+
+        for position in xrange(first, last + 1):
+            self._positions[self._items[position]] = position
+
+        return first, last
+
+    def remove(self, item):
+        """
+        Removes an item from the sequence
+        """
+        current_index = self.index(item)
+
+        del self._items[current_index]
+        del self._positions[item]
+        self._valid = min(self._valid, current_index)
+
+    def remove_many(self, items):
+        """
+        Removes several items from the sequence in a single pass over the items displayed after the first of them
+        """
+        doomed = set(item for item in items if item in self._positions)
+
+        if not doomed:
+            return
+
+        first = min(self.index(item) for item in doomed)
+
+        self._items[first:] = [item for item in self._items[first:] if item not in doomed]
+        for item in doomed:
+            del self._positions[item]
+
+        self._valid = min(self._valid, first)
+
+    def remove_range(self, first, last):
+        """
+        Removes the items displayed from index first to index last (inclusive). Removing ranges from the bottom up
+        leaves the indices of the ranges above them valid.
+        """
+        for item in self._items[first:last + 1]:
+            del self._positions[item]
+
+        del self._items[first:last + 1]
+        self._valid = min(self._valid, first)
+
+    def clear(self):
+        """
+        Removes all items from the sequence
+        """
+        self._items[:] = []
+        self._positions.clear()
+        self._valid = 0
+
+    def _reindex(self):
+        for index in xrange(self._valid, len(self._items)):
+            self._positions[self._items[index]] = index
+
+        self._valid = len(self._items)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# SELECTION MODEL
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class SelectionModel(object):
+    """
+    Ordered set of selected items plus the anchor item used for range selection.
+
+    Every operation returns the list of items whose selected state changed, so the caller only has to repaint
+    those items and can report the whole change at once.
+    """
+
+    def __init__(self, order):
+        """
+        :param order: DisplayOrder the selected items belong to, used to resolve ranges
+        """
+        self._order = order
+        self._selected = OrderedDict()
+        self.anchor = None
+
+    def __contains__(self, item):
+        return item in self._selected
+
+    def __len__(self):
+        return len(self._selected)
+
+    def __iter__(self):
+        return iter(self._selected)
+
+    def items(self):
+        """
+        Returns a list of the selected items, in the order they were selected
+        """
+        return list(self._selected)
+
+    def select(self, item):
+        """
+        Replaces the selection with the given item and makes it the anchor
+        """
+        changed = [selected for selected in self._selected if selected is not item]
+
+        if item not in self._selected:
+            changed.append(item)
+
+        self._selected.clear()
+        self._selected[item] = None
+        self.anchor = item
+
+        return changed
+
+    def toggle(self, item):
+        """
+        Adds the given item to the selection if it is not selected, otherwise removes it. The item becomes
+        the anchor.
+        """
+        if item in self._selected:
+            del self._selected[item]
+        else:
+            self._selected[item] = None
+
+        self.anchor = item
+
+        return [item]
+
+    def select_range(self, item):
+        """
+        Adds every item displayed between the anchor and the given item (inclusive) to the selection. Without an
+        anchor only the given item is added.
+        """
+        anchor_index = self._order.index(self.anchor) if self.anchor is not None else -1
+        item_index = self._order.index(item)
+
+        if anchor_index < 0:
+            range_items = [item]
+        else:
+            range_items = [self._order[index] for index in xrange(min(anchor_index, item_index),
+                                                                   max(anchor_index, item_index) + 1)]
+
+        changed = []
+        for range_item in range_items:
+            if range_item not in self._selected:
+                self._selected[range_item] = None
+                changed.append(range_item)
+
+        return changed
+
+    def select_all(self):
+        """
+        Selects every item, in display order
+        """
+        changed = []
+
+        for item in self._order:
+            if item not in self._selected:
+                self._selected[item] = None
+                changed.append(item)
+
+        return changed
+
+    def clear(self):
+        """
+        Deselects every item and resets the anchor
+        """
+        changed = list(self._selected)
+
+        self._selected.clear()
+        self.anchor = None
+
+        return changed
+
+    def discard(self, item):
+        """
+        Forgets an item that is being removed from the list
+        """
+        self._selected.pop(item, None)
+
+        if item is self.anchor:
+            self.anchor = None
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# FILTER INDEX
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class FilterIndex(object):
+    """
+    Case insensitive substring search over a few text fields per item (i.e label and type).
+
+    Fields are lower-cased once when an item is added or updated rather than on every query. The result of the
+    last query is kept and updated as items change, so a query that extends it (another character typed into a
+    filter box) only re-checks the items that matched before.
+    """
+
+    def __init__(self):
+        self._fields = {}   # item -> tuple of lower case fields
+        self._results = {}  # field index (None for any field) -> (query, set of matching items)
+
+    def __contains__(self, item):
+        return item in self._fields
+
+    def __len__(self):
+        return len(self._fields)
+
+    def add(self, item, fields):
+        """
+        Registers an item with the text it can be found by
+
+        :param item: Item to register
+        :param fields: Tuple of strings, always given in the same order for every item
+        """
+        fields = tuple(field.lower() for field in fields)
+        self._fields[item] = fields
+
+        for field, (query, result) in self._results.iteritems():
+            if self._matches(fields, query, field):
+                result.add(item)
+
+    def update(self, item, fields):
+        """
+        Replaces the text an item can be found by
+        """
+        self.remove(item)
+        self.add(item, fields)
+
+    def remove(self, item):
+        """
+        Unregisters an item. Items that are not registered are ignored.
+        """
+        if self._fields.pop(item, None) is None:
+            return
+
+        for query, result in self._results.itervalues():
+            result.discard(item)
+
+    def clear(self):
+        """
+        Unregisters all items
+        """
+        self._fields.clear()
+        self._results.clear()
+
+    def match(self, query, field=None):
+        """
+        Returns the items with a field containing query, ignoring case.
+
+        :param query: String to search for
+        :param field: Index of the only field to search, or None to search all of them
+        :return Set: Matching items. The set is kept to narrow the next query, so it must not be modified
+        """
+        query = query.lower()
+        previous = self._results.get(field)
+
+        if previous is not None and query.startswith(previous[0]):
+            if query == previous[0]:
+                return previous[1]
+
+            candidates = previous[1]
+        else:
+            candidates = self._fields
+
+        fields = self._fields
+        result = set(item for item in candidates if self._matches(fields[item], query, field))
+        self._results[field] = (query, result)
+
+        return result
+
+    @staticmethod
+    def _matches(fields, query, field):
+        if field is not None:
+            return query in fields[field]
+
+        for text in fields:
+            if query in text:
+                return True
+
+        return False
@@ -0,0 +1,533 @@
+# Python Imports
+import uuid
+# PySide Imports
+import PySide.QtCore as qc
+import PySide.QtGui as qg
+# KAR Imports
+from listWidget import ListWidget, _ItemWidget, paint_list_item
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# LIST VIEW
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class ListView(ListWidget):
+    """
+    Virtualized version of ListWidget.
+
+    Rather than creating an _ItemWidget per row, items are lightweight _ListItem objects held by a Qt item model
+    and painted by a delegate, so only the rows currently scrolled into view are ever painted. The interface
+    (add_item, get_selected_data, get_display_order, drag/drop parenting..) is identical to ListWidget, so either
+    can be used interchangeably.
+    """
+
+    def _init_view(self):
+        """
+        Builds the model, delegate and view used to display the list items
+        """
+        self._model = _ListModel(self)
+
+        self.list_widget = _ListViewport(self)
+        self.list_widget.setObjectName('darkList')
+        self.list_widget.setModel(self._model)
+        self.list_widget.setItemDelegate(_ItemDelegate(self))
+        self.layout().addWidget(self.list_widget)
+
+        if self.drop_enabled:
+            self._world_item = _ListItem(label='', icon_pixmap=None, data=None, owner=self)
+
+    def update_world_item(self):
+        """
+        The world item is always the last row of the model, so there is nothing to move
+        """
+        pass
+
+    def set_icon_state(self, state):
+        """
+        Sets the display state of all list items icons and re-lays out the view to match the new row height.
+
+        :param state: Int: 0 = No Icon, 1 = Small Icon, 2 = Large Icon
+        """
+        self._model.layoutAboutToBeChanged.emit()
+        super(ListView, self).set_icon_state(state)
+        self._model.layoutChanged.emit()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # View Primitives
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _create_items(self, entries):
+        first_row = len(self._order)
+        new_items = []
+
+        self._model.beginInsertRows(qc.QModelIndex(), first_row, first_row + len(entries) - 1)
+
+        for label, icon_pixmap, data in entries:
+            item = _ListItem(label, icon_pixmap, data, owner=self)
+            self._order.append(item)
+            new_items.append(item)
+
+        self._model.endInsertRows()
+
+        return new_items
+
+    def _move_items(self, items, index):
+        self._model.layoutAboutToBeChanged.emit()
+        first, last = self._order.move_block(items, index)
+        self._model.layoutChanged.emit()
+
+        self._apply_hidden_rows(first, last)
+
+    def _scroll_view(self):
+        return self.list_widget
+
+    def _repaint_item(self, item):
+        """
+        Schedules a repaint of the row displaying the given item only
+        """
+        index = self._model.index(self._index_of(item), 0)
+        self.list_widget.viewport().update(self.list_widget.visualRect(index))
+
+    def _set_items_hidden(self, hidden, shown):
+        for item in hidden:
+            self.list_widget.setRowHidden(self._order.index(item), True)
+
+        for item in shown:
+            self.list_widget.setRowHidden(self._order.index(item), False)
+
+    def _apply_hidden_rows(self, first, last):
+        """
+        Hidden rows are tracked by row number, so they are re-applied to the rows whose item changed after rows
+        have been moved or removed
+
+        :param first: Int: First row whose item changed
+        :param last: Int: Last row whose item changed. Rows past the end of the model are shown, so rows added
+                     there later are not hidden
+        """
+        if self._visible is None:
+            return
+
+        row_count = self._model.rowCount()
+        world_item = getattr(self, '_world_item', None)
+
+        for row in xrange(first, last + 1):
+            item = self._item_at(row) if row < row_count else world_item
+            self.list_widget.setRowHidden(row, item is not world_item and item not in self._visible)
+
+    def _discard_items(self, items):
+        rows = sorted(self._order.index(item) for item in set(items) if item in self._order)
+
+        if not rows:
+            return
+
+        row_count = self._model.rowCount()
+
+        # Split the rows into runs of neighbouring rows
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+
+        # Each run is removed on its own, bottom up so the rows of the runs above stay valid. Unlike a reset, this
+        # keeps the view's scroll position and current index.
+        for first, last in reversed(runs):
+            self._model.beginRemoveRows(qc.QModelIndex(), first, last)
+            self._order.remove_range(first, last)
+            self._model.endRemoveRows()
+
+        # Every row below the first removed one now shows a different item, or no longer exists
+        self._apply_hidden_rows(rows[0], row_count - 1)
+
+        # Forget removed items the viewport is still tracking
+        removed = set(items)
+        viewport = self.list_widget
+
+        for attribute in ('_hover_item', '_down_item', 'drag_item'):
+            if getattr(viewport, attribute) in removed:
+                setattr(viewport, attribute, None)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# MODEL
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class _ListModel(qc.QAbstractListModel):
+    """
+    Flat model exposing a ListView's display order. When drops are enabled the world item is
+    always the final row.
+
+    The model holds no items itself; the ListView wraps every change it makes to its display order in the
+    matching model notifications.
+    """
+
+    def __init__(self, owner):
+        super(_ListModel, self).__init__(parent=owner)
+
+        self._owner = owner
+
+    def rowCount(self, parent=qc.QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        if self._owner.drop_enabled:
+            return len(self._owner._order) + 1
+
+        return len(self._owner._order)
+
+    def data(self, index, role=qc.Qt.DisplayRole):
+        if index.isValid() and role == qc.Qt.DisplayRole:
+            return self.item(index.row()).text
+
+    def flags(self, index):
+        return qc.Qt.ItemIsEnabled
+
+    def item(self, row):
+        """
+        Returns the _ListItem displayed at the given row
+        """
+        return self._owner._item_at(row)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# VIEW
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class _ListViewport(qg.QListView):
+    """
+    QListView that forwards mouse and drag/drop interaction to its ListView, mirroring the behaviour
+    of each _ItemWidget in a ListWidget.
+    """
+    def __init__(self, owner):
+        super(_ListViewport, self).__init__(parent=owner)
+
+        self._owner = owner
+
+        # Item currently being dragged out of this view. See ListWidget.resolve_drag_source
+        self.drag_item = None
+
+        self._hover_item = None
+        self._down_item = None
+
+        self.setFocusPolicy(qc.Qt.NoFocus)
+        self.setSelectionMode(qg.QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(qg.QAbstractItemView.ScrollPerPixel)
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+
+        if owner.drop_enabled:
+            self.setAcceptDrops(True)
+            self.viewport().setAcceptDrops(True)
+
+    def item_at(self, pos):
+        """
+        Returns the _ListItem under the given viewport position, or None if there is no row there
+        """
+        index = self.indexAt(pos)
+
+        if not index.isValid():
+            return None
+
+        return self.model().item(index.row())
+
+    def drop_location(self, pos):
+        """
+        Returns which section of a row the given viewport position falls in; 0 = top/middle, 1 = bottom
+        """
+        rect = self.visualRect(self.indexAt(pos))
+
+        return self._owner.drop_location(rect.height(), pos.y() - rect.y())
+
+    def _set_hover_item(self, item):
+        if item is self._hover_item:
+            return
+
+        if self._hover_item is not None:
+            self._hover_item._hover = False
+            self._hover_item.update()
+
+        self._hover_item = item
+
+        if item is not None:
+            item._hover = True
+            item.update()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Mouse/Drag Events
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def mousePressEvent(self, event):
+        """
+        Left click presses the row under the mouse, middle click starts dragging it
+        """
+        item = self.item_at(event.pos())
+
+        if item is None or item is getattr(self._owner, '_world_item', None):
+            return
+
+        if event.button() == qc.Qt.LeftButton:
+            item._is_down = True
+            self._down_item = item
+            item.update()
+        elif event.button() == qc.Qt.MidButton and self._owner.drag_enabled:
+            self.drag_item = item
+            item_drag = qg.QDrag(self)
+            item_drag.setMimeData(qc.QMimeData())
+            item_drag.exec_(qc.Qt.CopyAction | qc.Qt.MoveAction, qc.Qt.CopyAction)
+            self.drag_item = None
+
+    def mouseReleaseEvent(self, event):
+        """
+        Selects the pressed row if the mouse is released over it
+        """
+        item = self._down_item
+        self._down_item = None
+
+        if item is None:
+            return
+
+        item._is_down = False
+
+        if event.button() == qc.Qt.LeftButton and self.item_at(event.pos()) is item:
+            self._owner._selection_updated(item)
+
+        item.update()
+
+    def mouseMoveEvent(self, event):
+        self._set_hover_item(self.item_at(event.pos()))
+
+    def leaveEvent(self, event):
+        self._set_hover_item(None)
+
+    def dragEnterEvent(self, event):
+        if self._owner.drop_enabled:
+            event.accept()
+
+    def dragMoveEvent(self, event):
+        item = self.item_at(event.pos())
+
+        if item is None or item is self._owner.resolve_drag_source(event):
+            self._owner._drag_moved(None, None)
+        else:
+            self._owner._drag_moved(item, self.drop_location(event.pos()))
+
+        event.accept()
+
+    def dragLeaveEvent(self, event):
+        self._owner._drag_left()
+
+    def dropEvent(self, event):
+        """
+        Dropping onto a row behaves like dropping onto an _ItemWidget, dropping onto the empty space below the
+        rows behaves like dropping onto the ListWidget itself
+        """
+        self._owner._drag_left()
+
+        if not self._owner.drop_enabled:
+            return
+
+        target_item = self.item_at(event.pos())
+        dropped_item = self._owner.resolve_drag_source(event)
+
+        if target_item is None:
+            self._owner.dropEvent(event)
+        elif target_item is not dropped_item:
+            self._owner.drop_event(target_item, [dropped_item, self.drop_location(event.pos())])
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# DELEGATE
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class _ItemDelegate(qg.QStyledItemDelegate):
+    """
+    Paints each visible row of a ListView exactly as an _ItemWidget would paint itself
+    """
+    def __init__(self, owner):
+        super(_ItemDelegate, self).__init__(parent=owner)
+
+        self._owner = owner
+
+    def sizeHint(self, option, index):
+        item = index.model().item(index.row())
+        text_width = option.fontMetrics.width(item.text)
+
+        return qc.QSize(item._icon_size + item.indent_width + text_width + 16, item.height)
+
+    def paint(self, painter, option, index):
+        item = index.model().item(index.row())
+
+        if item is getattr(self._owner, '_world_item', None):
+            return
+
+        painter.save()
+        paint_list_item(painter, option.rect, item)
+        painter.restore()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# LIST ITEM
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+class _ListItem(object):
+    """
+    Lightweight list item used by ListView.
+
+    Holds the same state and exposes the same interface as _ItemWidget, but is painted by the view's delegate
+    rather than being a widget itself. Pens are shared at class level until a colour is changed.
+    """
+    INDENT = _ItemWidget.INDENT
+
+    # PAINTING
+    _pen_text = qg.QPen(qg.QColor(250, 252, 255), 1, qc.Qt.SolidLine)
+    _pen_border = qg.QPen(qg.QColor(0, 0, 0, 0), 1, qc.Qt.SolidLine)
+    _pen_line = qg.QPen(qg.QColor(*_ItemWidget.COLOUR_HOVER_SELECTED), 1, qc.Qt.SolidLine)
+
+    # Button States
+    _hover = False
+    _is_down = False
+    _selected = False
+    _drag_hover_lower = False
+
+    def __init__(self, label, icon_pixmap, data, owner):
+        self._owner = owner
+
+        # IDENTIFIER, generated on first use
+        self._uuid = None
+
+        self._text = label
+        self._icon_pixmap = icon_pixmap
+        self.data = data
+
+        # Hierarchy
+        self._parent_item = None
+
+        self._icon_size = 32
+        self.height = 36
+        self.set_icon_state(1)
+
+    def parent(self):
+        """
+        Returns the view displaying this item, in the same way an _ItemWidget's parent() returns the widget
+        it has been laid out in
+        """
+        return self._owner.list_widget
+
+    def set_parent(self, parent):
+        """
+        Set the parent of item and apply the appropriate indentation
+
+        :param parent: _ListItem: Item to set as parent
+        """
+        self.parent_item = parent
+
+    @property
+    def parent_item(self):
+        return self._parent_item
+
+    @parent_item.setter
+    def parent_item(self, parent):
+        """
+        Sets the item's parent and updates the owning list's hierarchy index. Parenting an item underneath
+        one of its own children is ignored.
+        """
+        if parent is not self._parent_item and self._owner._hierarchy.reparent(self, parent):
+            self._parent_item = parent
+            self._owner._item_reparented(self)
+
+    @property
+    def indent_width(self):
+        """
+        Returns the item's indentation in pixels, read from the depth cached by the owning list's hierarchy
+        """
+        return self._owner._hierarchy.depth(self) * self.INDENT
+
+    def _refresh_indent(self):
+        self.update()
+
+    def update(self):
+        """
+        Schedules a repaint of the item's row
+        """
+        self._owner._repaint_item(self)
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, value):
+        if isinstance(value, bool):
+            self._selected = value
+            self.update()
+
+    @property
+    def uuid(self):
+        """
+        Returns the item's UUID, which is only generated the first time it is asked for
+        """
+        if self._uuid is None:
+            self._uuid = uuid.uuid4()
+
+        return self._uuid
+
+    @property
+    def text(self):
+        """
+        Returns item's text
+        """
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        """
+        Sets the list items display text
+
+        :param text: Unicode string to display
+        """
+        if isinstance(text, unicode):
+            old_text, self._text = self._text, text
+            self._owner._item_renamed(self, old_text)
+            self.update()
+
+    def set_text_colour(self, rgba):
+        """
+        Changes the items label colour to RGB or RGBA value.
+
+        :param rgba: Tuple/List: RGB or RGBA. i.e [255, 255,255] or [125, 50, 25, 200]
+        """
+        self._pen_text = qg.QPen(qg.QColor(*rgba), 1, qc.Qt.SolidLine)
+        self.update()
+
+    def set_border_colour(self, rgba):
+        """
+        Updates the pen colour that draws the items line border
+
+        :param rgba: Accepts list of RGB or RGBA values from 0-255
+        """
+        self._pen_border = qg.QPen(qg.QColor(*rgba), 1, qc.Qt.SolidLine)
+        self.update()
+
+    def set_icon_state(self, state):
+        """
+        Sets the display state of icon.
+
+        :param state: Int: 0 = No Icon, 1 = Small Icon, 2 = Large Icon
+        """
+        if state is 1:
+            self._icon_size = 32
+            self.height = 36
+        elif state is 2:
+            self._icon_size = 64
+            self.height = 80
+        else:
+            self._icon_size = 0
+            self.height = 25
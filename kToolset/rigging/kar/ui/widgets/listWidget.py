@@ -1,12 +1,12 @@
 # Python Imports
 import uuid
-from functools import partial
-import re
 # PySide Imports
 import PySide.QtCore as qc
 import PySide.QtGui as qg
 # KAR Imports
 from kToolset.kToolset.rigging.kar.utils import KAR_uiUtils as kuiUtils; reload(kuiUtils)
+from kToolset.kToolset.rigging.kar.utils import KAR_rigUtils as krigUtils; reload(krigUtils)
+import listIndex; reload(listIndex)
 
 import pydoc
 
@@ -31,8 +31,21 @@ class ListWidget(qg.QWidget):
 
     # SIGNALS
     order_changed = qc.Signal(list)
+    selection_changed = qc.Signal(list)
 
-    def __init__(self, parent=None, drag_enabled=True, drop_enabled=True):
+    # Number of removed item widgets deleted per turn of the event loop
+    DELETE_BATCH_SIZE = 500
+
+    # Dragging within this many pixels of the top/bottom of the list scrolls it by AUTOSCROLL_STEP pixels
+    # every AUTOSCROLL_INTERVAL milliseconds
+    AUTOSCROLL_MARGIN = 24
+    AUTOSCROLL_STEP = 12
+    AUTOSCROLL_INTERVAL = 40
+
+    # Fraction of a row's height, measured from the bottom, that drops an item below the row instead of onto it
+    DROP_ZONE_LOWER = 0.30
+
+    def __init__(self, parent=None, drag_enabled=True, drop_enabled=True, force_unique_names=False):
         super(ListWidget, self).__init__(parent=parent)
 
         self.setStyleSheet(kuiUtils.get_style_sheet('stylesheet_listWidget'))
@@ -41,13 +54,52 @@ class ListWidget(qg.QWidget):
         self._item_display_state = 0  # 0 = No Icons, 1 = Small Icons, 2 = Large Icons
 
         self.items = []
-        self._selected_items = []
+
+        # Parent -> children index of all items, kept up to date whenever an item's parent_item is set
+        self._hierarchy = listIndex.ItemHierarchy()
+        # Items in the order they are displayed, excluding the world item
+        self._order = listIndex.DisplayOrder()
+        self._selection = listIndex.SelectionModel(self._order)
+        # Names of all items, kept up to date on add/rename/remove
+        self._names = krigUtils.NameRegistry()
+        self._force_unique_names = force_unique_names
+        # Searchable text of all items, and the items the filter currently shows (None when nothing is filtered,
+        # otherwise every other item is hidden)
+        self._filter_index = listIndex.FilterIndex()
+        self._filter_text = ''
+        self._visible = None
+
+        # Removed item widgets waiting to be deleted
+        self._deletion_queue = []
+
+        # Drag feedback: the row being dragged over, which zone of it (0 = onto, 1 = below) and auto scrolling
+        self._drop_target = None
+        self._drop_location = None
+        self._autoscroll_timer = qc.QTimer(self)
+        self._autoscroll_timer.setInterval(self.AUTOSCROLL_INTERVAL)
+        self._autoscroll_timer.timeout.connect(self._autoscroll)
 
         # Master Widget Layout
         self.setLayout(qg.QVBoxLayout())
         self.layout().setContentsMargins(0, 0, 0, 0)
         self.layout().setSpacing(0)
 
+        self.drag_enabled = drag_enabled
+        self.drop_enabled = drop_enabled
+
+        self._init_view()
+
+        if self.drop_enabled:
+            self.setAcceptDrops(True)
+
+    def _init_view(self):
+        """
+        Builds the widgets that display the list items. Every item is its own _ItemWidget, stacked inside
+        a scroll area.
+
+        Subclasses that display their items differently (see ListView) override this along with the
+        view primitives below.
+        """
         # Create Scroll Area for list
         self.scroll_area = qg.QScrollArea()
         self.scroll_area.setObjectName('darkList')
@@ -65,15 +117,10 @@ class ListWidget(qg.QWidget):
 
         self.scroll_area.setWidget(self.list_widget)
 
-        self.drag_enabled = drag_enabled
-        self.drop_enabled = drop_enabled
-
         if self.drop_enabled:
-            self._world_item = _ItemWidget(label='', icon_pixmap=None, data=None, parent=self.list_widget)
-            self._world_item.received_drop.connect(partial(self.drop_event, self._world_item))
+            self._world_item = _ItemWidget(label='', icon_pixmap=None, data=None, parent=self.list_widget, owner=self)
             self._world_item.setFixedHeight(24)
             self._world_item.paintEvent = self.override_function
-            self.setAcceptDrops(True)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -89,17 +136,50 @@ class ListWidget(qg.QWidget):
         :param data: Arbitrary variable to store any required data, such as an identifier
         :returns Newly created _ListWidget
         """
-        item = _ItemWidget(label, icon_pixmap, data, parent=self, drag_enabled=self.drag_enabled, drop_enabled=self.drop_enabled)
-        self.list_widget.layout().addWidget(item)
-        self.items.append(item)
+        return self.add_items([(label, icon_pixmap, data)])[0]
+
+    def add_items(self, items):
+        """
+        Adds several new items to the bottom of the list at once.
+
+        Repainting is suspended until every item has been added and the world item is only moved once, so the
+        list is laid out a single time regardless of how many items are added.
+
+        :param items: Iterable of (label, icon_pixmap, data) tuples. icon_pixmap and data may be omitted
+        :returns List of newly created _ListWidgets, in the order given
+        """
+        entries = [(tuple(entry) + (None, None))[:3] for entry in items]
+
+        if not entries:
+            return []
 
-        # Listen for drop events
-        item.received_drop.connect(partial(self.drop_event, item))
-        item.clicked.connect(partial(self._selection_updated, item))
+        if self._force_unique_names:
+            entries = [(self._names.claim(label), icon_pixmap, data) for label, icon_pixmap, data in entries]
+        else:
+            for label, icon_pixmap, data in entries:
+                self._names.add(label)
+
+        self.setUpdatesEnabled(False)
 
-        self.update_world_item()
+        try:
+            new_items = self._create_items(entries)
 
-        return item
+            self.items.extend(new_items)
+
+            # New items start out shown, the filter hides those it does not match
+            if self._visible is not None:
+                self._visible.update(new_items)
+
+            for item in new_items:
+                self._hierarchy.add(item)
+                self._filter_index.add(item, self._filter_fields(item))
+
+            self.update_world_item()
+            self._refresh_filter()
+        finally:
+            self.setUpdatesEnabled(True)
+
+        return new_items
 
     def update_world_item(self):
         """
@@ -116,9 +196,7 @@ class ListWidget(qg.QWidget):
         Sets the parent of a given item and moves that item visually underneath
         its new parent
         """
-        child_children = self.get_children(child_item)
-
-        if parent_item in child_children:
+        if parent_item is child_item or self._hierarchy.is_descendant(parent_item, child_item):
             print('Cannot parent child to grandchild..')
             return
 
@@ -128,19 +206,30 @@ class ListWidget(qg.QWidget):
     def move_item_under(self, move_item, target_item):
         """
         Moves given _ListItem (and all children/grandchildren) visually underneath a target _ListItem
+        """
+        self.move_items_under([move_item], target_item)
 
-        This is essentially a convenience function that calculates the index change value and then
-        calls the move_item_by function.
+    def move_items_under(self, move_items, target_item):
         """
-        parent_index = self.list_widget.layout().indexOf(target_item)
-        child_index_original = self.list_widget.layout().indexOf(move_item)
+        Moves several _ListItems (and all of their children/grandchildren) visually underneath a target _ListItem.
+
+        The new order is worked out once and applied to the view in a single pass, no matter how many items are
+        being moved. The moved items keep their current display order relative to each other.
 
-        index_change = parent_index - child_index_original + 1
+        :param move_items: List of _ListItems to move. Must not contain target_item
+        :param target_item: _ListItem to display the moved items underneath
+        """
+        block = self._subtree_block(move_items)
+
+        if not block:
+            return
 
-        if child_index_original < parent_index:
-            index_change -= 1
+        # Position of the target once the moved items have been taken out of the list
+        target_index = self._index_of(target_item)
+        target_index -= sum(1 for item in block if self._index_of(item) < target_index)
 
-        self.move_item_by(move_item, index_change)
+        self._move_items(block, target_index + 1)
+        self._refresh_filter()
 
     def move_item_by(self, move_item, index_change):
         """
@@ -150,14 +239,15 @@ class ListWidget(qg.QWidget):
         :param move_item: Top most _ListItem of hierarchy to move
         :param index_change: int: number of places in list to move
         """
-        items = [move_item] + self.get_children(move_item)
+        block = self._subtree_block([move_item])
+        index = self._index_of(move_item) + index_change
 
-        for item in items:
-            current_index = self.list_widget.layout().indexOf(item)
-            self.list_widget.layout().insertWidget(current_index + index_change, item)
-            item.update()
+        # When moving down, the offset is counted from the bottom of the moved hierarchy
+        if index_change > 0:
+            index -= len(block) - 1
 
-        self.update_world_item()
+        self._move_items(block, max(index, 0))
+        self._refresh_filter()
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -165,106 +255,130 @@ class ListWidget(qg.QWidget):
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
     def _selection_updated(self, selected_item):
-        if self._multi_select:
-            modifiers = qg.QApplication.keyboardModifiers()
-
-            if modifiers == qc.Qt.ControlModifier:
-                if selected_item not in self._selected_items:
-                    self._selected_items.append(selected_item)
-                elif selected_item in self._selected_items:
-                    self._selected_items.remove(selected_item)
-            elif modifiers == qc.Qt.ShiftModifier:
-                try:
-                    last_disp_index = self.list_widget.layout().indexOf(self._selected_items[0])
-                except IndexError:
-                    last_disp_index = None
-
-                selected_disp_index = self.list_widget.layout().indexOf(selected_item)
-
-                if last_disp_index is not None:
-                    new_indices = range(min(selected_disp_index, last_disp_index),
-                                        max(selected_disp_index, last_disp_index)+1)
-                else:
-                    new_indices = [selected_disp_index]
-
-                self._selected_items += [self.list_widget.layout().itemAt(index).widget()
-                                         for index in new_indices
-                                         if self.list_widget.layout().itemAt(index).widget()
-                                         not in self._selected_items]
-            else:
-                self._selected_items[:] = []
-                if selected_item is not None:
-                    self._selected_items.append(selected_item)
-
-        for item in self.items:
-            if item not in self._selected_items:
-                item.selected = False
-            elif item in self._selected_items:
-                item.selected = True
+        """
+        Updates the selection after an item has been clicked, taking the keyboard modifiers into account.
+        Ctrl toggles the item, Shift adds the range between the anchor and the item, otherwise the item
+        replaces the selection. Passing None clears the selection.
+
+        :param selected_item: _ListItem that was clicked, or None
+        """
+        modifiers = qg.QApplication.keyboardModifiers()
+
+        if selected_item is None:
+            changed = self._selection.clear()
+        elif self._multi_select and modifiers == qc.Qt.ControlModifier:
+            changed = self._selection.toggle(selected_item)
+        elif self._multi_select and modifiers == qc.Qt.ShiftModifier:
+            changed = self._selection.select_range(selected_item)
+        else:
+            changed = self._selection.select(selected_item)
+
+        self._apply_selection(changed)
+
+    def _apply_selection(self, changed):
+        """
+        Repaints the items whose selected state changed and emits a single selection_changed signal
+
+        :param changed: List of _ListItems returned by the selection model
+        """
+        if not changed:
+            return
+
+        for item in changed:
+            item.selected = item in self._selection
+
+        self.selection_changed.emit(self._selection.items())
+
+    def select_all(self):
+        """
+        Selects every item in the list
+        """
+        self._apply_selection(self._selection.select_all())
+
+    def clear_selection(self):
+        """
+        Deselects every item in the list
+        """
+        self._apply_selection(self._selection.clear())
 
     def remove_selected(self):
         """
         Removes all currently selected items and their children
         """
         # Make sure there is something to delete
-        if len(self._selected_items) is 0:
+        if len(self._selection) is 0:
             return
 
-        deletion_items = []
+        # Mark selected items and their children for deletion
+        self._remove_items(self._with_children(self._selection.items()))
 
-        # Mark selected items for deletion
-        for selected_item in self._selected_items:
-            # Delete selected item
-            if selected_item not in deletion_items:
-                deletion_items.append(selected_item)
+    def remove_item(self, list_item):
+        """
+        Removes an item and its children
+        """
+        self.remove_items([list_item])
 
-            # Delete children of selected item
-            for item in self.get_children(selected_item):
-                if item not in deletion_items:
-                    deletion_items.append(item)
+    def remove_items(self, list_items):
+        """
+        Removes several items and all of their children in one pass.
 
-        # Delete items
-        for item in deletion_items:
-            del self.items[self.items.index(item)]
-            self.list_widget.layout().removeWidget(item)
-            item.deleteLater()
+        The item list and display order are each rebuilt once, and the removed widgets are hidden straight away
+        but deleted in batches over the following turns of the event loop.
 
-        # Make sure selection is cleared
-        self._selection_updated(None)
+        :param list_items: Iterable of _ListItems to remove
+        """
+        self._remove_items(self._with_children(list_items))
 
-    def remove_item(self, list_item):
-        deletion_items = []
+    def _remove_items(self, deletion_items):
+        """
+        Deletes the given items and reports any change to the selection
+
+        :param deletion_items: List of _ListItems, each listed before its children
+        """
+        if not deletion_items:
+            return
+
+        doomed = set(deletion_items)
+        self.items[:] = [item for item in self.items if item not in doomed]
+
+        # Children before their parents, so nothing is re-parented to the world on the way
+        for item in reversed(deletion_items):
+            self._hierarchy.remove(item)
+            self._names.remove(item.text)
+            self._filter_index.remove(item)
+            if self._visible is not None:
+                self._visible.discard(item)
 
-        # Mark items for deletion and
-        if list_item not in deletion_items:
-            deletion_items.append(list_item)
+        self._discard_items(deletion_items)
 
-            # Delete children of selected item
-            for item in self.get_children(list_item):
-                if item not in deletion_items:
-                    deletion_items.append(item)
+        selection_changed = False
 
-                # Delete items
         for item in deletion_items:
-            del self.items[self.items.index(item)]
-            self.list_widget.layout().removeWidget(item)
-            item.deleteLater()
+            if item in self._selection:
+                self._selection.discard(item)
+                selection_changed = True
+
+        if selection_changed:
+            self.selection_changed.emit(self._selection.items())
 
     def remove_all(self):
         """
         Removes all items from the list
         """
-        for item in self.items:
-            self.list_widget.layout().removeWidget(item)
-            item.deleteLater()
+        self._discard_items(list(self._order))
 
         self.items[:] = []
-        self._selection_updated(None)
+        self._hierarchy.clear()
+        self._names.clear()
+        self._filter_index.clear()
+        if self._visible is not None:
+            self._visible.clear()
+        self.clear_selection()
 
     def rename_selected(self, text):
         if isinstance(text, unicode):
-            for item in self._selected_items:
-                if not self._force_unique_names:
+            for item in self._selection:
+                if not self._force_unique_names or item.text == text:
                     item.text = text
                 else:
                     item.text = self._generate_unique_name(text)
@@ -273,15 +387,32 @@ class ListWidget(qg.QWidget):
         if self.drop_enabled:
             event.accept()
 
+    def dragMoveEvent(self, event):
+        # Over the empty space below the items
+        self._drag_moved(None, None)
+
+    def dragLeaveEvent(self, event):
+        self._drag_left()
+
     def dropEvent(self, event):
-        item = event.source()
+        self._drag_left()
+        item = self.resolve_drag_source(event)
+
+        # Parent items to world and move to bottom of list
+        self.move_to_world(self.resolve_drag_items(item))
+
+    def move_to_world(self, move_items):
+        """
+        Parents the given _ListItems to the world and moves them (and their children/grandchildren) to the
+        bottom of the list in a single pass
+
+        :param move_items: List of _ListItems to move
+        """
+        for item in move_items:
+            item.parent_item = None
 
-        # Parent item to world and move to bottom of list
-        event_items = self.resolve_drag_items(item)
-        for event_item in event_items:
-            event_item.parent_item = None
-            event_item.update()
-            self.move_item_under(event_item, self.get_display_order(self.items)[-1])
+        self._move_items(self._subtree_block(move_items), -1)
+        self._refresh_filter()
 
     def drop_event(self, target_item, event_args):
         """
@@ -307,40 +438,40 @@ class ListWidget(qg.QWidget):
         # If item is dropped on the blank world item (at bottom of list), parent the dropped item to the world
         # and move it to the bottom of the list (above blank world item)
         if target_item == self._world_item:
-            dropped_item.parent_item = None
-            dropped_item.update()
-            self.move_item_under(dropped_item, self.get_display_order(self.items)[-1])
+            self.move_to_world([dropped_item])
             return
 
         # Determines which items the event should apply to in case the user is dragging a selection
         event_items = self.resolve_drag_items(dropped_item)
 
-        for item in event_items:
-            # Make sure user is not trying to parent an item to one of its children
-            if target_item in self.get_children(item):
-                return
+        # Dropping on the lower section of an item with no children makes the dropped items its siblings,
+        # otherwise they become its children
+        if location == 1 and not self._hierarchy.has_children(target_item):
+            new_parent = target_item.parent_item
+        else:
+            new_parent = target_item
 
-            if location == 0:
-                self.move_and_parent(item, target_item)
-            if location == 1:
-                if self.get_children(target_item) != []:
-                    self.move_and_parent(item, target_item)
-                else:
-                    item.parent_item = target_item.parent_item
-                    item.update()
-                    self.move_item_under(item, target_item)
+        # Make sure user is not trying to parent an item to one of its children. Every item is checked before any
+        # of them is re-parented, so a drop that cannot be completed leaves the list untouched
+        if any(self._hierarchy.is_descendant(target_item, item) for item in event_items):
+            print('Cannot parent child to grandchild..')
+            return
+
+        # Re-parent every item first, then move them all underneath the target in one go
+        moved_items = [item for item in event_items if item is not target_item]
+
+        for item in moved_items:
+            item.parent_item = new_parent
+
+        self.move_items_under(moved_items, target_item)
 
     def resolve_drag_items(self, source_item):
-        event_items = []
-        if source_item in self._selected_items:
-            event_items += self._selected_items
-            event_items = self.get_display_order(event_items, reverse=True)
-        else:
-            self._selection_updated(None)
-            self._selection_updated(source_item)
-            event_items.append(source_item)
+        if source_item in self._selection:
+            return self.get_display_order(self._selection.items(), reverse=True)
+
+        self._apply_selection(self._selection.select(source_item))
 
-        return event_items
+        return [source_item]
 
     def get_selected_data(self, hierarchy=False):
         """
@@ -351,19 +482,10 @@ class ListWidget(qg.QWidget):
 
         :param hierarchy: Boolean: If true, the data from all selected item's children is also returned
         """
-        items = []
-
-        # Mark selected items for deletion
-        for selected_item in self._selected_items:
-            # Delete selected item
-            if selected_item not in items:
-                items.append(selected_item)
-
-            if hierarchy:
-                # Delete children of selected item
-                for item in self.get_children(selected_item):
-                    if item not in items:
-                        items.append(item)
+        if hierarchy:
+            items = self._with_children(self._selection.items())
+        else:
+            items = self._selection.items()
 
         return [item.data for item in self.get_display_order(items)]
 
@@ -373,7 +495,7 @@ class ListWidget(qg.QWidget):
 
         The list is returned in the order in which the items are display
         """
-        return [item.data for item in self.get_display_order(self.items)]
+        return [item.data for item in self._order]
 
     def get_selected_items(self, hierarchy=False):
         """
@@ -384,27 +506,16 @@ class ListWidget(qg.QWidget):
 
         :param hierarchy: Boolean: If true, all selected item's children are also returned
         """
-        items = []
-
-        # Mark selected items for deletion
-        for selected_item in self._selected_items:
-            # Delete selected item
-            if selected_item not in items:
-                items.append(selected_item)
-
-            if hierarchy:
-                # Delete children of selected item
-                for item in self.get_children(selected_item):
-                    if item not in items:
-                        items.append(item)
+        if hierarchy:
+            return self._with_children(self._selection.items())
 
-        return items
+        return self._selection.items()
 
     def get_all_items(self):
         """
         Returns a list containing all current list items, ordered as they appear in the outliner (top to bottom)
         """
-        return self.get_display_order(self.items)
+        return list(self._order)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -425,6 +536,283 @@ class ListWidget(qg.QWidget):
             for item in self.items:
                 item.set_icon_state(state)
 
+            # Scale each distinct icon once up front, rows then share the scaled copy when they paint
+            if self.items and self.items[0]._icon_size > 0:
+                icons = dict((item._icon_pixmap.cacheKey(), item._icon_pixmap) for item in self.items
+                             if item._icon_pixmap is not None)
+
+                for icon in icons.itervalues():
+                    kuiUtils.get_scaled_icon(icon, self.items[0]._icon_size)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Drag Feedback
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @classmethod
+    def drop_location(cls, row_height, pos_y):
+        """
+        Returns which zone of a row a drag/drop at pos_y (relative to the top of the row) falls in
+
+        :return Int: 0 = top/middle, drop onto the row. 1 = bottom, drop below the row
+        """
+        if pos_y < row_height * (1 - cls.DROP_ZONE_LOWER):
+            return 0
+
+        return 1
+
+    def _drag_moved(self, target_item, location):
+        """
+        Called by the view for every drag move over the list. Only the rows whose feedback changes are repainted.
+
+        :param target_item: _ListItem under the mouse, or None
+        :param location: Int: Zone of target_item the mouse is in, see drop_location
+        """
+        self._set_drop_target(target_item, location)
+
+        if not self._autoscroll_timer.isActive():
+            self._autoscroll_timer.start()
+
+    def _drag_left(self, item=None):
+        """
+        Called by the view when a drag leaves an item (or the whole list when item is None), or is dropped.
+        Clears the drop feedback unless another item has become the target in the meantime.
+        """
+        if item is None or item is self._drop_target:
+            self._set_drop_target(None, None)
+
+        self._autoscroll_timer.stop()
+
+    def _set_drop_target(self, item, location):
+        """
+        Moves the drop feedback (border when dropping onto a row, line when dropping below it) to the given item
+        """
+        if item is self._drop_target and location == self._drop_location:
+            return
+
+        if self._drop_target is not None and self._drop_target is not item:
+            self._set_drop_feedback(self._drop_target, None)
+
+        self._drop_target = item
+        self._drop_location = location
+
+        if item is not None:
+            self._set_drop_feedback(item, location)
+
+    @staticmethod
+    def _set_drop_feedback(item, location):
+        item._drag_hover_lower = location == 1
+
+        if location == 0:
+            item.set_border_colour(_ItemWidget.COLOUR_HOVER_SELECTED)
+        else:
+            item.set_border_colour([0, 0, 0, 0])
+
+    def _autoscroll(self):
+        """
+        Scrolls the list while a drag is held near its top or bottom edge. Stops once the mouse moves away.
+        """
+        scroll_view = self._scroll_view()
+        viewport = scroll_view.viewport()
+        pos = viewport.mapFromGlobal(qg.QCursor.pos())
+
+        if not viewport.rect().contains(pos):
+            self._autoscroll_timer.stop()
+            return
+
+        if pos.y() < self.AUTOSCROLL_MARGIN:
+            step = -self.AUTOSCROLL_STEP
+        elif pos.y() > viewport.height() - self.AUTOSCROLL_MARGIN:
+            step = self.AUTOSCROLL_STEP
+        else:
+            return
+
+        scroll_bar = scroll_view.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.value() + step)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # Filtering
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def set_filter(self, text):
+        """
+        Hides every item that does not match the given text, ignoring case.
+
+        An item matches if any of its filter fields (see _filter_fields) or its parent's text contains the text.
+        The ancestors of matching items stay visible so the hierarchy can still be read. Hidden items are neither
+        laid out nor painted. An empty string shows every item again.
+
+        :param text: String to filter by
+        """
+        self._filter_text = text
+        self._refresh_filter()
+
+    def _filter_fields(self, item):
+        """
+        Returns the text an item can be found by. The item's own text must come first.
+
+        Override to make items searchable by more than their text, i.e the type of module they represent.
+        """
+        return (item.text,)
+
+    def _refresh_filter(self):
+        """
+        Works out which items the current filter shows and shows/hides only the items whose state changed. While
+        filtering, the change is found from the items shown before and after, so narrowing or widening the filter
+        does not go through every item in the list.
+        """
+        if not self._filter_text and self._visible is None:
+            return
+
+        if self._filter_text:
+            visible = set(self._filter_index.match(self._filter_text))
+
+            # Children of items whose text matches
+            for parent in self._filter_index.match(self._filter_text, field=0):
+                visible.update(self._hierarchy.children(parent))
+
+            # Ancestors of everything visible
+            for item in list(visible):
+                parent = self._hierarchy.parent(item)
+
+                while parent is not None and parent not in visible:
+                    visible.add(parent)
+                    parent = self._hierarchy.parent(parent)
+        else:
+            visible = None
+
+        # Every item is shown when nothing was or will be filtered
+        if self._visible is None:
+            hidden = [item for item in self._order if item not in visible]
+            shown = ()
+        elif visible is None:
+            hidden = ()
+            shown = [item for item in self._order if item not in self._visible]
+        else:
+            hidden = self._visible - visible
+            shown = visible - self._visible
+
+        self._visible = visible
+
+        if hidden or shown:
+            self._set_items_hidden(hidden, shown)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # View Primitives
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def _create_items(self, entries):
+        """
+        Creates new items and appends them to the display order and view.
+
+        Items report clicks and drops straight to their owning list, so no signals need connecting per item.
+
+        :param entries: List of (label, icon_pixmap, data) tuples
+        :return List of _ItemWidgets
+        """
+        layout = self.list_widget.layout()
+        new_items = []
+
+        for label, icon_pixmap, data in entries:
+            item = _ItemWidget(label, icon_pixmap, data, parent=self.list_widget, drag_enabled=self.drag_enabled,
+                               drop_enabled=self.drop_enabled, owner=self)
+            self._order.append(item)
+            layout.addWidget(item)
+            new_items.append(item)
+
+        return new_items
+
+    def _move_items(self, items, index):
+        """
+        Moves items already in the list so they are displayed together, in the given order, starting at index.
+        The index is counted with the moved items taken out of the list, a negative index moves them to the end.
+
+        Only the widgets whose position actually changed are re-inserted into the layout, with repainting
+        suspended until all of them are in place.
+        """
+        first_index = min(self._index_of(item) for item in items)
+        first, last = self._order.move_block(items, index)
+        layout = self.list_widget.layout()
+
+        # Walk towards the original position of the items, so every insert moves one of the items being moved
+        # rather than shuffling the items they are moving past
+        if self._index_of(items[0]) > first_index:
+            indices = xrange(last, first - 1, -1)
+        else:
+            indices = xrange(first, last + 1)
+
+        self.setUpdatesEnabled(False)
+
+        try:
+            for i in indices:
+                item = self._order[i]
+                if layout.itemAt(i).widget() is not item:
+                    layout.insertWidget(i, item)
+
+            self.update_world_item()
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def _scroll_view(self):
+        """
+        Returns the scroll area the items are displayed in
+        """
+        return self.scroll_area
+
+    def _set_items_hidden(self, hidden, shown):
+        """
+        Hides and shows item widgets. A hidden widget takes no space in the layout and is not painted.
+
+        :param hidden: Iterable of _ListItems to hide
+        :param shown: Iterable of _ListItems to show
+        """
+        self.setUpdatesEnabled(False)
+
+        try:
+            for item in hidden:
+                item.setVisible(False)
+
+            for item in shown:
+                item.setVisible(True)
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def _discard_items(self, items):
+        """
+        Removes items from the display order and view, and queues their widgets for deletion
+        """
+        self._order.remove_many(items)
+        layout = self.list_widget.layout()
+
+        self.setUpdatesEnabled(False)
+
+        try:
+            for item in items:
+                layout.removeWidget(item)
+                item.hide()
+        finally:
+            self.setUpdatesEnabled(True)
+
+        if not self._deletion_queue:
+            qc.QTimer.singleShot(0, self._delete_queued_items)
+
+        self._deletion_queue.extend(items)
+
+    def _delete_queued_items(self):
+        """
+        Deletes the next batch of removed item widgets, rescheduling itself until the queue is empty
+        """
+        batch = self._deletion_queue[:self.DELETE_BATCH_SIZE]
+        del self._deletion_queue[:self.DELETE_BATCH_SIZE]
+
+        for item in batch:
+            item.deleteLater()
+
+        if self._deletion_queue:
+            qc.QTimer.singleShot(0, self._delete_queued_items)
+
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
     # Utility
@@ -437,23 +825,72 @@ class ListWidget(qg.QWidget):
         :param parent_item: The parent _ListItem to find children/grandchildren for
         :return List: All children/grandchildren of given _ListItem
         """
-        children = []
+        return self._hierarchy.descendants(parent_item)
 
-        def recursive_search(parent):
-            """
-            Given a _ListItem, recursively searches through all children and appends
-            each one to the children list.
+    def get_depth(self, item):
+        """
+        Returns the number of ancestors a _ListItem has, 0 for items parented to the world
+        """
+        return self._hierarchy.depth(item)
 
-            :param parent: _ListItem of parent to find children/grandchildren for
-            """
-            for item in self.items:
-                if item.parent_item == parent:
-                    children.append(item)
-                    recursive_search(item)
+    def _subtree_block(self, items):
+        """
+        Given a list of _ListItems, returns them in display order with each item directly followed by its
+        children and grandchildren, also in display order. This is the order a group of hierarchies is laid out
+        in once moved.
+        """
+        block = []
+        visited = set()
+
+        for item in self.get_display_order(items):
+            if item in visited:
+                continue
+
+            subtree = [item] + self.get_display_order(self._hierarchy.descendants(item))
+            block += [child for child in subtree if child not in visited]
+            visited.update(subtree)
 
-        recursive_search(parent_item)
+        return block
+
+    def _with_children(self, items):
+        """
+        Given a list of _ListItems, returns a new list containing each item followed by its children and
+        grandchildren. Items that appear more than once are only included the first time.
+        """
+        result = []
+        visited = set()
+
+        for item in items:
+            if item in visited:
+                continue
+
+            visited.add(item)
+            result.append(item)
+
+            for child in self._hierarchy.descendants(item):
+                if child not in visited:
+                    visited.add(child)
+                    result.append(child)
+
+        return result
+
+    def _index_of(self, item):
+        """
+        Returns the display index of the given item. The world item is always displayed last.
+        """
+        if item is getattr(self, '_world_item', None):
+            return len(self._order)
+
+        return self._order.index(item)
+
+    def _item_at(self, index):
+        """
+        Returns the item displayed at the given index
+        """
+        if index == len(self._order):
+            return getattr(self, '_world_item', None)
 
-        return children
+        return self._order[index]
 
     def get_display_order(self, items, reverse=False, in_place=False):
         """
@@ -467,20 +904,47 @@ class ListWidget(qg.QWidget):
         :return list
         """
         if not in_place:
-            return sorted(items, key=lambda item: self.list_widget.layout().indexOf(item), reverse=reverse)
+            return sorted(items, key=self._index_of, reverse=reverse)
         if in_place:
-            items.sort(items, key=lambda item: self.list_widget.layout().indexOf(item), reverse=reverse)
+            items.sort(key=self._index_of, reverse=reverse)
 
     def _generate_unique_name(self, text):
-        list_names = [item.text for item in self.items]
+        """
+        Returns text if no item is using it, otherwise text's base name followed by the next free number
+        """
+        return self._names.unique_name(text)
 
-        try:
-            unique_mod = str(max([int(re.findall(r'\d+$', t)[0]) for t in list_names
-                                  if re.findall(r'\d+$', t) != []]) + 1)
-        except ValueError:
-            unique_mod = 1
+    def _item_reparented(self, item):
+        """
+        Called by an item after its parent has changed. The hierarchy has already recomputed the depth of the
+        whole subtree in one traversal, so the subtree only needs its indentation refreshed.
+        """
+        item._refresh_indent()
+
+        for child in self._hierarchy.descendants(item):
+            child._refresh_indent()
+
+    def _item_renamed(self, item, old_text):
+        """
+        Called by an item whenever its text changes, keeps the name registry up to date
+        """
+        if item in self._hierarchy:
+            self._names.rename(old_text, item.text)
+            self._filter_index.update(item, self._filter_fields(item))
+            self._refresh_filter()
+
+    @staticmethod
+    def resolve_drag_source(event):
+        """
+        Returns the list item being dragged in a drag/drop event.
 
-            return '%s%s' % (text, unique_mod)
+        An _ItemWidget is its own drag source, whereas a ListView starts the drag from its view and stores
+        the dragged item on it.
+
+        :param event: QDragEnterEvent/QDragMoveEvent/QDropEvent
+        """
+        source = event.source()
+        return getattr(source, 'drag_item', source)
 
     @staticmethod
     def override_function(*args):
@@ -528,16 +992,19 @@ class _ItemWidget(qg.QWidget):
                 SELECTED: qg.QBrush(qg.QColor(*COLOUR_SELECTED)),
                 SELECTED_HOVER: qg.QBrush(qg.QColor(*COLOUR_HOVER_SELECTED))}
 
-    def __init__(self, label, icon_pixmap, data, parent=None, drag_enabled=True, drop_enabled=True):
+    def __init__(self, label, icon_pixmap, data, parent=None, drag_enabled=True, drop_enabled=True, owner=None):
         super(_ItemWidget, self).__init__(parent=parent)
 
+        # ListWidget the item belongs to. Kept separately from the Qt parent, which changes once laid out
+        self._owner = owner
+
         # Text Pen
         self._pen_text = qg.QPen(qg.QColor(250, 252, 255), 1, qc.Qt.SolidLine)
         self._pen_border = qg.QPen(qg.QColor(0, 0, 0, 0), 1, qc.Qt.SolidLine)
         self._pen_line = qg.QPen(qg.QColor(*self.COLOUR_HOVER_SELECTED), 1, qc.Qt.SolidLine)
 
-        # IDENTIFIER
-        self.uuid = uuid.uuid4()
+        # IDENTIFIER, generated on first use
+        self._uuid = None
 
         self._text = label
         self._icon_pixmap = icon_pixmap
@@ -550,9 +1017,7 @@ class _ItemWidget(qg.QWidget):
             self.setAcceptDrops(True)
 
         # Hierarchy
-        self.parent_item = None
-        self._children = []
-        self.indent_width = 0
+        self._parent_item = None
 
         # Button States
         self._hover = False
@@ -575,25 +1040,48 @@ class _ItemWidget(qg.QWidget):
         """
         self.parent_item = parent
 
-        self.update()
+    @property
+    def parent_item(self):
+        return self._parent_item
 
-    def update(self):
+    @parent_item.setter
+    def parent_item(self, parent):
+        """
+        Sets the item's parent and updates the owning list's hierarchy index. Parenting an item underneath
+        one of its own children is ignored.
         """
-        Overrides widgets default update event to add extra update functionality.
+        if parent is self._parent_item:
+            return
+
+        if self._owner is None:
+            self._parent_item = parent
+            self._refresh_indent()
+        elif self._owner._hierarchy.reparent(self, parent):
+            self._parent_item = parent
+            self._owner._item_reparented(self)
 
-        Updates:
-        Indentation of item
-        Forces paintEvent
+    @property
+    def indent_width(self):
         """
-        if self.parent_item is None:
-            self.indent_width = 0
-        else:
-            try:
-                self.indent_width = (self.parent_item.indent_width / self.INDENT + 1) * self.INDENT
-            except AttributeError:
-                self.indent_width = 0
+        Returns the item's indentation in pixels, read from the depth cached by the owning list's hierarchy
+        """
+        if self._owner is None:
+            return 0
 
-        super(_ItemWidget, self).update()
+        return self._owner._hierarchy.depth(self) * self.INDENT
+
+    def _refresh_indent(self):
+        """
+        Updates the minimum width and repaints the item after its indentation has changed
+        """
+        self._update_minimum_width()
+        self.update()
+
+    def _update_minimum_width(self):
+        fm = qg.QFontMetrics(qg.QFont())
+        text_width = fm.width(self._text)
+
+        self.setMinimumWidth(self._icon_size + self.indent_width + text_width + 16)
 
     @property
     def selected(self):
@@ -610,6 +1098,16 @@ class _ItemWidget(qg.QWidget):
     # Painting/Text
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
+    @property
+    def uuid(self):
+        """
+        Returns the item's UUID, which is only generated the first time it is asked for
+        """
+        if self._uuid is None:
+            self._uuid = uuid.uuid4()
+
+        return self._uuid
+
     @property
     def text(self):
         """
@@ -625,12 +1123,12 @@ class _ItemWidget(qg.QWidget):
         :param text: Unicode string to display
         """
         if isinstance(text, unicode):
-            self._text = text
+            old_text, self._text = self._text, text
 
-            fm = qg.QFontMetrics(qg.QFont())
-            text_width = fm.width(text)
+            if self._owner is not None:
+                self._owner._item_renamed(self, old_text)
 
-            self.setMinimumWidth(self._icon_size + self.indent_width + text_width + 16)
+            self._update_minimum_width()
 
     def set_text_colour(self, rgba):
         """
@@ -678,57 +1176,10 @@ class _ItemWidget(qg.QWidget):
 
     def paintEvent(self, event):
         painter = qg.QStylePainter(self)
-        painter.setRenderHint(qg.QPainter.Antialiasing)
         option = qg.QStyleOption()
         option.initFrom(self)
 
-        x = option.rect.x()
-        y = option.rect.y()
-        height = option.rect.height() - 1
-        width = option.rect.width() - 1
-
-        # Set a transparent pen for drawing rectangle (no border)
-        painter.setPen(self._pen_border)
-
-        # Set brush
-        if not self._selected and not self._is_down:
-            if not self._hover:
-                painter.setBrush(self._brushes[self.DEFAULT])
-            else:
-                painter.setBrush(self._brushes[self.HOVER])
-        elif self._selected and not self._is_down:
-            if not self._hover:
-                painter.setBrush(self._brushes[self.SELECTED])
-            else:
-                painter.setBrush(self._brushes[self.SELECTED_HOVER])
-        elif self._is_down:
-            painter.setBrush(self._brushes[self.DOWN])
-        else:
-            painter.setBrush(self._brushes[self.DEFAULT])
-
-        # Draw background rectangle
-        painter.drawRect(qc.QRect(x+1, y+1, width-1, height - 1))
-
-        # Draw Pixmap Icon
-        if self._icon_pixmap is not None and self._icon_size > 0:
-            painter.drawPixmap(qc.QRect(x+self.indent_width+8, y+(self._icon_size/10),
-                                        self._icon_size, self._icon_size), self._icon_pixmap)
-
-        # Draw Text
-        painter.setPen(self._pen_text)
-        painter.drawText(x+self.indent_width+self._icon_size+16, y, width, height,
-                         (qc.Qt.AlignLeft | qc.Qt.AlignVCenter), self._text)
-
-        if self.parent_item is not None:
-            parent_text = self.parent_item._text
-        else:
-            parent_text = 'world'
-        painter.drawText(x + self.indent_width + self._icon_size + 80, y, width, height,
-                         (qc.Qt.AlignLeft | qc.Qt.AlignVCenter), parent_text)
-
-        if self._drag_hover_lower:
-            painter.setPen(self._pen_line)
-            painter.drawLine(0, height, width, height)
+        paint_list_item(painter, option.rect, self)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     # ---------------------------------------------------------------------------------------------------------------- #
@@ -765,6 +1216,9 @@ class _ItemWidget(qg.QWidget):
             if self.rect().contains(mouse_pos):
                 self.clicked.emit()
 
+                if self._owner is not None:
+                    self._owner._selection_updated(self)
+
         self.update()
 
     def enterEvent(self, event):
@@ -796,9 +1250,8 @@ class _ItemWidget(qg.QWidget):
             event.accept()
 
     def dragLeaveEvent(self, event):
-        self.set_border_colour([0, 0, 0, 0])
-        self._drag_hover_lower = False
-        self.update()
+        if self._owner is not None:
+            self._owner._drag_left(self)
 
     def dropEvent(self, event):
         """
@@ -810,44 +1263,165 @@ class _ItemWidget(qg.QWidget):
         if not self.drop_enabled:
             return
 
-        dropped_widget = event.source()
-
-        height = self.frameGeometry().height()
-        pos_y = event.pos().y()
-
-        h_section = height*0.30
+        dropped_widget = ListWidget.resolve_drag_source(event)
+        event_args = [dropped_widget, ListWidget.drop_location(self.frameGeometry().height(), event.pos().y())]
 
-        if pos_y < (height - h_section):
-            self.received_drop.emit([dropped_widget, 0])
-        else:
-            self.received_drop.emit([dropped_widget, 1])
+        self.received_drop.emit(event_args)
 
-        # Clean up
-        self.set_border_colour([0, 0, 0, 0])
-        self._drag_hover_lower = False
-        self.update()
-
-        # Ideas:
-        # Emit the dropped widget in a signal to the list
+        if self._owner is not None:
+            # Clean up
+            self._owner._drag_left()
+            self._owner.drop_event(self, event_args)
 
     def dragMoveEvent(self, event):
         """
-        Overrides widgets default dragMoveEvent function
+        Overrides widgets default dragMoveEvent function. The owning list tracks which row is being dragged over
+        and only repaints rows when the target or drop zone changes.
 
         :param event:
         """
-        height = self.frameGeometry().height()
+        if self._owner is not None:
+            self._owner._drag_moved(self, ListWidget.drop_location(self.frameGeometry().height(), event.pos().y()))
 
-        pos_y = event.pos().y()
-        h_section = height * 0.30
 
-        if pos_y < (height - h_section):
-            self.set_border_colour(self.COLOUR_HOVER_SELECTED)
-        else:
-            self._drag_hover_lower = True
-            self.set_border_colour([0, 0, 0, 0])
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# ITEM PAINTING
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# Set to False to paint every item from scratch, useful when debugging painting issues
+RENDER_CACHE_ENABLED = True
+
+# Prepared label text, shared by every item. Cleared when it grows past the limit.
+_STATIC_TEXT_CACHE = {}
+_PAINT_CACHE_LIMIT = 2000
+
+
+def paint_list_item(painter, rect, item):
+    """
+    Paints a list item's background, icon, label and parent name into the given rect.
+
+    Shared by _ItemWidget.paintEvent and the ListView delegate so both display modes look identical. Reads the
+    item's state (_hover, _is_down, _selected, _drag_hover_lower), pens, icon and indentation.
+
+    Rendered items are kept in the global QPixmapCache, keyed by everything that affects how they look, so
+    repainting an item in a state it has already been drawn in is a single pixmap blit. Items that look the same
+    share a pixmap.
+
+    :param painter: Active QPainter
+    :param rect: QRect to paint the item into
+    :param item: _ItemWidget or _ListItem to paint
+    """
+    if RENDER_CACHE_ENABLED and rect.width() > 0 and rect.height() > 0:
+        painter.drawPixmap(rect.topLeft(), _cached_item_pixmap(painter, rect, item))
+    else:
+        _render_list_item(painter, rect, item)
+
+    # The drop line is only shown while dragging, so it is drawn on top rather than cached
+    if item._drag_hover_lower:
+        painter.setPen(item._pen_line)
+        painter.drawLine(rect.x(), rect.bottom(), rect.right(), rect.bottom())
+
+
+def _cached_item_pixmap(painter, rect, item):
+    """
+    Returns a pixmap of the item as it currently looks, rendering it if no matching pixmap is cached
+    """
+    font = painter.font()
+    key = 'kar_list_item:%r' % ((_item_state(item), rect.width(), rect.height(), font.key(),
+                                 item._icon_size, item.indent_width,
+                                 item._icon_pixmap.cacheKey() if item._icon_pixmap is not None else None,
+                                 item._pen_text.color().rgba(), item._pen_border.color().rgba(),
+                                 item._text, _parent_text(item)),)
+
+    pixmap = qg.QPixmap()
+
+    if not qg.QPixmapCache.find(key, pixmap):
+        pixmap = qg.QPixmap(rect.size())
+        pixmap.fill(qc.Qt.transparent)
+
+        pixmap_painter = qg.QPainter(pixmap)
+        pixmap_painter.setFont(font)
+        _render_list_item(pixmap_painter, qc.QRect(qc.QPoint(0, 0), rect.size()), item)
+        pixmap_painter.end()
+
+        qg.QPixmapCache.insert(key, pixmap)
+
+    return pixmap
+
+
+def _render_list_item(painter, rect, item):
+    """
+    Paints the item's background, icon and text (everything except the drop line) into the given rect
+    """
+    painter.setRenderHint(qg.QPainter.Antialiasing)
+
+    x = rect.x()
+    y = rect.y()
+    height = rect.height() - 1
+    width = rect.width() - 1
+
+    # Set a transparent pen for drawing rectangle (no border)
+    painter.setPen(item._pen_border)
+    painter.setBrush(_ItemWidget._brushes[_item_state(item)])
+
+    # Draw background rectangle
+    painter.drawRect(qc.QRect(x+1, y+1, width-1, height - 1))
+
+    # Draw Pixmap Icon
+    if item._icon_pixmap is not None and item._icon_size > 0:
+        painter.drawPixmap(x+item.indent_width+8, y+(item._icon_size/10),
+                           kuiUtils.get_scaled_icon(item._icon_pixmap, item._icon_size))
+
+    # Draw Text
+    painter.setPen(item._pen_text)
+    _draw_static_text(painter, x + item.indent_width + item._icon_size + 16, y, height, item._text)
+    _draw_static_text(painter, x + item.indent_width + item._icon_size + 80, y, height, _parent_text(item))
+
+
+def _item_state(item):
+    """
+    Returns the _ItemWidget state constant (DEFAULT, HOVER, ...) matching the item's current button state
+    """
+    if item._is_down:
+        return _ItemWidget.DOWN
+
+    if item._selected:
+        return _ItemWidget.SELECTED_HOVER if item._hover else _ItemWidget.SELECTED
+
+    return _ItemWidget.HOVER if item._hover else _ItemWidget.DEFAULT
+
+
+def _parent_text(item):
+    """
+    Returns the text displayed next to the item's label, naming its parent
+    """
+    if item.parent_item is not None:
+        return item.parent_item._text
+
+    return 'world'
+
+
+def _draw_static_text(painter, x, y, height, text):
+    """
+    Draws text left aligned and vertically centred, reusing a prepared QStaticText for the text and font
+    """
+    font = painter.font()
+    key = (text, font.key())
+
+    static_text = _STATIC_TEXT_CACHE.get(key)
+
+    if static_text is None:
+        if len(_STATIC_TEXT_CACHE) >= _PAINT_CACHE_LIMIT:
+            _STATIC_TEXT_CACHE.clear()
+
+        static_text = qg.QStaticText(text)
+        static_text.setTextFormat(qc.Qt.PlainText)
+        static_text.prepare(qg.QTransform(), font)
+        _STATIC_TEXT_CACHE[key] = static_text
+
+    painter.drawStaticText(qc.QPointF(x, y + (height - static_text.size().height()) / 2.0), static_text)
 
-        self.update()
 
 # -------------------------------------------------------------------------------------------------------------------- #
 # -------------------------------------------------------------------------------------------------------------------- #
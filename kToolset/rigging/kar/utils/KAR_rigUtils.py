@@ -1 +1,186 @@
-pass
\ No newline at end of file
+# Python Imports
+import re
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+# NAMING
+# -------------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------------------------------------------------------------------------------- #
+_SUFFIX_PATTERN = re.compile(r'^(.*?)(\d+)$')
+
+
+def split_name(name):
+    """
+    Splits a name into its base and trailing number. i.e 'Biped_Arm12' -> ('Biped_Arm', 12)
+
+    :param name: String
+    :return: Tuple: (base, number), number is None if the name does not end in a number
+    """
+    match = _SUFFIX_PATTERN.match(name)
+
+    if match is None:
+        return name, None
+
+    return match.group(1), int(match.group(2))
+
+
+# Name tokens (case insensitive) that mark a side when they start or end a name, i.e 'L_Arm' or 'Biped_Leg_Right'
+SIDE_TOKENS = {'l': 'L', 'lf': 'L', 'lft': 'L', 'left': 'L',
+               'r': 'R', 'rt': 'R', 'rgt': 'R', 'right': 'R',
+               'c': 'C', 'm': 'C', 'mid': 'C', 'center': 'C', 'centre': 'C'}
+
+
+def get_side(name):
+    """
+    Returns the side a name is marked with by its first or last '_' separated token. i.e 'Biped_Arm_L' -> 'L'
+
+    :param name: String
+    :return: String: 'L', 'R', 'C' or None if the name has no side token
+    """
+    tokens = name.split('_')
+
+    if len(tokens) < 2:
+        return None
+
+    return SIDE_TOKENS.get(tokens[-1].lower()) or SIDE_TOKENS.get(tokens[0].lower())
+
+
+def get_prefix(name):
+    """
+    Returns the part of a name before its first '_', or None if the name has no '_'. i.e 'Biped_Arm_L' -> 'Biped'
+    """
+    prefix, separator, rest = name.partition('_')
+
+    if not separator:
+        return None
+
+    return prefix
+
+
+def get_suffix(name):
+    """
+    Returns the part of a name after its last '_', or None if the name has no '_'. i.e 'Biped_Arm_L' -> 'L'
+    """
+    rest, separator, suffix = name.rpartition('_')
+
+    if not separator:
+        return None
+
+    return suffix
+
+
+class NameRegistry(object):
+    """
+    Keeps track of the names in use and the highest number used after each base name, so a unique name can be
+    generated without looking at every other name.
+
+    Nothing here is specific to list items, so the same registry can be used for the Maya nodes a module creates.
+    """
+
+    def __init__(self, names=()):
+        """
+        :param names: Iterable of names already in use
+        """
+        self._names = {}     # name -> number of times it is in use
+        self._suffixes = {}  # base name -> {number: number of names using it}
+        self._highest = {}   # base name -> highest number in use
+
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __len__(self):
+        return sum(self._names.values())
+
+    def add(self, name):
+        """
+        Registers a name as in use. Registering a name more than once is allowed, it stays in use until it has
+        been removed as many times.
+        """
+        self._names[name] = self._names.get(name, 0) + 1
+
+        base, number = split_name(name)
+        if number is None:
+            return
+
+        suffixes = self._suffixes.setdefault(base, {})
+        suffixes[number] = suffixes.get(number, 0) + 1
+
+        if number > self._highest.get(base, 0):
+            self._highest[base] = number
+
+    def remove(self, name):
+        """
+        Releases a name. Names that are not registered are ignored.
+        """
+        count = self._names.get(name)
+
+        if count is None:
+            return
+
+        if count > 1:
+            self._names[name] = count - 1
+        else:
+            del self._names[name]
+
+        base, number = split_name(name)
+        if number is None:
+            return
+
+        suffixes = self._suffixes[base]
+        if suffixes[number] > 1:
+            suffixes[number] -= 1
+            return
+
+        del suffixes[number]
+
+        # Only look through the base name's other numbers when its highest one is released
+        if not suffixes:
+            del self._suffixes[base]
+            del self._highest[base]
+        elif number == self._highest[base]:
+            self._highest[base] = max(suffixes)
+
+    def rename(self, old_name, new_name):
+        """
+        Releases old_name and registers new_name
+        """
+        self.remove(old_name)
+        self.add(new_name)
+
+    def clear(self):
+        """
+        Releases every name
+        """
+        self._names.clear()
+        self._suffixes.clear()
+        self._highest.clear()
+
+    def unique_name(self, name):
+        """
+        Returns the given name if it is not in use, otherwise its base name followed by one more than the highest
+        number in use after that base name. i.e 'Biped_Arm' -> 'Biped_Arm3' when 'Biped_Arm2' is in use.
+
+        The name is not registered, call add() (or claim()) once it has been used.
+
+        :param name: String: Requested name
+        :return: String: Name that is not in use
+        """
+        if name not in self._names:
+            return name
+
+        base = split_name(name)[0]
+
+        return '%s%s' % (base, self._highest.get(base, 0) + 1)
+
+    def claim(self, name):
+        """
+        Returns a unique version of the given name (see unique_name) and registers it
+        """
+        name = self.unique_name(name)
+        self.add(name)
+
+        return name
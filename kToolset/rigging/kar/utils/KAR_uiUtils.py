@@ -23,14 +23,70 @@ def get_style_sheet(file_name):
     return style_sheet
 
 
+# Icons loaded by get_icon, by file name, and pre-scaled copies made by get_scaled_icon,
+# by (icon, size, device pixel ratio). Shared by every widget in the process.
+_ICON_CACHE = {}
+_SCALED_ICON_CACHE = {}
+
+
 def get_icon(file_name):
     """
-    Given a file name, returns the corresponding .PNG image from the 'icons' directory as a QPixmap() object
+    Given a file name, returns the corresponding .PNG image from the 'icons' directory as a QPixmap() object.
+
+    Each icon is only loaded once, every caller asking for the same file name shares the same QPixmap.
 
     :param file_name: String: File name of icon, WITHOUT EXTENSION
     :return: QPixmap: QPixmap containing the specified .PNG image
     """
+    icon_pixmap = _ICON_CACHE.get(file_name)
+
+    if icon_pixmap is None:
+        icon_pixmap = _ICON_CACHE[file_name] = _load_icon(file_name)
+
+    return icon_pixmap
+
+
+def get_scaled_icon(icon, size):
+    """
+    Returns a copy of an icon scaled to size x size pixels (times the screen's device pixel ratio).
+
+    The copy is made the first time an icon is asked for at a size and shared from then on, so painting
+    code can ask for it on every paint.
+
+    :param icon: String: File name of icon (see get_icon), or QPixmap
+    :param size: Int: Width and height in pixels
+    :return: QPixmap
+    """
+    if isinstance(icon, basestring):
+        icon = get_icon(icon)
+
+    ratio = get_device_pixel_ratio()
+    key = (icon.cacheKey(), size, ratio)
+
+    scaled = _SCALED_ICON_CACHE.get(key)
+
+    if scaled is None:
+        pixels = int(round(size * ratio))
+        scaled = icon.scaled(pixels, pixels, qc.Qt.IgnoreAspectRatio, qc.Qt.SmoothTransformation)
+
+        if ratio != 1:
+            scaled.setDevicePixelRatio(ratio)
+
+        _SCALED_ICON_CACHE[key] = scaled
+
+    return scaled
+
+
+def get_device_pixel_ratio():
+    """
+    Returns the device pixel ratio of the application's screen. Always 1 on Qt4, which has no high DPI support.
+    """
+    application = qg.QApplication.instance()
+
+    return getattr(application, 'devicePixelRatio', lambda: 1)()
+
 
+def _load_icon(file_name):
     full_path = inspect.stack()[0][1]
     print full_path
     split_path = r"\kar"